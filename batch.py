@@ -0,0 +1,86 @@
+# Non interactive runs: feed command scripts through Game.handle_line without prompts
+# Usage: python3 main.py <example/world_file> --batch <script> [<script> ...] [--quiet|--events] [--repeat N] [--seed S]
+#
+# A script is one command (or combat action) per line, blank lines and lines starting
+# with # are skipped. '-' reads the commands from stdin as they arrive. Every script runs
+# on a fresh Game over the same loaded world.
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from game import Game
+from metrics import Metrics
+from output import Output, NullOutput, BufferedOutput, EventOutput, json_lines
+from scheduler import StepClock
+from world import World
+
+@dataclass
+class ScriptResult:
+    name: str
+    commands: int
+    seconds: float
+    sim: Optional[Dict] = None # Scheduler metrics when the world was simulated
+
+    @property
+    def commands_per_sec(self):
+        return self.commands / self.seconds if self.seconds > 0 else float("inf")
+
+def script_lines(lines: Iterable[str]):
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        yield line
+
+def make_output(mode="text") -> Output:
+    # text: formatted lines, quiet: nothing, events: one JSON object per message
+    if mode == "quiet":
+        return NullOutput()
+    if mode == "events":
+        return EventOutput(json_lines(sys.stdout))
+    return BufferedOutput(sys.stdout)
+
+def run_script(world: World, lines: Iterable[str], name="-", out: Output = None, simulate=False, metrics: Optional[Metrics] = None,
+               seed: Optional[int] = None) -> ScriptResult:
+    out = out if out is not None else NullOutput()
+    commands = 0
+    # Simulated worlds move one tick per command so runs with the same seed are repeatable
+    game = Game(world=world, interactive=False, out=out, simulate=simulate, clock=StepClock(), metrics=metrics, seed=seed)
+    out.flush()
+    start = time.perf_counter()
+    for line in script_lines(lines):
+        game.handle_line(line)
+        commands += 1
+        if not game.running:
+            break
+    seconds = time.perf_counter() - start
+    game.close()
+    return ScriptResult(name, commands, seconds, game.sim.metrics() if game.sim else None)
+
+def run_batch(world: World, paths: List[str], mode="text", repeat=1, simulate=False, metrics: Optional[Metrics] = None,
+              seed: Optional[int] = None) -> List[ScriptResult]:
+    # Every script starts from `seed`, None picks one at random per script
+    results = []
+    for _ in range(repeat):
+        for path in paths:
+            if path == "-":
+                results.append(run_script(world, sys.stdin, "-", make_output(mode), simulate, metrics, seed))
+            else:
+                with open(path, "r") as f:
+                    results.append(run_script(world, f, path, make_output(mode), simulate, metrics, seed))
+    return results
+
+def report(results: List[ScriptResult], file=sys.stderr):
+    for r in results:
+        print(f"{r.name}: {r.commands} commands in {r.seconds * 1000:.2f}ms ({r.commands_per_sec:,.0f} commands/sec)", file=file)
+        if r.sim:
+            rate = f"{r.sim['tick_rate']:,.0f} ticks/sec" if r.sim['tick_rate'] else "idle"
+            events = ", ".join(f"{kind} {n}" for kind, n in r.sim['events_run'].items())
+            print(f"    world: {r.sim['ticks_run']} ticks ({rate}), queue depth {r.sim['queue_depth']} (max {r.sim['max_queue_depth']}),"
+                  f" {r.sim['awake_rooms']} awake rooms, events: {events}", file=file)
+    commands = sum(r.commands for r in results)
+    seconds = sum(r.seconds for r in results)
+    if len(results) > 1:
+        rate = commands / seconds if seconds > 0 else float("inf")
+        print(f"Total: {commands} commands in {seconds * 1000:.2f}ms ({rate:,.0f} commands/sec)", file=file)
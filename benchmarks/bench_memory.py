@@ -0,0 +1,161 @@
+# Memory used by a parsed world, against the same world as plain dict backed objects
+# Usage: python3 benchmarks/bench_memory.py [rooms]
+#
+# The baseline ("dict") is how entities were kept before templates and slots: a regular
+# dataclass per Stats, Item, Actor, Object and Room, every item with its own fields. Both parse
+# the same JSON text the way a world file is loaded, and what's counted is what the parsed
+# objects keep alive once the decoded JSON is gone, strings included.
+import json
+import os
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from names import IndexedList
+from world import parse_world, parse_item, parse_actor
+
+ITEM_KINDS = [
+    {"id": "potion", "name": "Small Potion", "description": "Heals a bit.", "type": "consumable", "func": "heal_small"},
+    {"id": "sword", "name": "Short Sword", "description": "Sharp.", "type": "equipable", "equip_slot": "weapon", "power": 2},
+    {"id": "mail", "name": "Chain Mail", "description": "Heavy.", "type": "equipable", "equip_slot": "armor", "power": 1},
+    {"id": "gem", "name": "Red Gem", "description": "Shiny.", "type": "misc"},
+]
+
+def actor(i, rng):
+    return {
+        "id": f"goblin_{i % 7}", "name": "Goblin", "description": "Green.",
+        "stats": {"health": 8, "max_health": 8, "mana": 0, "max_mana": 0, "strength": rng.randint(1, 4), "dexterity": 2, "intelligence": 1, "level": 1},
+        "items": [dict(ITEM_KINDS[1])], "equip": {"weapon": "sword"},
+    }
+
+def synthetic_data(rooms, seed=1):
+    rng = random.Random(seed)
+    return {
+        "start_room": "room_0",
+        "rooms": [{
+            "id": f"room_{i}", "name": f"Room {i}", "description": "A plain room.",
+            "exits": {"north": f"room_{(i + 1) % rooms}", "south": f"room_{(i - 1) % rooms}"},
+            "items": [dict(rng.choice(ITEM_KINDS)) for _ in range(5)],
+            "enemies": [actor(i, rng) for _ in range(2)],
+            "npcs": [],
+            "objects": [{"id": "table", "name": "Table", "description": "Wooden."}],
+        } for i in range(rooms)],
+    }
+
+# The dict backed baseline
+
+@dataclass
+class DictStats:
+    health: int = 20
+    max_health: int = 20
+    mana: int = 0
+    max_mana: int = 0
+    strength: int = 3
+    dexterity: int = 3
+    intelligence: int = 3
+    level: int = 1
+    experience: int = 0
+
+@dataclass
+class DictItem:
+    id: str
+    name: str
+    description: str
+    type: str = 'misc'
+    power: Optional[int] = None
+    equip_slot: Optional[str] = None
+    func: Optional[Callable] = None
+    func_name: Optional[str] = None
+
+@dataclass
+class DictObject:
+    id: str
+    name: str
+    description: str
+
+@dataclass
+class DictActor:
+    id: str
+    name: str
+    description: Optional[str] = None
+    stats: DictStats = field(default_factory=DictStats)
+    ai: str = 'aggressive'
+    equip: Dict[str, Optional[DictItem]] = field(default_factory=lambda: {"weapon": None, "armor": None})
+    items: List[DictItem] = field(default_factory=IndexedList)
+    skills: List = field(default_factory=list)
+    dialogue: Optional[str] = None
+
+@dataclass
+class DictRoom:
+    id: str
+    name: str
+    description: str
+    exits: Dict[str, str]
+    items: List[DictItem]
+    enemies: List[DictActor]
+    npcs: List[DictActor]
+    objects: List[DictObject]
+
+def dict_item(it):
+    return DictItem(id=it['id'], name=it['name'], description=it['description'], type=it['type'], power=it.get('power'),
+                    equip_slot=it.get('equip_slot'), func_name=it.get('func') if it['type'] == "consumable" else None)
+
+def dict_actor(ac, ai):
+    new_ac = DictActor(id=ac['id'], name=ac['name'], description=ac['description'], stats=DictStats(**ac['stats']), ai=ai,
+                       items=IndexedList(dict_item(it) for it in ac['items']))
+    for item_id in ac.get('equip', {}).values():
+        it = next((x for x in new_ac.items if x.id == item_id), None)
+        if it is not None:
+            new_ac.equip[it.equip_slot] = it
+    return new_ac
+
+def dict_world(data):
+    return {room['id']: DictRoom(id=room['id'], name=room['name'], description=room['description'], exits=room['exits'],
+                                 items=IndexedList(dict_item(it) for it in room['items']),
+                                 enemies=IndexedList(dict_actor(en, "aggressive") for en in room['enemies']),
+                                 npcs=IndexedList(dict_actor(npc, "passive") for npc in room['npcs']),
+                                 objects=IndexedList(DictObject(id=ob['id'], name=ob['name'], description=ob['description']) for ob in room['objects']))
+            for room in data['rooms']}
+
+def measure(func):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, result
+
+def report(label, count, unit, baseline, current):
+    print(f"{count} {label}: {baseline / count:.0f} -> {current / count:.0f} bytes per {unit} ({baseline / current:.1f}x less)")
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    text = json.dumps(synthetic_data(rooms))
+    rng = random.Random(2)
+    print("dict backed -> current")
+
+    item_text = json.dumps([rng.choice(ITEM_KINDS) for _ in range(rooms * 5)])
+    baseline, _ = measure(lambda: [dict_item(it) for it in json.loads(item_text)])
+    templates = {}
+    used, _ = measure(lambda: [parse_item(it, templates) for it in json.loads(item_text)])
+    report("items", rooms * 5, "item", baseline, used)
+
+    actor_text = json.dumps([actor(i, rng) for i in range(rooms)])
+    baseline, _ = measure(lambda: [dict_actor(ac, "aggressive") for ac in json.loads(actor_text)])
+    templates = {}
+    used, _ = measure(lambda: [parse_actor(ac, "aggressive", templates) for ac in json.loads(actor_text)])
+    report("actors", rooms, "actor (with stats and one item)", baseline, used)
+
+    entities = rooms * (1 + 5 + 2 * 2 + 1) # rooms, room items, enemies with one item each, objects
+    baseline, _ = measure(lambda: dict_world(json.loads(text)))
+    used, world = measure(lambda: parse_world(json.loads(text)))
+    report("entities", entities, "entity", baseline, used)
+    print(f"{rooms} rooms: {baseline / 1024 / 1024:.2f} -> {used / 1024 / 1024:.2f} MiB")
+    return world
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# Cold vs warm world startup
+# Usage: python3 benchmarks/bench_startup.py <example/world_file> [repeats]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from world import load_world, snapshot_path
+
+def timed_load(worldfile):
+    start = time.perf_counter()
+    world = load_world(worldfile)
+    return time.perf_counter() - start, len(world.rooms)
+
+def main():
+    if len(sys.argv) < 2:
+        raise SystemExit("Usage: python3 benchmarks/bench_startup.py <example/world_file> [repeats]")
+    worldfile = sys.argv[1]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    path = snapshot_path(worldfile)
+
+    cold = []
+    warm = []
+    for _ in range(repeats):
+        if os.path.exists(path):
+            os.remove(path)
+        t, rooms = timed_load(worldfile) # Full parse, writes the snapshot
+        cold.append(t)
+        t, _ = timed_load(worldfile) # Loads from the snapshot
+        warm.append(t)
+
+    print(f"World: {worldfile} ({rooms} rooms)")
+    print(f"Cold: best {min(cold) * 1000:.2f}ms  avg {sum(cold) / len(cold) * 1000:.2f}ms")
+    print(f"Warm: best {min(warm) * 1000:.2f}ms  avg {sum(warm) / len(warm) * 1000:.2f}ms")
+    print(f"Speedup: {min(cold) / min(warm):.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+# Benchmark suite: world load, command handlers, combat turns and experience gain
+# Usage: python3 benchmarks/bench_suite.py [--only load,commands,combat,experience] [--rooms 1000,10000,100000]
+#                                          [--out results.json] [--compare old.json] [--seed S]
+#
+# Every benchmark reseeds `random` and builds its own world (worldgen.py for the load ones), so
+# two runs on the same tree do the same work. Timings are per call (mean/min/p50/p95 seconds),
+# peak memory is taken from a separate tracemalloc run so it doesn't skew the timings. The JSON report is written to
+# --out (or stdout), --compare prints the change against an earlier report.
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_memory import ITEM_KINDS, actor
+from combat import Combat
+from entities import Stats, Actor
+from game import Game, create_player
+from output import NullOutput
+from progression import DEFAULT as DEFAULT_PROGRESSION
+from roomstore import load_lazy_world
+from world import World, load_world, parse_skill, parse_world, snapshot_path
+from worldgen import WorldSpec, write_world
+
+SEED = 1234
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+def bench(name: str, params: Dict, op: Callable, iterations: int, setup: Optional[Callable] = None,
+          teardown: Optional[Callable] = None, seed=SEED) -> Dict:
+    """
+    Times `iterations` calls of op(). setup() runs before and teardown() after every call, outside the
+    timing. One more untimed call runs under tracemalloc for the peak memory of a single op.
+    """
+    def once(timings=None):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        op()
+        if timings is not None:
+            timings.append(time.perf_counter() - start)
+        if teardown:
+            teardown()
+
+    random.seed(seed)
+    timings: List[float] = []
+    for _ in range(iterations):
+        once(timings)
+
+    random.seed(seed)
+    if setup:
+        setup()
+    tracemalloc.start()
+    op()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if teardown:
+        teardown()
+
+    timings.sort()
+    return {
+        "name": name,
+        "params": params,
+        "iterations": iterations,
+        "mean_s": sum(timings) / len(timings),
+        "min_s": timings[0],
+        "p50_s": percentile(timings, 0.50),
+        "p95_s": percentile(timings, 0.95),
+        "peak_bytes": peak,
+    }
+
+def bench_load(sizes: List[int], seed) -> List[Dict]:
+    results = []
+    for rooms in sizes:
+        iterations = max(1, min(5, 100_000 // rooms))
+        with tempfile.TemporaryDirectory() as tmp:
+            worldfile = os.path.join(tmp, "world")
+            write_world(worldfile, WorldSpec(rooms=rooms, seed=seed))
+            params = {"rooms": rooms}
+            results.append(bench("load.parse", params, lambda: load_world(worldfile, use_cache=False), iterations, seed=seed))
+            load_world(worldfile) # Writes the snapshot
+            results.append(bench("load.snapshot", params, lambda: load_world(worldfile), iterations, seed=seed))
+            load_lazy_world(worldfile).rooms.close() # Compiles the room file
+            results.append(bench("load.lazy", params, lambda: load_lazy_world(worldfile).rooms.close(), iterations, seed=seed))
+            if os.path.exists(snapshot_path(worldfile)):
+                os.remove(snapshot_path(worldfile))
+    return results
+
+def crowded_world(size, rng) -> World:
+    # Two rooms with `size` items, enemies and objects each, linked north/south
+    def room(room_id, other, exit_name):
+        return {
+            "id": room_id, "name": room_id.title(), "description": "A crowded room.",
+            "exits": {exit_name: other},
+            "items": [dict(ITEM_KINDS[i % len(ITEM_KINDS)], id=f"item_{i}", name=f"Item {i}") for i in range(size)],
+            "enemies": [dict(actor(i, rng), id=f"enemy_{i}", name=f"Enemy {i}") for i in range(size)],
+            "npcs": [],
+            "objects": [{"id": f"object_{i}", "name": f"Object {i}", "description": "Wooden."} for i in range(size)],
+        }
+    data = {"start_room": "north", "rooms": [room("north", "south", "south"), room("south", "north", "north")]}
+    rooms = parse_world(data)
+    # The room on the far side of `go` stays empty of enemies so moving never starts a fight
+    rooms["south"].enemies.clear()
+    return World(rooms=rooms, start_room="north", functions={})
+
+class _DiscardingText(NullOutput):
+    # Formats every message like BufferedOutput would, then drops it
+    enabled = True
+
+    def say(self, event, template, **fields):
+        if fields:
+            template.format(**fields)
+
+def bench_commands(sizes: List[int], seed) -> List[Dict]:
+    results = []
+    for size in sizes:
+        world = crowded_world(size, random.Random(seed))
+        game = Game(world=world, interactive=False, out=NullOutput(), save_path=None)
+        room = game.writable_room() # Take the copy on write hit before timing
+        game.rooms.for_write("south")
+        for it in room.items:
+            game.player.add_item(it)
+        params = {"room_items": size, "inventory": size}
+        last = size - 1 # Worst case for anything that scans
+        iterations = 200
+
+        def look_room():
+            game.run_command(["look"])
+
+        def look_item():
+            game.run_command(["look", "Item", str(last)])
+
+        def look_enemy():
+            game.run_command(["look", "Enemy", str(last)])
+
+        def pickup():
+            game.run_command(["pickup", "Item", str(last)])
+
+        def put_back():
+            it = game.player.items.pop()
+            game.current_room.items.append(it)
+
+        def inventory():
+            game.run_command(["inventory"])
+
+        def inventory_item():
+            game.run_command(["inv", "Item", str(last)])
+
+        def go():
+            game.run_command(["go", "south"])
+
+        def go_back():
+            game.set_current_room("north")
+
+        def attack():
+            game.run_command(["attack", "Enemy", str(last)])
+
+        def drop_combat():
+            game.combat = None
+
+        def status():
+            game.run_command(["status"])
+
+        # Output is dropped, so also time "look" with a sink that formats everything
+        def look_room_text():
+            game.out = text_out
+            game.run_command(["look"])
+            game.out = null_out
+
+        null_out = game.out
+        text_out = _DiscardingText()
+        results.append(bench("command.look", params, look_room, iterations, seed=seed))
+        results.append(bench("command.look_text", params, look_room_text, iterations, seed=seed))
+        results.append(bench("command.look_item", params, look_item, iterations, seed=seed))
+        results.append(bench("command.look_enemy", params, look_enemy, iterations, seed=seed))
+        results.append(bench("command.pickup", params, pickup, iterations, teardown=put_back, seed=seed))
+        results.append(bench("command.inventory", params, inventory, iterations, seed=seed))
+        results.append(bench("command.inventory_item", params, inventory_item, iterations, seed=seed))
+        results.append(bench("command.go", params, go, iterations, teardown=go_back, seed=seed))
+        results.append(bench("command.attack", params, attack, iterations, teardown=drop_combat, seed=seed))
+        results.append(bench("command.status", params, status, iterations, seed=seed))
+    return results
+
+def bench_combat(sizes: List[int], seed) -> List[Dict]:
+    results = []
+    for enemies in sizes:
+        rng = random.Random(seed)
+        player = create_player()
+        player.stats = Stats(health=10**9, max_health=10**9, strength=5, dexterity=3)
+        foes = []
+        for i in range(enemies):
+            en = Actor(id=f"enemy_{i}", name=f"Enemy {i}", stats=Stats(health=10**9, max_health=10**9, strength=rng.randint(4, 8), dexterity=2))
+            foes.append(en)
+        combat = Combat(player, foes, out=NullOutput())
+        combat.start()
+        params = {"enemies": enemies}
+        results.append(bench("combat.turn", params, lambda: combat.step("attack 1"), 500, seed=seed))
+
+        # Every enemy under a damage over time effect and a debuff, ticking each round
+        plague = parse_skill({"id": "plague", "name": "Plague", "description": "", "mana_cost": 0, "power": 0, "target": "enemies",
+                              "effects": [{"id": "rot", "name": "Rot", "turns": 10**6, "damage": 1}, {"id": "slow", "name": "Slow", "turns": 10**6, "stats": {"dexterity": -1}}]})
+        player.learn(plague)
+        combat = Combat(player, foes, out=NullOutput())
+        combat.start()
+        results.append(bench("combat.cast_all", params, lambda: combat.step("skill plague"), 1, seed=seed))
+        results.append(bench("combat.effect_turn", params, lambda: combat.step("wait"), 100, seed=seed))
+    return results
+
+def bench_experience(grants: List[int], seed) -> List[Dict]:
+    results = []
+    for xp in grants:
+        stats = []
+
+        def fresh():
+            stats.clear()
+            stats.append(Stats())
+
+        results.append(bench("stats.gain_experience", {"xp": xp}, lambda: stats[0].gain_experience(xp), 5, setup=fresh, seed=seed))
+
+        def crowd():
+            stats.clear()
+            stats.extend(Stats() for _ in range(1000))
+
+        results.append(bench("progression.grant", {"xp": xp, "actors": 1000}, lambda: DEFAULT_PROGRESSION.grant(stats, xp), 5, setup=crowd, seed=seed))
+    return results
+
+def bench_entities(counts: List[int], seed) -> List[Dict]:
+    # World wide regen: a loop over actors with their own Stats against one pass over the entity store
+    try:
+        from entitystore import EntityStore
+    except ImportError as e:
+        print(f"Skipping entities: {e}", file=sys.stderr)
+        return []
+    results = []
+    for n in counts:
+        rng = random.Random(seed)
+        values = [(h // 2, h, 0, 0, 3, 3, 3, 1, 0) for h in (rng.randint(10, 100) for _ in range(n))]
+        actors = []
+        store = [None]
+
+        def plain():
+            actors.clear()
+            actors.extend(Actor(id=f"a{i}", name="A", stats=Stats(*v)) for i, v in enumerate(values))
+
+        def loop():
+            for ac in actors:
+                s = ac.stats
+                if ac.is_alive() and s.health < s.max_health:
+                    ac.heal(max(1, s.max_health * 10 // 100))
+
+        def stored():
+            store[0] = EntityStore(n)
+            actors.clear()
+            actors.extend(store[0].add(v) for v in values) # Keeps the slots alive
+
+        results.append(bench("entities.regen_loop", {"actors": n}, loop, 5, setup=plain, seed=seed))
+        results.append(bench("entities.regen_store", {"actors": n}, lambda: store[0].regen(10), 5, setup=stored, seed=seed))
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old: Dict, new: Dict, file=sys.stderr):
+    def key(r):
+        return r["name"], json.dumps(r["params"], sort_keys=True)
+    before = {key(r): r for r in old["results"]}
+    for r in new["results"]:
+        o = before.get(key(r))
+        if o is None:
+            continue
+        ratio = r["p50_s"] / o["p50_s"] if o["p50_s"] > 0 else float("inf")
+        params = " ".join(f"{k}={v}" for k, v in r["params"].items())
+        print(f"{r['name']:<28} {params:<32} p50 {o['p50_s'] * 1e6:>12.1f}us -> {r['p50_s'] * 1e6:>12.1f}us  {ratio:6.2f}x"
+              f"  peak {o['peak_bytes'] / 1024:>10.1f}KiB -> {r['peak_bytes'] / 1024:>10.1f}KiB", file=file)
+
+def int_list(text):
+    return [int(v) for v in text.split(",") if v]
+
+SUITES = {
+    "load": (bench_load, "rooms"),
+    "commands": (bench_commands, "sizes"),
+    "combat": (bench_combat, "enemies"),
+    "experience": (bench_experience, "xp"),
+    "entities": (bench_entities, "actors"),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite")
+    parser.add_argument("--only", default=",".join(SUITES), help="Comma separated suites: " + ", ".join(SUITES))
+    parser.add_argument("--rooms", type=int_list, default=[1_000, 10_000, 100_000], help="World sizes for load")
+    parser.add_argument("--sizes", type=int_list, default=[10, 100, 1_000], help="Room and inventory sizes for commands")
+    parser.add_argument("--enemies", type=int_list, default=[1, 10, 100], help="Enemies per fight for combat")
+    parser.add_argument("--xp", type=int_list, default=[10**3, 10**5, 10**7, 10**9], help="Experience grants")
+    parser.add_argument("--actors", type=int_list, default=[1_000, 10_000, 100_000], help="Actors for entities (needs numpy)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": [],
+    }
+    for suite in args.only.split(","):
+        if suite not in SUITES:
+            raise SystemExit(f"Unknown suite: {suite}")
+        func, option = SUITES[suite]
+        print(f"Running {suite}...", file=sys.stderr)
+        report["results"].extend(func(getattr(args, option), args.seed))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
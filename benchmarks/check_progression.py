@@ -0,0 +1,63 @@
+# Checks the level tables of progression.py against the level by level loop Stats used to run
+# Usage: python3 benchmarks/check_progression.py [cases] [seed]
+#
+# Random curves (formulas, xp tables, "every" gains, max_level) get random grants, one after the
+# other on the same Stats, and every field has to come out the same as leveling up one level at
+# a time. Exits with the first case that differs.
+import os
+import random
+import sys
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entities import Stats
+from progression import DEFAULT, Progression
+
+def reference(progression: Progression, stats: Stats, amount: int):
+    # The old Stats.gain_experience loop, with the curve and the gains read off the progression
+    stats.experience += amount
+    while progression.max_level is None or stats.level < progression.max_level:
+        step = progression.step(stats.level)
+        if stats.experience < step:
+            break
+        stats.experience -= step
+        stats.level += 1
+        for stat in progression.stats:
+            if stat == "max_mana" and stats.max_mana == 0:
+                continue
+            setattr(stats, stat, getattr(stats, stat) + progression.gain(stat, stats.level))
+        stats.health = stats.max_health
+        if stats.max_mana != 0:
+            stats.mana = stats.max_mana
+
+def random_progression(rng: random.Random) -> Progression:
+    if rng.random() < 0.3:
+        xp = [rng.randint(-2, 40) for _ in range(rng.randint(1, 12))]
+    else:
+        xp = {"base": rng.randint(-5, 20), "per_level": rng.randint(0, 8), "exponent": rng.choice([0, 1, 1, 2, 3])}
+        if rng.random() < 0.2:
+            xp = {"base": rng.uniform(0, 20), "per_level": rng.uniform(0, 5), "exponent": rng.choice([0.5, 1, 1.5, 2])}
+    every = {rng.randint(1, 10): {rng.choice(["strength", "max_mana", "dexterity"]): rng.randint(0, 3)} for _ in range(rng.randint(0, 3))}
+    max_level = rng.choice([None, None, rng.randint(1, 200)])
+    return Progression(xp=xp, gains={"max_health": rng.randint(0, 6), "max_mana": rng.randint(0, 3), "strength": 1}, every=every, max_level=max_level)
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rng = random.Random(seed)
+    for case in range(cases):
+        progression = DEFAULT if case == 0 else random_progression(rng)
+        mana = rng.choice([0, 10])
+        fast, slow = Stats(mana=mana, max_mana=mana), Stats(mana=mana, max_mana=mana)
+        for _ in range(rng.randint(1, 5)):
+            amount = rng.choice([0, 1, rng.randint(1, 100), rng.randint(1, 10000), rng.randint(1, 200000)])
+            progression.apply(fast, amount)
+            reference(progression, slow, amount)
+            if fast != slow:
+                raise SystemExit(f"Case {case} differs after granting {amount}:\n  tables {asdict(fast)}\n  loop   {asdict(slow)}\n"
+                                 f"  xp {progression.xp_table or (progression.xp_base, progression.xp_per_level, progression.xp_exponent)} every {progression.every} max_level {progression.max_level}")
+    print(f"{cases} progressions matched the level by level loop")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+from typing import Callable, List, Optional
+import random
+import time
+
+from effects import EffectQueue
+from entities import Actor, Skill, chance
+from metrics import Metrics
+from progression import Progression
+from output import Output, BufferedOutput
+
+melee_second_person_verbs = ["slashes", "strikes", "bashes", "hits", "smashes", "pummels", "kicks", "punches", "attacks", "swings at", "jabs"]
+melee_first_person_verbs = ["slash", "strike", "bash", "hit", "smash", "pummel", "kick", "punch", "attack", "swing at", "jab"]
+
+# Combat rules, shared with the headless simulator
+DAMAGE_SPREAD = 2 # Damage rolls are attack - defense +/- this
+CRIT_MULTIPLIER = 1.5
+PLAYER_CRIT_CHANCE = 10 # Plus the player's dexterity
+ENEMY_CRIT_CHANCE = 5 # Plus the enemy's dexterity
+HESITATE_CHANCE = 10
+FLEE_CHANCE = 50 # Plus FLEE_DEX_BONUS per point of dexterity
+FLEE_DEX_BONUS = 2
+XP_PER_ENEMY_LEVEL = 5
+ENEMY_SKILL_CHANCE = 30 # Enemies with skills cast the first one they can afford instead of attacking
+
+def roll_damage(attacker: Actor, defender: Actor, crit_chance: int, rng=random):
+    damage = max(0, attacker.attack_power() - defender.defense() + rng.randint(-DAMAGE_SPREAD, DAMAGE_SPREAD))
+    crit = chance(crit_chance + attacker.stats.dexterity, rng)
+    if crit:
+        damage = int(damage * CRIT_MULTIPLIER) + 1
+    return damage, crit
+
+PROMPT = "Action (attack <n>/skill <name>/use <item>/flee): "
+
+class Combat:
+    def __init__(self, player: Actor, enemies: List[Actor], out: Optional[Output] = None, rng: Optional[random.Random] = None,
+                 metrics: Optional[Metrics] = None, progression: Optional[Progression] = None):
+        self.out = out if out is not None else BufferedOutput()
+        self.progression = progression # The world's level tables, None for the default ones
+        self.metrics = metrics
+        self.turns = 0
+        self.busy = 0.0 # Seconds spent playing rounds, only counted with metrics on
+        # Every roll in this fight comes from this stream, by default one seeded from the global random
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))
+        self.player = player
+        self.enemies = enemies
+        self.participants = list(enemies) # Everyone who was in the fight, dead or alive
+        self.defeated_enemies: List[Actor] = []
+        self.effects = EffectQueue() # Timed effects on anyone in the fight, see effects.py
+
+    def show_status(self):
+        out = self.out
+        if not out.enabled:
+            return
+        s = self.player.stats
+        out.say("combat.status", "Your HP: {health}/{max_health}  MP: {mana}/{max_mana} \n", health=s.health, max_health=s.max_health, mana=s.mana, max_mana=s.max_mana)
+        out.say("combat.enemies", "Enemies:")
+        for i,e in enumerate(self.enemies, 1):
+            out.say("combat.enemy", " {n} - {name} L{level} HP: {health}/{max_health}", n=i, name=e.name, level=e.stats.level, health=e.stats.health, max_health=e.stats.max_health)
+        if self.effects.active:
+            for ac in (self.player, *self.enemies):
+                names = [effect.spec.name for effect in self.effects.on(ac)]
+                if names:
+                    out.say("combat.effects", "{name}: {effects}", name="You" if ac is self.player else ac.name, effects=", ".join(names))
+
+    def player_turn(self, line):
+        cmd = line.strip().lower().split()
+        if not cmd: return
+        if cmd[0] == "attack":
+            idx = int(cmd[1])-1 if len(cmd)>1 and cmd[1].isdigit() else 0
+            if 0 <= idx < len(self.enemies):
+                target = self.enemies[idx]
+                damage, crit = roll_damage(self.player, target, PLAYER_CRIT_CHANCE, self.rng)
+                if crit:
+                    self.out.say("combat.crit", "Critical Hit!")
+                target.take_damage(damage)
+                if self.player.equip.get("weapon"):
+                    self.out.say("combat.player_attack", "You attack {target} with {weapon} for {damage} damage.", target=target.name, weapon=self.player.equip['weapon'].name, damage=damage)
+                else:
+                    verb = self.rng.choice(melee_first_person_verbs)
+                    self.out.say("combat.player_attack", "You {verb} {target} for {damage} damage.", verb=verb, target=target.name, damage=damage)
+                if not target.is_alive():
+                    self.out.say("combat.enemy_defeated", "You have defeated L{level} {name}!", level=target.stats.level, name=target.name)
+            else:
+                self.out.say("combat.no_target", "No such target.")
+        elif cmd[0] == "use":
+            if len(cmd) < 2:
+                self.out.say("combat.use_what", "Use what?")
+                return
+            item_name = " ".join(cmd[1:])
+            it = self.player.items.find(item_name, lambda it: it.type == "consumable")
+            if it:
+                self.player.consume_item(it.id)
+                self.out.say("combat.used", "You used {item}.", item=it.name)
+                return
+            self.out.say("combat.not_usable", "Item not found or not usable.")
+        elif cmd[0] == "skill":
+            words = cmd[1:]
+            if not words:
+                self.out.say("combat.skill_what", "Cast what?")
+                return
+            idx = int(words.pop()) - 1 if len(words) > 1 and words[-1].isdigit() else None
+            name = " ".join(words)
+            sk = self.player.skills.get(name) or self.player.skills.find(name)
+            if sk is None:
+                self.out.say("combat.no_skill", "You don't know {name}.", name=name)
+                return
+            target = None
+            if idx is not None:
+                if not 0 <= idx < len(self.enemies):
+                    self.out.say("combat.no_target", "No such target.")
+                    return
+                target = self.enemies[idx]
+            self.cast(self.player, sk, target)
+        elif cmd[0] == "flee":
+            if chance(FLEE_CHANCE + self.player.stats.dexterity * FLEE_DEX_BONUS, self.rng):
+                self.out.say("combat.fled", "You successfully fled the combat!")
+                return "fled"
+            else:
+                self.out.say("combat.flee_failed", "Failed to flee!")
+        else:
+            self.out.say("combat.unknown_action", "Unknown action.")
+
+    def enemies_turn(self):
+        for i,e in enumerate(self.enemies):
+            if not e.is_alive():
+                self.defeated_enemies.append(e)
+                self.enemies.pop(i)
+                continue
+            if e.skills and chance(ENEMY_SKILL_CHANCE, self.rng):
+                sk = next((sk for sk in e.skills if sk.mana_cost <= e.stats.mana), None)
+                if sk is not None and self.cast(e, sk):
+                    if not self.player.is_alive():
+                        self.out.say("combat.player_defeated", "You have been defeated by L{level} {name}!", level=e.stats.level, name=e.name)
+                        break
+                    continue
+            if chance(HESITATE_CHANCE, self.rng):
+                self.out.say("combat.hesitate", "{name} hesitates.", name=e.name)
+                continue
+            damage, crit = roll_damage(e, self.player, ENEMY_CRIT_CHANCE, self.rng)
+            if crit:
+                self.out.say("combat.crit", "Critical Hit!")
+            if damage > 0:
+                self.player.take_damage(damage)
+                if e.equip.get("weapon"):
+                    self.out.say("combat.enemy_attack", "L{level} {name} attacks you with {weapon} for {damage} damage.", level=e.stats.level, name=e.name, weapon=e.equip['weapon'].name, damage=damage)
+                else:
+                    verb = self.rng.choice(melee_second_person_verbs)
+                    self.out.say("combat.enemy_attack", "L{level} {name} {verb} you for {damage} damage.", level=e.stats.level, name=e.name, verb=verb, damage=damage)
+            else:
+                self.out.say("combat.enemy_miss", "{name} attacks but fails to hurt you.", name=e.name)
+                break
+            if not self.player.is_alive():
+                self.out.say("combat.player_defeated", "You have been defeated by L{level} {name}!", level=e.stats.level, name=e.name)
+                break
+
+    def targets(self, user: Actor, skill: Skill, target: Optional[Actor] = None) -> List[Actor]:
+        if skill.target == "self":
+            return [user]
+        opponents = self.enemies if user is self.player else [self.player]
+        if skill.target == "enemies":
+            return [ac for ac in opponents if ac.is_alive()]
+        if target is None:
+            target = next((ac for ac in opponents if ac.is_alive()), None)
+        return [target] if target is not None else []
+
+    def cast(self, user: Actor, skill: Skill, target: Optional[Actor] = None) -> bool:
+        """Casts skill, its effects land on every target in one batch. Returns False when it couldn't be cast."""
+        if user.stats.mana < skill.mana_cost:
+            if user is self.player:
+                self.out.say("combat.no_mana", "Not enough mana for {skill}.", skill=skill.name)
+            return False
+        targets = self.targets(user, skill, target)
+        if not targets:
+            if user is self.player:
+                self.out.say("combat.no_target", "No such target.")
+            return False
+        user.stats.mana -= skill.mana_cost
+        if user is self.player:
+            self.out.say("combat.player_skill", "You cast {skill}.", skill=skill.name)
+        else:
+            self.out.say("combat.enemy_skill", "L{level} {name} casts {skill}.", level=user.stats.level, name=user.name, skill=skill.name)
+        for ac in targets:
+            skill.func(user, ac)
+        if skill.effects:
+            added = self.effects.apply([(spec, ac) for ac in targets for spec in skill.effects], self.turns, user)
+            if self.out.enabled:
+                for effect in added:
+                    if effect.target is self.player:
+                        self.out.say("combat.effect", "You are hit by {effect}.", effect=effect.spec.name)
+                    else:
+                        self.out.say("combat.effect", "{target} is hit by {effect}.", target=effect.target.name, effect=effect.spec.name)
+        if user is self.player:
+            for ac in targets:
+                if ac is not user and not ac.is_alive():
+                    self.out.say("combat.enemy_defeated", "You have defeated L{level} {name}!", level=ac.stats.level, name=ac.name)
+        return True
+
+    def resolve_effects(self):
+        # Ticks and expiry due this round, one hit per actor for all of their effects
+        if not self.effects.heap:
+            return
+        hits, expired = self.effects.resolve(self.turns)
+        died = False
+        for target, damage, names in hits:
+            effects = ", ".join(names)
+            if damage >= 0:
+                target.take_damage(damage)
+            else:
+                target.heal(-damage)
+            if target is self.player:
+                if damage >= 0:
+                    self.out.say("combat.effect_damage", "You take {damage} damage from {effects}.", damage=damage, effects=effects)
+                else:
+                    self.out.say("combat.effect_heal", "You recover {amount} health from {effects}.", amount=-damage, effects=effects)
+            elif damage >= 0:
+                self.out.say("combat.effect_damage", "{target} takes {damage} damage from {effects}.", target=target.name, damage=damage, effects=effects)
+            else:
+                self.out.say("combat.effect_heal", "{target} recovers {amount} health from {effects}.", target=target.name, amount=-damage, effects=effects)
+            if not target.is_alive():
+                died = True
+                if target is self.player:
+                    self.out.say("combat.player_defeated", "You have been defeated by {effects}!", effects=effects)
+                else:
+                    self.out.say("combat.enemy_defeated", "You have defeated L{level} {name}!", level=target.stats.level, name=target.name)
+        for effect in expired:
+            if not effect.target.is_alive():
+                continue
+            if effect.target is self.player:
+                self.out.say("combat.effect_ended", "{effect} wears off.", effect=effect.spec.name)
+            else:
+                self.out.say("combat.effect_ended", "{effect} wears off {target}.", effect=effect.spec.name, target=effect.target.name)
+        if died:
+            # Enemies killed by effects leave the fight now, so it can end on them
+            for i in range(len(self.enemies) - 1, -1, -1):
+                if not self.enemies[i].is_alive():
+                    self.defeated_enemies.append(self.enemies.pop(i))
+
+    def over(self):
+        return not self.player.is_alive() or len(self.enemies) == 0
+
+    def start(self):
+        self.out.say("combat.started", "Combat started!")
+        if not self.over():
+            self.show_status()
+
+    def step(self, line):
+        """
+        Plays one round with the player's action `line`.
+        Returns True when the combat is finished.
+        """
+        started = time.perf_counter() if self.metrics is not None else 0.0
+        result = self.player_turn(line)
+        if result != "fled":
+            self.enemies_turn()
+            self.resolve_effects()
+        self.turns += 1
+        if self.metrics is not None:
+            elapsed = time.perf_counter() - started
+            self.busy += elapsed
+            self.metrics.observe("combat_turn_seconds", elapsed)
+        if result == "fled" or self.over():
+            self.finish()
+            return True
+        self.show_status()
+        return False
+
+    def finish(self):
+        self.effects.clear()
+        if not self.player.is_alive():
+            self.out.say("combat.game_over", "Game Over.")
+        elif len(self.enemies) == 0:
+            self.out.say("combat.won", "You have defeated all enemies! \n")
+            total_exp = sum(en.stats.level * XP_PER_ENEMY_LEVEL for en in self.defeated_enemies)
+            self.player.stats.gain_experience(total_exp, self.progression)
+            self.out.say("combat.experience", "You gained {xp} experience points!", xp=total_exp)
+        self.out.say("combat.ended", "Combat ended.")
+        if self.metrics is not None:
+            self.metrics.observe("combat_seconds", self.busy)
+            self.metrics.observe("combat_turns", self.turns)
+
+    def run(self, read: Callable[[str], str] = input):
+        self.start()
+        if self.over():
+            self.finish()
+            return
+        while True:
+            self.out.flush()
+            if self.step(read(PROMPT)):
+                break
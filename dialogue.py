@@ -0,0 +1,218 @@
+# NPC conversations
+#
+# Trees come from the "dialogues" list in data.json or, for big worlds, one file per tree at
+# dialogues/<tree id>.json next to it. An NPC names its tree with "dialogue": "<tree id>".
+#   {"id": "elder", "start": "greet", "nodes": [
+#       {"id": "greet", "text": "Welcome, traveller.", "options": [
+#           {"text": "Who are you?", "next": "who"},
+#           {"text": "Anything for me?", "response": "Let me see...", "next": "gift"},
+#           {"text": "Goodbye."}]},
+#       {"id": "who", "text": "The oldest one here.", "next": "greet"},
+#       {"id": "gift", "text": "Take this.", "func": "give_potion"}]}
+# A node without options goes on to "next", or ends the conversation without one. "func" names
+# a function from functions.py, called as func(player, npc) when the node is reached, it can
+# return a node id to go to instead.
+#
+# Nothing is compiled while the world loads. A tree is compiled the first time someone talks
+# to one of its NPCs and the compiled tree is kept by the world's DialogueLibrary, so every
+# session on a shared world uses the same one.
+import json
+import os
+import sys
+from array import array
+from typing import Callable, Dict, List, Optional
+
+from entities import Actor
+from output import Output
+
+PROMPT = "Say (1-9/bye): "
+MAX_HOPS = 100 # Nodes passed without a choice before a conversation is cut off, for trees that loop
+
+class DialogueTree:
+    """
+    A tree compiled into flat tables. Nodes and options are numbered, edges are indices
+    (-1 ends the conversation) and every text is an index into `strings`. The options of
+    node i are option_*[option_start[i]:option_start[i + 1]].
+    """
+    __slots__ = ("id", "strings", "start", "index", "text", "func", "next",
+                 "option_start", "option_text", "option_response", "option_next")
+
+    def __init__(self, tree_id: str):
+        self.id = tree_id
+        self.strings: List[str] = []
+        self.start = 0
+        self.index: Dict[str, int] = {} # node id -> node
+        self.text = array("i")
+        self.func = array("i") # String index of the hook's name, -1 for none
+        self.next = array("i")
+        self.option_start = array("I", [0])
+        self.option_text = array("i")
+        self.option_response = array("i")
+        self.option_next = array("i")
+
+    def __len__(self):
+        return len(self.text)
+
+    def options(self, node: int) -> range:
+        return range(self.option_start[node], self.option_start[node + 1])
+
+def compile_tree(spec: Dict) -> DialogueTree:
+    tree = DialogueTree(spec['id'])
+    nodes = spec['nodes']
+    if not nodes:
+        raise ValueError(f"Dialogue {tree.id} has no nodes")
+    for i, node in enumerate(nodes):
+        if node['id'] in tree.index:
+            raise ValueError(f"Dialogue {tree.id}: node {node['id']} is defined more than once")
+        tree.index[node['id']] = i
+
+    strings: Dict[str, int] = {}
+    def intern(text: Optional[str]) -> int:
+        if text is None:
+            return -1
+        i = strings.get(text)
+        if i is None:
+            i = strings[text] = len(tree.strings)
+            tree.strings.append(sys.intern(text))
+        return i
+
+    def target(node_id: Optional[str]) -> int:
+        if node_id is None:
+            return -1
+        i = tree.index.get(node_id)
+        if i is None:
+            raise ValueError(f"Dialogue {tree.id}: node {node_id} not found")
+        return i
+
+    for node in nodes:
+        tree.text.append(intern(node['text']))
+        tree.func.append(intern(node.get('func')))
+        tree.next.append(target(node.get('next')))
+        for option in node.get('options', ()):
+            tree.option_text.append(intern(option['text']))
+            tree.option_response.append(intern(option.get('response')))
+            tree.option_next.append(target(option.get('next')))
+        tree.option_start.append(len(tree.option_text))
+    tree.start = target(spec.get('start', nodes[0]['id']))
+    return tree
+
+def tree_sources(data: Dict) -> Dict[str, bytes]:
+    # Trees defined in data.json, kept as JSON until someone talks to their NPC
+    return {spec['id']: json.dumps(spec, separators=(",", ":")).encode() for spec in data.get('dialogues', ())}
+
+class DialogueLibrary:
+    """The dialogue trees of one world, compiled on first use and shared from then on."""
+    def __init__(self, worldfile: Optional[str] = None, sources: Optional[Dict[str, bytes]] = None, functions: Optional[Dict] = None):
+        self.directory = os.path.join(worldfile, "dialogues") if worldfile else None
+        self.sources = sources if sources is not None else {}
+        self.functions = functions if functions is not None else {}
+        self.trees: Dict[str, Optional[DialogueTree]] = {}
+
+    def path(self, tree_id: str) -> Optional[str]:
+        if self.directory is None or os.path.basename(tree_id) != tree_id or tree_id.startswith("."):
+            return None
+        return os.path.join(self.directory, tree_id + ".json")
+
+    def load(self, tree_id: str) -> Optional[Dict]:
+        raw = self.sources.get(tree_id)
+        if raw is None:
+            path = self.path(tree_id)
+            if path is None or not os.path.exists(path):
+                return None
+            with open(path, "rb") as f:
+                raw = f.read()
+        spec = json.loads(raw)
+        spec.setdefault('id', tree_id)
+        return spec
+
+    def get(self, tree_id: str) -> Optional[DialogueTree]:
+        if tree_id in self.trees:
+            return self.trees[tree_id]
+        spec = self.load(tree_id)
+        tree = compile_tree(spec) if spec is not None else None
+        self.trees[tree_id] = tree
+        return tree
+
+    def forget(self, tree_id: str):
+        # The tree's source changed, compile it again next time
+        self.trees.pop(tree_id, None)
+
+    def compiled(self) -> int:
+        return sum(1 for tree in self.trees.values() if tree is not None)
+
+class Conversation:
+    """One player talking to one NPC, played a line at a time like Combat."""
+    def __init__(self, tree: DialogueTree, player: Actor, npc: Actor, functions: Dict[str, Callable], out: Output):
+        self.tree = tree
+        self.player = player
+        self.npc = npc
+        self.functions = functions
+        self.out = out
+        self.node = -1
+
+    def over(self):
+        return self.node == -1
+
+    def start(self):
+        self.enter(self.tree.start)
+
+    def enter(self, node: int):
+        # Follows nodes until one that needs a choice or the end
+        tree = self.tree
+        for _ in range(MAX_HOPS):
+            self.node = node
+            if node == -1:
+                self.out.say("talk.ended", "{name} turns away.", name=self.npc.name)
+                return
+            self.out.say("talk.line", "{name}: {text}", name=self.npc.name, text=tree.strings[tree.text[node]])
+            if tree.func[node] != -1:
+                name = tree.strings[tree.func[node]]
+                func = self.functions.get(name)
+                jump = func(self.player, self.npc) if func is not None else None
+                if jump is not None:
+                    node = tree.index.get(jump, -1)
+                    continue
+            if len(tree.options(node)):
+                self.show_options()
+                return
+            node = tree.next[node]
+        self.node = -1
+        self.out.say("talk.ended", "{name} turns away.", name=self.npc.name)
+
+    def show_options(self):
+        out = self.out
+        if not out.enabled:
+            return
+        tree = self.tree
+        for n, k in enumerate(tree.options(self.node), 1):
+            out.say("talk.option", " {n} - {text}", n=n, text=tree.strings[tree.option_text[k]])
+
+    def step(self, line) -> bool:
+        """
+        Picks the option the player typed.
+        Returns True when the conversation is over.
+        """
+        choice = line.strip().lower()
+        if choice in ("bye", "leave", "quit"):
+            self.node = -1
+            self.out.say("talk.ended", "{name} turns away.", name=self.npc.name)
+            return True
+        tree = self.tree
+        options = tree.options(self.node)
+        if not choice.isdigit() or not 1 <= int(choice) <= len(options):
+            self.out.say("talk.invalid", "Pick an answer by its number, or say bye.")
+            self.show_options()
+            return False
+        k = options[int(choice) - 1]
+        self.out.say("talk.player", "You: {text}", text=tree.strings[tree.option_text[k]])
+        if tree.option_response[k] != -1:
+            self.out.say("talk.line", "{name}: {text}", name=self.npc.name, text=tree.strings[tree.option_response[k]])
+        self.enter(tree.option_next[k])
+        return self.over()
+
+    def run(self, read: Callable[[str], str] = input):
+        self.start()
+        while not self.over():
+            self.out.flush()
+            if self.step(read(PROMPT)):
+                break
@@ -0,0 +1,175 @@
+# Timed status effects: buffs, debuffs and damage (or healing) over time, cast with skills
+#
+# A skill lists its effects and who they land on:
+#   {"id": "venom", "name": "Venom", "description": "...", "mana_cost": 3, "power": 0, "target": "enemies",
+#    "effects": [{"id": "poison", "name": "Poison", "turns": 3, "damage": 2},
+#                {"id": "weak", "name": "Weakened", "turns": 2, "stats": {"strength": -2}}]}
+# "target" is "enemy" (one opponent, the default), "enemies" (every opponent) or "self".
+# An effect lasts "turns" combat rounds and ticks every "every" rounds (default 1) starting
+# with the round it was cast in, "damage" is dealt per tick (negative heals). "stats" change
+# while the effect lasts and are put back when it ends. Casting an effect that is already on
+# the target makes it last longer instead of stacking.
+#
+# Effects last for one fight. Everything due in a fight, ticks and expiry, is one heap ordered
+# by round, so a round only costs the events due in it and nobody is polled for effects. A
+# refreshed effect leaves its old expiry in the heap, it's skipped when it comes up.
+import heapq
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from entities import Actor
+
+EFFECT_STATS = ("max_health", "max_mana", "strength", "dexterity", "intelligence")
+TARGETS = ("enemy", "enemies", "self")
+
+# Events due in the same round: ticks go first so an effect gets its last tick
+TICK = 0
+EXPIRE = 1
+
+@dataclass(frozen=True, slots=True)
+class EffectSpec:
+    id: str
+    name: str
+    turns: int
+    every: int = 1
+    damage: int = 0 # Per tick, negative heals
+    stats: Tuple[Tuple[str, int], ...] = () # (stat, change) while the effect lasts
+
+def parse_effect(data) -> EffectSpec:
+    stats = tuple(data.get('stats', {}).items())
+    for stat, _ in stats:
+        if stat not in EFFECT_STATS:
+            raise ValueError(f"Effect {data['id']} can't change stat: {stat}")
+    if data['turns'] < 1 or data.get('every', 1) < 1:
+        raise ValueError(f"Effect {data['id']} must last and tick at least every round")
+    return EffectSpec(id=data['id'], name=data['name'], turns=data['turns'], every=data.get('every', 1), damage=data.get('damage', 0), stats=stats)
+
+class Effect:
+    """One effect on one actor."""
+    __slots__ = ("spec", "target", "source", "expires", "next_tick", "applied", "ended")
+
+    def __init__(self, spec: EffectSpec, target: Actor, source: Optional[Actor], expires: int):
+        self.spec = spec
+        self.target = target
+        self.source = source
+        self.expires = expires # Last round it's on
+        self.next_tick: Optional[int] = None # Round of the tick in the heap, None when none is
+        self.applied: List[Tuple[str, int]] = [] # Stat changes as made, after clamping
+        self.ended = False
+
+    def apply_stats(self):
+        stats = self.target.stats
+        for stat, change in self.spec.stats:
+            value = getattr(stats, stat)
+            new = max(1 if stat == "max_health" else 0, value + change)
+            setattr(stats, stat, new)
+            self.applied.append((stat, new - value))
+        stats.health = min(stats.health, stats.max_health)
+        stats.mana = min(stats.mana, stats.max_mana)
+
+    def revert_stats(self):
+        stats = self.target.stats
+        for stat, change in self.applied:
+            setattr(stats, stat, getattr(stats, stat) - change)
+        self.applied = []
+        stats.health = min(stats.health, stats.max_health)
+        stats.mana = min(stats.mana, stats.max_mana)
+
+class EffectQueue:
+    """The effects of one fight, see the top of the file."""
+    def __init__(self):
+        self.heap: List[Tuple[int, int, int, Effect]] = [] # (round, TICK/EXPIRE, seq, effect)
+        self.seq = 0
+        self.active: Dict[int, Dict[str, Effect]] = {} # id(actor) -> effect id -> effect
+
+    def __len__(self):
+        return sum(len(on) for on in self.active.values())
+
+    def on(self, actor: Actor) -> Iterable[Effect]:
+        return self.active.get(id(actor), {}).values()
+
+    def event(self, due: int, kind: int, effect: Effect):
+        self.seq += 1
+        return (due, kind, self.seq, effect)
+
+    def apply(self, casts: Iterable[Tuple[EffectSpec, Actor]], now: int, source: Optional[Actor] = None) -> List[Effect]:
+        """
+        Puts effects on their targets in round `now`, e.g: every effect of a skill on every
+        target it hit in one call. Returns the effects that are new, refreshed ones aren't.
+        """
+        events = []
+        added = []
+        for spec, target in casts:
+            on = self.active.setdefault(id(target), {})
+            effect = on.get(spec.id)
+            if effect is not None:
+                effect.expires = now + spec.turns - 1
+                events.append(self.event(effect.expires, EXPIRE, effect))
+                if spec.damage and effect.next_tick is None:
+                    effect.next_tick = now
+                    events.append(self.event(now, TICK, effect))
+                continue
+            effect = on[spec.id] = Effect(spec, target, source, now + spec.turns - 1)
+            effect.apply_stats()
+            if spec.damage:
+                effect.next_tick = now
+                events.append(self.event(now, TICK, effect))
+            events.append(self.event(effect.expires, EXPIRE, effect))
+            added.append(effect)
+        heap = self.heap
+        if len(events) > len(heap):
+            heap.extend(events)
+            heapq.heapify(heap)
+        else:
+            for event in events:
+                heapq.heappush(heap, event)
+        return added
+
+    def resolve(self, now: int) -> Tuple[List[Tuple[Actor, int, List[str]]], List[Effect]]:
+        """
+        Runs everything due up to round `now`. Ticks are summed per target so each target takes
+        one hit (or heal) for all its effects. Returns [(target, damage, effect names)] in the
+        order targets were first hit, and the effects that ended.
+        """
+        heap = self.heap
+        hits: Dict[int, List] = {} # id(target) -> [target, damage, names]
+        expired = []
+        while heap and heap[0][0] <= now:
+            due, kind, _, effect = heapq.heappop(heap)
+            if effect.ended:
+                continue
+            if kind == TICK:
+                target = effect.target
+                if not target.is_alive():
+                    effect.next_tick = None
+                    continue
+                hit = hits.get(id(target))
+                if hit is None:
+                    hit = hits[id(target)] = [target, 0, []]
+                hit[1] += effect.spec.damage
+                hit[2].append(effect.spec.name)
+                following = due + effect.spec.every
+                if following <= effect.expires:
+                    effect.next_tick = following
+                    heapq.heappush(heap, self.event(following, TICK, effect))
+                else:
+                    effect.next_tick = None
+            elif due == effect.expires: # Otherwise refreshed since
+                self.end(effect)
+                expired.append(effect)
+        return [tuple(hit) for hit in hits.values()], expired
+
+    def end(self, effect: Effect):
+        effect.ended = True
+        effect.revert_stats()
+        on = self.active[id(effect.target)]
+        del on[effect.spec.id]
+        if not on:
+            del self.active[id(effect.target)]
+
+    def clear(self):
+        # The fight is over, every stat change is put back
+        for on in list(self.active.values()):
+            for effect in list(on.values()):
+                self.end(effect)
+        self.heap = []
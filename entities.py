@@ -0,0 +1,367 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Callable, Tuple
+import random
+
+from names import IndexedList
+from progression import DEFAULT as DEFAULT_PROGRESSION, Progression
+
+if TYPE_CHECKING:
+    from effects import EffectSpec # effects.py imports Actor from here
+
+def clamp(v, a, b): return max(a, min(b, v))
+def chance(chance_percent, rng=random): return rng.random() < chance_percent / 100.0 # rng: a random.Random stream, the global one by default
+# Stats data class
+@dataclass(slots=True)
+class Stats:
+    health: int = 20
+    max_health: int = 20
+    mana: int = 0
+    max_mana: int = 0
+    strength: int = 3
+    dexterity: int = 3
+    intelligence: int = 3
+    level: int = 1
+    experience: int = 0
+
+    def gain_experience(self, amount: int, progression: Optional[Progression] = None):
+        # Resolved against the world's level tables in one go, see progression.py
+        (progression or DEFAULT_PROGRESSION).apply(self, amount)
+
+    def xp_to_next_level(self, progression: Optional[Progression] = None):
+        return (progression or DEFAULT_PROGRESSION).xp_to_next(self.level)
+
+    def level_up(self, progression: Optional[Progression] = None):
+        (progression or DEFAULT_PROGRESSION).raise_stats(self, self.level + 1)
+
+# Item template, one per distinct item definition in a world, shared by every copy of the item
+@dataclass(frozen=True, slots=True)
+class ItemTemplate:
+    id: str # Id
+    name: str # Name
+    description: str # Description of item
+    type: str = 'misc' # Type of item e.g: 'misc', 'equipable', 'consumable'
+    power: Optional[int] = None # Power level (for equipable items)
+    equip_slot: Optional[str] = None # Slot to equip to e.g: 'weapon', 'armor' (for equipable items)
+    func: Optional[Callable] = field(default=None, compare=False) # Function to call when used (for consumables)
+    func_name: Optional[str] = None # Name of func in the world's functions
+
+    def bind(self, func: Optional[Callable]):
+        # The only mutation, done once when the world's functions are bound
+        object.__setattr__(self, "func", func)
+
+    def __reduce__(self):
+        # World functions live in exec'd code and can't be pickled, they get rebound by func_name
+        return (ItemTemplate, (self.id, self.name, self.description, self.type, self.power, self.equip_slot, None, self.func_name))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+def _item(template):
+    return Item.of(template)
+
+# Item, a small handle on a shared template so every item in the world has its own identity
+class Item:
+    __slots__ = ("template",)
+
+    def __init__(self, id: str, name: str, description: str, type: str = 'misc', power: Optional[int] = None,
+                 equip_slot: Optional[str] = None, func: Optional[Callable] = None, func_name: Optional[str] = None):
+        self.template = ItemTemplate(id, name, description, type, power, equip_slot, func, func_name)
+
+    @classmethod
+    def of(cls, template: ItemTemplate) -> 'Item':
+        it = cls.__new__(cls)
+        it.template = template
+        return it
+
+    def __reduce__(self):
+        return (_item, (self.template,))
+
+    def __eq__(self, other):
+        return isinstance(other, Item) and self.template == other.template
+
+    def __hash__(self):
+        return hash(self.template)
+
+    def __repr__(self):
+        return f"Item({self.template!r})"
+
+    id = property(lambda self: self.template.id)
+    name = property(lambda self: self.template.name)
+    description = property(lambda self: self.template.description)
+    type = property(lambda self: self.template.type)
+    power = property(lambda self: self.template.power)
+    equip_slot = property(lambda self: self.template.equip_slot)
+    func = property(lambda self: self.template.func)
+    func_name = property(lambda self: self.template.func_name)
+
+# Object data class
+@dataclass(slots=True)
+class Object:
+    id: str
+    name: str
+    description: str
+
+class Equipment:
+    """
+    What an actor has equipped, by slot. Works like the {"weapon": ..., "armor": ...} dict it
+    replaces at a third of the size: weapon and armor are fields, any other slot a world uses
+    goes in a dict made the first time one is equipped.
+    """
+    __slots__ = ("weapon", "armor", "other")
+
+    def __init__(self, slots: Optional[Dict[str, Optional[Item]]] = None):
+        self.weapon: Optional[Item] = None
+        self.armor: Optional[Item] = None
+        self.other: Optional[Dict[str, Optional[Item]]] = None
+        for slot, it in (slots or {}).items():
+            self[slot] = it
+
+    def __getitem__(self, slot) -> Optional[Item]:
+        if slot == "weapon":
+            return self.weapon
+        if slot == "armor":
+            return self.armor
+        if self.other is None:
+            raise KeyError(slot)
+        return self.other[slot]
+
+    def __setitem__(self, slot, it: Optional[Item]):
+        if slot == "weapon":
+            self.weapon = it
+        elif slot == "armor":
+            self.armor = it
+        else:
+            if self.other is None:
+                self.other = {}
+            self.other[slot] = it
+
+    def get(self, slot, default=None) -> Optional[Item]:
+        try:
+            return self[slot]
+        except KeyError:
+            return default
+
+    def __contains__(self, slot):
+        return slot in ("weapon", "armor") or (self.other is not None and slot in self.other)
+
+    def __iter__(self):
+        yield "weapon"
+        yield "armor"
+        if self.other is not None:
+            yield from self.other
+
+    def __len__(self):
+        return 2 + (len(self.other) if self.other is not None else 0)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(slot, self[slot]) for slot in self]
+
+    def values(self):
+        return [self[slot] for slot in self]
+
+    def __eq__(self, other):
+        if isinstance(other, (Equipment, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Equipment({dict(self.items())!r})"
+
+@dataclass(slots=True)
+class Actor:
+    id: str
+    name: str
+    description: Optional[str] = None
+    stats: Stats = field(default_factory=Stats)
+    ai: str = 'aggressive' # Behaviour of actor e.g: 'passive', 'aggressive'
+    equip: Equipment = field(default_factory=Equipment) # Slot -> item, like a dict
+    items: List[Item] = field(default_factory=IndexedList)
+    skills: 'SkillTable' = field(default_factory=lambda: NO_SKILLS) # Actors without skills share one empty table, see learn()
+    dialogue: Optional[str] = None # Id of the actor's tree in the world's dialogue library, see dialogue.py
+
+    def take_damage(self, amount: int):
+        self.stats.health = clamp(self.stats.health - amount, 0, self.stats.max_health)
+
+    def heal(self, amount: int):
+        self.stats.health = clamp(self.stats.health + amount, 0, self.stats.max_health)
+
+    def add_item(self, item: Item):
+        self.items.append(item)
+
+    def consume_item(self, item_id):
+        for i,it in enumerate(self.items):
+            if it.id == item_id and it.type == "consumable":
+                if it.func:
+                    it.func(self)
+                return self.items.pop(i)
+        return None
+
+    def equip_item(self, item_id):
+        for it in self.items:
+            if it.id == item_id and it.type == "equipable" and it.equip_slot:
+                slot = it.equip_slot
+                self.equip[slot] = it
+                return f"{self.name} equips {it.name}."
+        return "Cannot equip."
+
+    def unequip(self, slot):
+        if slot in self.equip:
+            name = self.equip[slot].name
+            self.equip[slot] = None
+            return f"{self.name} unequips {name}"
+        return "Nothing to unequip"
+
+    def remove_item(self, item_id):
+        for i,it in enumerate(self.items):
+            if it.id == item_id:
+                return self.items.pop(i)
+        return None
+
+    def is_alive(self):
+        return self.stats.health > 0
+
+    def attack_power(self):
+        base = self.stats.strength
+        weapon = self.equip.get("weapon")
+        if weapon and weapon.power:
+            base += weapon.power
+        return base
+
+    def defense(self):
+        base = int(self.stats.dexterity / 2)
+        armor = self.equip.get("armor")
+        if armor and armor.power:
+            base += armor.power
+        return base
+
+    def learn(self, skill: 'Skill'):
+        if self.skills is NO_SKILLS:
+            self.skills = SkillTable()
+        self.skills.append(skill)
+
+    def use_skill(self, skill_id: str, target: 'Actor'):
+        # Instant part only, timed effects need a fight to run in (Combat.cast)
+        sk = self.skills.get(skill_id)
+        if sk is None:
+            return "Skill not found."
+        if self.stats.mana < sk.mana_cost:
+            return "Not enough mana."
+        self.stats.mana -= sk.mana_cost
+        sk.func(self, target)
+        return f"{self.name} uses {sk.name}."
+
+# Skill data class
+@dataclass(slots=True)
+class Skill:
+    id: str
+    name: str
+    description: str
+    mana_cost: int
+    power: int
+    source_func: Optional[Callable] = None
+    func_name: Optional[str] = None # Name of source_func in the world's functions
+    target: str = "enemy" # Who it's cast on: 'enemy', 'enemies' (every opponent) or 'self'
+    effects: Tuple['EffectSpec', ...] = () # Timed effects it puts on its targets, see effects.py
+
+    def __getstate__(self):
+        # Like item funcs, source_func is rebound by func_name after unpickling or copying
+        state = {name: getattr(self, name) for name in Skill.__slots__}
+        if self.func_name:
+            state["source_func"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def func(self, user: Actor, target: Actor):
+        if self.source_func:
+            self.source_func(self, user, target)
+
+class SkillTable(IndexedList):
+    """An actor's skills, found by id without a scan (and by name like any IndexedList)."""
+    __slots__ = ("ids",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.ids: Optional[Dict[str, Skill]] = None
+
+    def __reduce_ex__(self, protocol):
+        return (SkillTable, (list(self),))
+
+    def get(self, skill_id) -> Optional[Skill]:
+        if self.ids is None:
+            self.ids = {}
+            for sk in self:
+                self.ids.setdefault(sk.id, sk)
+        return self.ids.get(skill_id)
+
+    # Any change drops the id table, it's built again on the next get
+
+    def append(self, obj):
+        super().append(obj)
+        self.ids = None
+
+    def extend(self, objs):
+        super().extend(objs)
+        self.ids = None
+
+    def insert(self, i, obj):
+        super().insert(i, obj)
+        self.ids = None
+
+    def pop(self, i=-1):
+        self.ids = None
+        return super().pop(i)
+
+    def clear(self):
+        super().clear()
+        self.ids = None
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self.ids = None
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self.ids = None
+
+class NoSkills(SkillTable):
+    """The one empty skill table every actor without skills shares (NO_SKILLS), Actor.learn swaps in a table of its own."""
+    __slots__ = ()
+
+    def _shared(self, *args, **kwargs):
+        raise TypeError("NO_SKILLS is shared by every actor without skills, use Actor.learn")
+
+    append = extend = insert = pop = remove = clear = __setitem__ = __delitem__ = __iadd__ = _shared
+
+    def __reduce_ex__(self, protocol):
+        return (no_skills, ())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+def no_skills():
+    return NO_SKILLS
+
+NO_SKILLS = NoSkills()
+
+@dataclass(slots=True)
+class Room:
+    id: str
+    name: str
+    description: str
+    exits: List[str]
+    items: List[Item]
+    enemies: List[Actor]
+    npcs: List[Actor]
+    objects: List[Object]
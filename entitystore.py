@@ -0,0 +1,170 @@
+# Struct of arrays store for actor stats
+# Usage: python3 main.py <example/world_file> --entity-store
+#
+# Moves the stats of every enemy and NPC of an in memory world into one NumPy array per stat,
+# each actor's stats become a StoreStats view on its slot. Actors work as before (take_damage,
+# heal, is_alive, gain_experience all go through the view) and world wide updates are one
+# vectorized operation over the arrays instead of a loop over every room, e.g:
+#   world.entities.regen(10)   every wounded actor heals 10% of their max health
+#   world.entities.damage(3)   damage over time on everyone
+# Bulk updates don't go through the rooms, so they don't show up in a game's save change log.
+#
+# Copies of an actor (copy on write rooms, respawns) get a slot of their own in the same store
+# and a slot is given back when its view is garbage collected. Pickling a view gives a plain
+# Stats, so snapshots and saves never depend on the store.
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("entitystore.py needs numpy: pip install numpy")
+
+from entities import Stats
+from world import Rooms, World
+
+FIELDS = ("health", "max_health", "mana", "max_mana", "strength", "dexterity", "intelligence", "level", "experience")
+
+class EntityStore:
+    def __init__(self, capacity=1024):
+        self.capacity = max(1, capacity)
+        self.size = 0 # Slots handed out so far, free ones below it are in `free`
+        self.free: List[int] = []
+        self.used = np.zeros(self.capacity, dtype=bool)
+        for name in FIELDS:
+            setattr(self, name, np.zeros(self.capacity, dtype=np.int64))
+
+    def __len__(self):
+        return self.size - len(self.free)
+
+    def grow(self):
+        capacity = self.capacity * 2
+        self.used = np.concatenate([self.used, np.zeros(capacity - self.capacity, dtype=bool)])
+        for name in FIELDS:
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(capacity - self.capacity, dtype=np.int64)]))
+        self.capacity = capacity
+
+    def add(self, values: Tuple[int, ...]) -> 'StoreStats':
+        # values in FIELDS order
+        if self.free:
+            slot = self.free.pop()
+        else:
+            if self.size == self.capacity:
+                self.grow()
+            slot = self.size
+            self.size += 1
+        self.used[slot] = True
+        for name, value in zip(FIELDS, values):
+            getattr(self, name)[slot] = value
+        return StoreStats(self, slot)
+
+    def adopt(self, stats) -> 'StoreStats':
+        return self.add(tuple(getattr(stats, name) for name in FIELDS))
+
+    def release(self, slot: int):
+        self.used[slot] = False
+        self.free.append(slot)
+
+    # Bulk updates, `mask` narrows them down to some slots e.g: store.level > 5
+
+    def select(self, mask=None):
+        n = self.size
+        m = self.used[:n] & (self.health[:n] > 0)
+        return m if mask is None else m & mask[:n]
+
+    def alive(self) -> int:
+        return int(np.count_nonzero(self.select()))
+
+    def regen(self, percent: int, mask=None) -> int:
+        """Heals every wounded actor by percent of their max health (at least 1), returns how many."""
+        n = self.size
+        health, max_health = self.health[:n], self.max_health[:n]
+        m = self.select(mask) & (health < max_health)
+        step = np.maximum(1, max_health * percent // 100)
+        health[m] = np.minimum(health + step, max_health)[m]
+        return int(np.count_nonzero(m))
+
+    def damage(self, amount: int, mask=None) -> int:
+        """Takes amount of health from every living actor, returns how many died."""
+        health = self.health[:self.size]
+        m = self.select(mask)
+        health[m] = np.maximum(0, health - amount)[m]
+        return int(np.count_nonzero(m & (health == 0)))
+
+    def scale(self, factor: float, fields=("max_health", "strength", "dexterity", "intelligence"), mask=None) -> int:
+        """Difficulty scaling: multiplies fields by factor (at least 1), health follows max health."""
+        n = self.size
+        m = self.used[:n] if mask is None else self.used[:n] & mask[:n]
+        for name in fields:
+            column = getattr(self, name)[:n]
+            column[m] = np.maximum(1, np.rint(column * factor)).astype(np.int64)[m]
+        if "max_health" in fields:
+            health = self.health[:n]
+            health[m] = np.minimum(health, self.max_health[:n])[m]
+        return int(np.count_nonzero(m))
+
+def _column(name):
+    def get(self):
+        return int(getattr(self.store, name)[self.slot])
+    def set(self, value):
+        getattr(self.store, name)[self.slot] = value
+    return property(get, set)
+
+class StoreStats:
+    """Stats of one actor, kept in an EntityStore slot. Works wherever a Stats does."""
+    __slots__ = ("store", "slot")
+
+    def __init__(self, store: EntityStore, slot: int):
+        self.store = store
+        self.slot = slot
+
+    health = _column("health")
+    max_health = _column("max_health")
+    mana = _column("mana")
+    max_mana = _column("max_mana")
+    strength = _column("strength")
+    dexterity = _column("dexterity")
+    intelligence = _column("intelligence")
+    level = _column("level")
+    experience = _column("experience")
+
+    # Stats' methods only use the fields, they work on a view as they are
+    gain_experience = Stats.gain_experience
+    xp_to_next_level = Stats.xp_to_next_level
+    level_up = Stats.level_up
+
+    def values(self) -> Tuple[int, ...]:
+        return tuple(getattr(self, name) for name in FIELDS)
+
+    def __del__(self):
+        try:
+            self.store.release(self.slot)
+        except (AttributeError, TypeError):
+            pass # Interpreter shutdown
+
+    def __copy__(self):
+        return self.store.add(self.values())
+
+    def __deepcopy__(self, memo):
+        return self.store.add(self.values())
+
+    def __reduce__(self):
+        return (Stats, self.values())
+
+    def __eq__(self, other):
+        if isinstance(other, (Stats, StoreStats)):
+            return self.values() == tuple(getattr(other, name) for name in FIELDS)
+        return NotImplemented
+
+    def __repr__(self):
+        return "StoreStats(" + ", ".join(f"{name}={getattr(self, name)}" for name in FIELDS) + ")"
+
+def attach(world: World, capacity: Optional[int] = None) -> EntityStore:
+    """Moves the stats of every enemy and NPC in the world into a new store, kept as world.entities."""
+    if not isinstance(world.rooms, Rooms):
+        raise ValueError("The entity store needs a world loaded in memory, not --lazy")
+    actors = [ac for room in world.rooms.values() for ac in (*room.enemies, *room.npcs)]
+    store = EntityStore(capacity or len(actors) * 2)
+    for ac in actors:
+        ac.stats = store.adopt(ac.stats)
+    world.entities = store
+    return store
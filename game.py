@@ -0,0 +1,608 @@
+import sys
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from entities import Stats, Actor, Room, SkillTable
+from combat import Combat, PROMPT
+from dialogue import Conversation, PROMPT as TALK_PROMPT
+from output import Output, BufferedOutput
+from world import World, RoomOverlay, load_world
+from graph import RoomGraph, build_graph
+from roomstore import load_lazy_world
+from savegame import save_game, load_game, apply_room_changes, encode_npc, find_npc
+from scheduler import Scheduler
+from replay import Recorder
+from metrics import Metrics
+
+def create_player() -> Actor:
+    s = Stats(health=10, max_health=10, mana=5, max_mana=5)
+    p = Actor(id="player_1", name="Player", ai="player", stats=s)
+    return p
+
+HELP_TEXT = """
+Usage: '$ <Command> [<Arguments>]'
+
+Commands:
+
+     $ help                                 : Prints all commands
+     $ look <any/Any>                       : Look at something
+     $ pickup [Item Name]                   : Picks up items
+     $ (go/move) [north/east/south/west]    : Picks up items
+     $ travel [Room Name]                   : Walks the shortest way to a room
+     $ (inv/inventory) <Item Name>          : Shows all your items or just a specific item
+     $ attack [Enemy Name]                  : Starts combat with an enemy
+     $ talk [NPC Name]                      : Talks to someone
+     $ status                               : Shows your current status
+     $ save <File>                          : Saves the game
+     $ load <File>                          : Loads a saved game
+     $ quit                                 : Quits the engine
+
+"""
+
+# Command names as run_command knows them, anything else is reported as "unknown"
+COMMANDS = frozenset(("help", "quit", "look", "pickup", "move", "go", "travel", "attack", "talk", "inventory", "inv", "status", "save", "load"))
+
+class Game():
+    def __init__(self, worldfile=None, use_cache=True, lazy=False, room_cache_size=256, world: Optional[World] = None, interactive=True, out: Optional[Output] = None,
+                 save_path="savegame.json", autosave=False, workers: Optional[int] = None, simulate=False, clock: Optional[Callable[[], float]] = None,
+                 seed: Optional[int] = None, recorder: Optional[Recorder] = None, metrics: Optional[Metrics] = None, entity_store=False,
+                 watch: Optional[float] = None):
+        # Where game text goes, flushed once per command
+        self.out: Output = out if out is not None else BufferedOutput()
+        self.rooms: dict[str, Room] = {}
+        self.world: Optional[World] = None
+        self.use_cache = use_cache
+        self.lazy = lazy # Load rooms on demand instead of all at once
+        self.room_cache_size = room_cache_size
+        self.workers = workers # Processes for parsing a sharded world, None for one per core
+        self.entity_store = entity_store # Keep actor stats in NumPy arrays, needs numpy
+        # Seconds between checks of the world's files for hot reload, None to not watch. Shared
+        # worlds are watched by whoever loaded them, games only catch up, see hotreload.py
+        self.watch = watch
+        self.watcher = None
+        self.reloads_seen = 0 # Of world.reloads
+        self.stale_rooms: Set[str] = set() # Reloaded rooms still to catch up with, after a fight in them
+        # Interactive games read combat actions with input(), otherwise the caller feeds them through handle_line
+        self.interactive = interactive
+        self.running = True
+        self.combat: Optional[Combat] = None
+        self.combat_room_id: Optional[str] = None
+        self.conversation: Optional[Conversation] = None
+        self.conversation_room_id: Optional[str] = None
+        self.npc_state: Optional[dict] = None # What the NPC talked to was like after the last line, see log_npc
+        # What changed per room since the world was loaded, this is what a save stores
+        self.changes: Dict[str, dict] = {}
+        self.save_path = save_path # None turns save/load off
+        self.autosave = autosave # Save after every command that changed something
+        self.unsaved = False
+        self.worldfile = worldfile
+        self.shared_world = world is not None
+        # All of the session's randomness comes from this stream, each fight and the world
+        # simulation get their own streams seeded from it, see replay.py
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.rng = random.Random(self.seed)
+        self.recorder = recorder
+        # Latency and entity counts, None (the default) keeps every call site down to one check
+        self.metrics = metrics
+        self.input_seconds = 0.0 # Time spent waiting on input(), left out of command latency
+        self.player: Actor = self.create_player()
+        self.current_room: Optional[Room] = None
+        self.init_world(worldfile, world)
+        self.player.skills = SkillTable(self.world.player_skills)
+        # World simulation between commands (regen, respawns, wandering NPCs), off by default
+        self.clock = recorder.clock(clock or time.monotonic) if recorder and simulate else clock
+        self.sim: Optional[Scheduler] = None
+        if simulate:
+            self.start_sim()
+        if metrics is not None:
+            metrics.track(self.collect_metrics)
+
+    def init_world(self, worldfile=None, world: Optional[World] = None):
+        if world is not None:
+            # Shared world e.g: one template for every server session, rooms are copied on write
+            self.world = world
+            self.rooms = RoomOverlay(world.rooms, world.functions)
+            self.reloads_seen = len(world.reloads)
+            self.current_room = self.rooms.get(world.start_room)
+            self.out.say("start", "You find yourself in {room}", room=self.current_room.name)
+            return
+        if worldfile is None:
+            arguments = sys.argv
+            if len(arguments) < 2:
+                raise Exception("Usage: python3 main.py <example/world_file>")
+            worldfile = arguments[1]
+        self.worldfile = worldfile
+        try:
+            #if os.path.isdir(worldfile) == False:
+            #    raise Exception("World path is not a directory.")
+            self.load_rooms()
+            self.current_room = self.rooms.get(self.world.start_room)
+            dangling = self.graph().dangling
+            if dangling:
+                room_id, exit_name, target = dangling[0]
+                self.out.say("world.dangling_exits", "Warning: {count} exits lead to missing rooms e.g: {exit} in {room} to {target}",
+                             count=len(dangling), exit=exit_name, room=room_id, target=target)
+        except Exception as e:
+            self.out.say("error", "Error: {error}", error=e)
+        self.out.say("start", "You find yourself in {room}", room=self.current_room.name)
+        self.out.flush()
+
+    def load_rooms(self):
+        started = time.perf_counter()
+        if self.lazy:
+            self.world = load_lazy_world(self.worldfile, capacity=self.room_cache_size, workers=self.workers)
+        else:
+            self.world = load_world(self.worldfile, use_cache=self.use_cache, workers=self.workers)
+        self.rooms = self.world.rooms
+        if self.entity_store:
+            from entitystore import attach
+            attach(self.world)
+        self.reloads_seen = len(self.world.reloads)
+        if self.watch is not None:
+            if self.watcher is None:
+                from hotreload import WorldWatcher
+                self.watcher = WorldWatcher(self.world, self.worldfile, self.watch, metrics=self.metrics)
+            else:
+                self.watcher.world = self.world
+        if self.metrics is not None:
+            self.metrics.observe("world_load_seconds", time.perf_counter() - started, store="lazy" if self.lazy else "eager")
+
+    def reset_rooms(self):
+        # Back to the rooms as data.json has them, before a save is applied
+        if self.shared_world:
+            self.rooms = RoomOverlay(self.world.rooms, self.world.functions)
+            self.reloads_seen = len(self.world.reloads)
+        else:
+            # Only the rooms this game wrote to differ from the world as loaded
+            for room in self.rooms.restore(self.world.functions):
+                if self.world.entities is not None:
+                    for ac in (*room.enemies, *room.npcs):
+                        ac.stats = self.world.entities.adopt(ac.stats)
+        self.changes = {}
+        self.stale_rooms = set()
+        self.combat = None
+        self.conversation = None
+        self.current_room = self.rooms.get(self.world.start_room)
+        if self.sim:
+            self.start_sim()
+
+    def sync_world(self):
+        # Catch up with the rooms hot reloads replaced since the last command
+        reloads = self.world.reloads
+        if len(reloads) == self.reloads_seen:
+            return
+        for room_ids in reloads[self.reloads_seen:]:
+            self.stale_rooms |= room_ids
+        self.reloads_seen = len(reloads)
+        self.refresh_rooms()
+
+    def refresh_rooms(self):
+        # Reloaded rooms start over from their new definition with this game's changes applied again
+        busy = self.combat_room_id if self.combat else None
+        gone = set()
+        for room_id in list(self.stale_rooms):
+            if room_id == busy:
+                continue # The fight goes on with the enemies it has, end_combat comes back here
+            self.stale_rooms.discard(room_id)
+            if self.shared_world:
+                self.rooms.own.pop(room_id, None)
+            if room_id not in self.rooms:
+                self.changes.pop(room_id, None)
+                gone.add(room_id)
+            elif room_id in self.changes:
+                apply_room_changes(self.rooms.for_write(room_id), self.changes[room_id], self.world.functions, self.visitor)
+        if gone and self.sim:
+            self.sim.forget(gone)
+        room = self.rooms.get(self.current_room.id)
+        if room is None:
+            room = self.rooms.get(self.world.start_room)
+            self.out.say("world.room_gone", "{room} is gone, you find yourself in {start}.", room=self.current_room.name, start=room.name)
+        self.current_room = room
+
+    def start_sim(self):
+        self.sim = Scheduler(self, self.clock or time.monotonic, random.Random(self.rng.getrandbits(64)))
+        self.sim.entered(self.current_room)
+
+    def room_changes(self, room_id) -> dict:
+        self.unsaved = True
+        return self.changes.setdefault(room_id, {})
+
+    def create_player(self) -> Actor:
+        return create_player()
+
+    def set_current_room(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is not None:
+            self.current_room = room
+            if self.sim:
+                self.sim.entered(room)
+            if self.metrics is not None:
+                self.metrics.observe("room_items", len(room.items))
+
+    def writable_room(self) -> Room:
+        # Always go through the store before changing a room so lazy stores know it's dirty
+        self.current_room = self.rooms.for_write(self.current_room.id)
+        return self.current_room
+
+    def help(self):
+        self.out.say("help", HELP_TEXT)
+
+    def look(self, arguments):
+        if len(arguments) > 1:
+            arg1 = " ".join(arguments[1:])
+            it = self.current_room.items.find(arg1)
+            if it:
+                self.out.say("look.item", "{name}\n    {description}", name=it.name, description=it.description)
+                return
+            obj = self.current_room.objects.find(arg1)
+            if obj:
+                self.out.say("look.object", "{name}\n    {description}", name=obj.name, description=obj.description)
+                return
+            enm = self.current_room.enemies.find(arg1)
+            if enm:
+                self.out.say("look.enemy", "{name} Level: {level} Health: {health} / {max_health}\n    {description}", name=enm.name, level=enm.stats.level, health=enm.stats.health, max_health=enm.stats.max_health, description=enm.description)
+                return
+            self.out.say("look.not_found", "Couldn't find: {name}", name=arg1)
+        else:
+            out = self.out
+            if not out.enabled:
+                return
+            room = self.current_room
+            out.say("look.room", "You are in {name}\n     {description} \n", name=room.name, description=room.description)
+            out.say("look.contents", "There is:")
+            for th in (*room.items, *room.objects, *room.enemies):
+                out.say("look.thing", "     {name}", name=th.name)
+            out.say("look.contents_end", "\n")
+            out.say("look.exits", "You can go:")
+            for key in room.exits:
+                out.say("look.exit", "     {exit}", exit=key)
+
+    def go(self, arguments):
+        if len(arguments) > 1:
+            arg1 = " ".join(arguments[1:]).lower()
+            for ex in self.current_room.exits:
+                if arg1 == ex:
+                    self.set_current_room(self.current_room.exits[ex])
+                    self.out.say("go", "{actor} went {exit} to {room}.", actor=self.player.name, exit=arg1, room=self.current_room.name)
+                    if len(self.current_room.enemies) > 0:
+                        self.start_combat(self.writable_room().enemies)
+                    return
+            self.out.say("go.not_found", "Exit: {exit} not found.", exit=arg1)
+            return
+        else:
+            self.out.say("usage", "Usage: $ (go/move) <Exit Name>")
+
+    def graph(self) -> RoomGraph:
+        if self.world.graph is None:
+            # Worlds put together in code don't come with one
+            self.world.graph = build_graph(self.world.rooms, self.world.start_room)
+        return self.world.graph
+
+    def travel(self, arguments):
+        if len(arguments) < 2:
+            self.out.say("usage", "Usage: $ travel [Room Name]")
+            return
+        query = " ".join(arguments[1:])
+        room_id, path = self.graph().route(self.current_room.id, query)
+        if room_id is None:
+            self.out.say("travel.not_found", "Room: {name} not found.", name=query)
+            return
+        if path is None:
+            self.out.say("travel.no_path", "There is no way to {room} from here.", room=self.rooms[room_id].name)
+            return
+        if not path:
+            self.out.say("travel.here", "You are already in {room}.", room=self.current_room.name)
+            return
+        self.out.say("travel", "{actor} sets off for {room}, {steps} rooms away.", actor=self.player.name, room=self.rooms[room_id].name, steps=len(path))
+        for next_id in path:
+            exit_name = next((ex for ex, target in self.current_room.exits.items() if target == next_id), None)
+            if exit_name is None:
+                # The room changed under us, give up rather than guess
+                self.out.say("travel.blocked", "The way on from {room} is gone.", room=self.current_room.name)
+                return
+            fight = len(self.rooms[next_id].enemies) > 0
+            self.go(["go", exit_name])
+            if fight:
+                # Whatever way the fight went, the journey stops there
+                return
+
+    def start_combat(self, enemies):
+        combat = Combat(self.player, enemies, out=self.out, rng=random.Random(self.rng.getrandbits(64)), metrics=self.metrics,
+                        progression=self.world.progression)
+        self.combat_room_id = self.current_room.id
+        if self.interactive:
+            combat.run(self.read_line)
+            self.end_combat(combat)
+            return
+        combat.start()
+        if combat.over():
+            combat.finish()
+            self.end_combat(combat)
+        else:
+            self.combat = combat
+
+    def end_combat(self, combat):
+        # Dead enemies leave the room and the room's enemies go into the change log
+        room = self.rooms.for_write(self.combat_room_id)
+        for e in combat.participants:
+            if not e.is_alive():
+                room.enemies.discard(e)
+                if self.sim:
+                    self.sim.died(room.id, e)
+        self.log_enemies(room)
+        if self.sim:
+            self.sim.wounded(room)
+            self.sim.resync()
+        self.combat = None
+        if self.stale_rooms:
+            self.refresh_rooms()
+
+    def log_enemies(self, room: Room):
+        self.room_changes(room.id)["enemies"] = [[e.id, e.stats.health] for e in room.enemies]
+
+    def npc_origins(self, room: Room) -> List[Tuple[str, int]]:
+        # Where each of the room's NPCs comes from, as (home room id, index among the NPCs the
+        # home room defines). Ids can repeat across rooms (every generated room has a merchant_0),
+        # the origin can't.
+        return [(entry[1], entry[2]) for entry in self.npc_entries(room)]
+
+    def npc_entries(self, room: Room) -> List[list]:
+        # The room's "npcs" log, kept in step with room.npcs. Without one the room still has the
+        # NPCs it was defined with.
+        logged = self.changes.get(room.id, {}).get("npcs")
+        if logged is None:
+            return [[npc.id, room.id, i] for i, npc in enumerate(room.npcs)]
+        return list(logged)
+
+    def move_npc(self, room_id, index, target_id) -> Actor:
+        """Moves the room's index-th NPC to another room, both rooms go into the change log."""
+        room = self.rooms.for_write(room_id)
+        target = self.rooms.for_write(target_id)
+        entries = self.npc_entries(room)
+        target_entries = self.npc_entries(target)
+        npc = room.npcs.pop(index)
+        target.npcs.append(npc)
+        target_entries.append(entries.pop(index))
+        self.room_changes(room.id)["npcs"] = entries
+        self.room_changes(target.id)["npcs"] = target_entries
+        return npc
+
+    def log_npc(self, room_id, npc: Actor, before: dict) -> dict:
+        # Logs the state of an NPC talked to if it changed since `before`, returns its state now
+        state = encode_npc(npc)
+        room = self.rooms.get(room_id)
+        index = next((i for i, x in enumerate(room.npcs) if x is npc), None) if room is not None else None
+        if state == before or index is None:
+            return state
+        entries = self.npc_entries(room)
+        entries[index] = entries[index][:3] + [state]
+        self.room_changes(room_id)["npcs"] = entries
+        return state
+
+    def visitor(self, home, index, npc_id) -> Optional[Actor]:
+        # A fresh copy of an NPC as its home room defines it, for rooms it wandered into
+        room = self.rooms.original(home, self.world.functions)
+        i = find_npc(room.npcs, index, npc_id) if room is not None else None
+        if i is None:
+            return None
+        npc = room.npcs[i]
+        if self.world.entities is not None:
+            npc.stats = self.world.entities.adopt(npc.stats)
+        return npc
+
+    def attack(self, arguments):
+        if len(arguments) > 1:
+            arg1 = " ".join(arguments[1:]).lower()
+            enm = self.current_room.enemies.find(arg1)
+            if enm:
+                # Look it up again in case writable_room handed out a fresh copy of the room
+                self.start_combat([self.writable_room().enemies.find(arg1)])
+                return
+            self.out.say("attack.not_found", "Enemy: {name} not found.", name=arg1)
+        else:
+            self.out.say("usage", "Usage: $ attack [Enemy Name]")
+
+    def talk(self, arguments):
+        if len(arguments) < 2:
+            self.out.say("usage", "Usage: $ talk [NPC Name]")
+            return
+        arg1 = " ".join(arguments[1:]).lower()
+        npc = self.current_room.npcs.find(arg1)
+        if not npc:
+            self.out.say("talk.not_found", "NPC: {name} not found.", name=arg1)
+            return
+        tree = self.world.dialogues.get(npc.dialogue) if npc.dialogue else None
+        if tree is None:
+            self.out.say("talk.silent", "{name} has nothing to say.", name=npc.name)
+            return
+        # Hooks may change the NPC, so talk to this game's own copy of it. Look it up again in
+        # case writable_room handed out a fresh copy of the room
+        npc = self.writable_room().npcs.find(arg1)
+        self.conversation_room_id = self.current_room.id
+        self.npc_state = encode_npc(npc)
+        conversation = Conversation(tree, self.player, npc, self.world.functions, self.out)
+        if self.interactive:
+            conversation.run(self.read_line)
+            self.log_npc(self.conversation_room_id, npc, self.npc_state)
+            return
+        conversation.start()
+        self.npc_state = self.log_npc(self.conversation_room_id, npc, self.npc_state)
+        if not conversation.over():
+            self.conversation = conversation
+
+    def pickup(self, arguments):
+        if len(arguments) > 1:
+            arg1 = " ".join(arguments[1:])
+            if self.current_room.items.find(arg1):
+                # Look it up again in case writable_room handed out a fresh copy of the room
+                items = self.writable_room().items
+                it = items.discard(items.find(arg1))
+                self.player.add_item(it)
+                self.room_changes(self.current_room.id).setdefault("taken", []).append(it.id)
+                self.out.say("pickup", "{actor} picked up {item}.", actor=self.player.name, item=it.name)
+                return
+            self.out.say("pickup.not_found", "{name} not found.", name=arg1)
+        else:
+            self.out.say("usage", "Usage: $ pickup [Item Name]")
+    
+    def inventory(self, arguments):
+        items = self.player.items
+        if len(arguments) > 1:
+            arg1 = " ".join(arguments[1:]).lower()
+            it = items.find(arg1)
+            if it:
+                self.out.say("inventory.item", "{name}\n    desc: {description}\n    type: {type}\n", name=it.name, description=it.description, type=it.type)
+                return
+            self.out.say("inventory.not_found", "Couldn't find: {name}.", name=arg1)
+            return
+        else:
+            if len(items) == 0:
+                self.out.say("inventory.empty", "{actor}'s inventory is empty.", actor=self.player.name)
+            elif self.out.enabled:
+                self.out.say("inventory", "You have: \n")
+                for it in items:
+                    self.out.say("inventory.entry", "      {name}", name=it.name)
+                self.out.say("inventory.end", "\n")
+            return
+
+    def status(self):
+        s = self.player.stats
+        self.out.say("status", "--- Name: {name} --- Lvl: {level} --- Exp: {experience} / {next_level} ---\nSTR: {strength} \nDEX: {dexterity} \nINT: {intelligence}",
+                     name=self.player.name, level=s.level, experience=s.experience, next_level=s.xp_to_next_level(self.world.progression), strength=s.strength, dexterity=s.dexterity, intelligence=s.intelligence)
+
+    def run_command(self, arguments):
+        if self.metrics is None:
+            self.dispatch(arguments)
+            return
+        cmd = arguments[0].lower()
+        started = time.perf_counter()
+        waited = self.input_seconds
+        try:
+            self.dispatch(arguments)
+        finally:
+            # Interactive fights read their actions inside the command, that time isn't ours
+            elapsed = time.perf_counter() - started - (self.input_seconds - waited)
+            self.metrics.observe("command_seconds", elapsed, command=cmd if cmd in COMMANDS else "unknown")
+
+    def dispatch(self, arguments):
+        cmd = arguments[0].lower()
+        match cmd:
+            case "help": self.help()
+            case "quit":
+                self.out.say("quit", "Goodbye!")
+                self.running = False
+            case "look": self.look(arguments)
+            case "pickup": self.pickup(arguments)
+            case "move": self.go(arguments)
+            case "go": self.go(arguments)
+            case "travel": self.travel(arguments)
+            case "attack": self.attack(arguments)
+            case "talk": self.talk(arguments)
+            case "inventory": self.inventory(arguments)
+            case "inv": self.inventory(arguments)
+            case "status": self.status()
+            case "save": self.save(arguments)
+            case "load": self.load(arguments)
+            case _: self.out.say("unknown_command", "Command not found: {command}", command=cmd)
+
+    def save(self, arguments):
+        if self.save_path is None:
+            self.out.say("save.disabled", "Saving is disabled.")
+            return
+        path = " ".join(arguments[1:]) or self.save_path
+        save_game(self, path)
+        self.unsaved = False
+        self.out.say("save", "Game saved to {path}.", path=path)
+
+    def load(self, arguments):
+        if self.save_path is None:
+            self.out.say("save.disabled", "Saving is disabled.")
+            return
+        path = " ".join(arguments[1:]) or self.save_path
+        if not os.path.exists(path):
+            self.out.say("load.not_found", "No save found at {path}.", path=path)
+            return
+        load_game(self, path)
+        self.unsaved = False
+        self.out.say("load", "Game loaded from {path}.", path=path)
+        self.out.say("start", "You find yourself in {room}", room=self.current_room.name)
+
+    def after_command(self):
+        if self.watcher:
+            self.watcher.poll()
+        if self.sim and self.combat is None:
+            self.sim.advance()
+        if self.autosave and self.unsaved and self.combat is None:
+            save_game(self, self.save_path)
+            self.unsaved = False
+        self.out.flush()
+        if self.metrics is not None:
+            self.metrics.maybe_export()
+
+    def collect_metrics(self, metrics: Metrics):
+        metrics.add("sessions", 1)
+        metrics.add("rooms_in_memory", self.rooms.in_memory())
+        metrics.add("inventory_items", len(self.player.items))
+        if not self.shared_world:
+            metrics.add("world_rooms", len(self.rooms))
+        if self.sim:
+            metrics.add("world_queue_depth", len(self.sim.queue))
+
+    def close(self):
+        # Done with this game, it stops reporting into the metrics
+        if self.metrics is not None:
+            self.metrics.untrack(self.collect_metrics)
+        if not self.shared_world and hasattr(self.rooms, "close"):
+            self.rooms.close() # Lazy stores drop their state file
+
+    def prompt(self):
+        return PROMPT if self.combat else TALK_PROMPT if self.conversation else "$ "
+
+    def read_line(self, prompt):
+        if self.metrics is None:
+            line = input(prompt)
+        else:
+            started = time.perf_counter()
+            try:
+                line = input(prompt)
+            finally:
+                self.input_seconds += time.perf_counter() - started
+        if self.recorder:
+            self.recorder.command(line)
+        return line
+
+    def handle_line(self, line):
+        # One line of input, either a combat action or a command
+        if self.recorder:
+            self.recorder.command(line)
+        try:
+            self.sync_world()
+            if self.combat:
+                if self.combat.step(line):
+                    self.end_combat(self.combat)
+            elif self.conversation:
+                over = self.conversation.step(line)
+                self.npc_state = self.log_npc(self.conversation_room_id, self.conversation.npc, self.npc_state)
+                if over:
+                    self.conversation = None
+            else:
+                self.run_command(line.split(" "))
+        except Exception as e:
+            self.out.say("error", "Error: {error}", error=e)
+        self.after_command()
+
+    def repl(self):
+        while self.running:
+            try:
+                line = self.read_line("$ ")
+                self.sync_world()
+                self.run_command(line.split(" "))
+            except EOFError:
+                self.out.say("exit", "Exiting.")
+                break
+            except Exception as e:
+                self.out.say("error", "Error: {error}", error=e)
+            finally:
+                self.after_command()
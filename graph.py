@@ -0,0 +1,261 @@
+from array import array
+from bisect import insort
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from names import normalize
+
+class PathSearch:
+    """
+    Breadth first search from one room that only expands as far as the queries so far
+    needed. Later queries from the same room pick up where the last one stopped, so a
+    source that is queried often ends up with its whole BFS tree.
+    """
+    def __init__(self, graph: 'RoomGraph', source: int):
+        self.graph = graph
+        self.parent = array("i", [-1]) * len(graph.ids)
+        self.depth = array("i", [0]) * len(graph.ids)
+        self.parent[source] = source
+        self.queue = deque([source])
+
+    def reach(self, targets: Set[int]) -> Optional[int]:
+        """Expands until one of targets is found, returns the closest one or None."""
+        parent, depth = self.parent, self.depth
+        found = [t for t in targets if parent[t] != -1]
+        if found:
+            # Anything not found yet is at least as far as what has been
+            return min(found, key=depth.__getitem__)
+        offsets, edges, queue = self.graph.offsets, self.graph.edges, self.queue
+        while queue:
+            u = queue.popleft()
+            d = depth[u] + 1
+            found = None
+            for k in range(offsets[u], offsets[u + 1]):
+                v = edges[k]
+                if parent[v] == -1:
+                    parent[v] = u
+                    depth[v] = d
+                    queue.append(v)
+                    if found is None and v in targets:
+                        found = v
+            if found is not None:
+                return found
+        return None
+
+    def distance(self, target: int) -> int:
+        return self.depth[target]
+
+    def path(self, target: int) -> List[int]:
+        # Rooms after the source up to and including target
+        steps = []
+        parent = self.parent
+        while parent[target] != target:
+            steps.append(target)
+            target = parent[target]
+        steps.reverse()
+        return steps
+
+class RoomGraph:
+    """
+    Exits of every room as an adjacency index, built once when the world is loaded.
+    Rooms are numbered in load order and the exits are kept in two flat arrays: the
+    exits of room i are edges[offsets[i]:offsets[i + 1]]. Exits to rooms that don't
+    exist are left out and listed in `dangling`.
+    """
+    def __init__(self, rooms: Iterable[Tuple[str, str, Dict[str, str]]], start_room: Optional[str] = None, cache_size=32):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.names: Dict[str, List[int]] = {} # normalized room name -> rooms
+        exits = []
+        for room_id, name, room_exits in rooms:
+            self.index[room_id] = len(self.ids)
+            self.names.setdefault(normalize(name), []).append(len(self.ids))
+            self.ids.append(room_id)
+            exits.append(room_exits)
+
+        self.offsets = array("I", [0])
+        self.edges = array("i")
+        self.dangling: List[Tuple[str, str, str]] = [] # (room id, exit, missing room id)
+        for i, room_exits in enumerate(exits):
+            for name, target in room_exits.items():
+                j = self.index.get(target)
+                if j is None:
+                    self.dangling.append((self.ids[i], name, target))
+                else:
+                    self.edges.append(j)
+            self.offsets.append(len(self.edges))
+
+        self.component = self._components()
+        self.start = self.index.get(start_room) if start_room is not None else None
+        self.cache_size = cache_size
+        self.searches: "OrderedDict[int, PathSearch]" = OrderedDict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["searches"] = OrderedDict() # Searches are rebuilt on demand
+        return state
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _components(self):
+        # Weakly connected components (exits followed both ways) with union find
+        parent = list(range(len(self.ids)))
+        def root(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        offsets, edges = self.offsets, self.edges
+        for u in range(len(self.ids)):
+            for k in range(offsets[u], offsets[u + 1]):
+                a, b = root(u), root(edges[k])
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+        labels = {}
+        component = array("i", [0]) * len(self.ids)
+        for i in range(len(self.ids)):
+            component[i] = labels.setdefault(root(i), len(labels))
+        self.component_count = len(labels)
+        return component
+
+    def update(self, rooms, changed: Dict[str, Optional[str]], start_room: Optional[str] = None):
+        """
+        Patches rooms that changed or were added in place (hot reload) instead of building the
+        graph again. `changed` maps their ids to their old names, None for new rooms, and their
+        exits are read from `rooms`. Rooms can't be removed this way, their numbers would shift.
+        Components only ever merge here, so after an exit is removed two rooms can still look
+        connected when they aren't any more, which only costs route() its shortcut.
+        """
+        index, names = self.index, self.names
+        for room_id, old_name in changed.items():
+            room = rooms[room_id]
+            i = index.get(room_id)
+            if i is None:
+                i = index[room_id] = len(self.ids)
+                self.ids.append(room_id)
+                self.offsets.append(self.offsets[-1])
+                self.component.append(self.component_count)
+                self.component_count += 1
+            elif normalize(old_name) != normalize(room.name):
+                names[normalize(old_name)].remove(i)
+                if not names[normalize(old_name)]:
+                    del names[normalize(old_name)]
+            else:
+                continue
+            insort(names.setdefault(normalize(room.name), []), i)
+
+        # Rooms with exits that led nowhere until now get theirs redone too
+        redo = set(changed)
+        redo.update(room_id for room_id, _, target in self.dangling if target in changed)
+        self.dangling = [d for d in self.dangling if d[0] not in redo]
+        patches = []
+        for room_id in redo:
+            i = index[room_id]
+            edges = array("i")
+            for name, target in rooms[room_id].exits.items():
+                j = index.get(target)
+                if j is None:
+                    self.dangling.append((room_id, name, target))
+                else:
+                    edges.append(j)
+            patches.append((i, edges))
+        patches.sort(key=lambda p: p[0])
+
+        # One pass over the flat arrays, copying the runs between patched rooms as they are
+        offsets, old_edges = self.offsets, self.edges
+        new_offsets = array("I", offsets[:patches[0][0] + 1]) if patches else offsets
+        new_edges = array("i", old_edges[:offsets[patches[0][0]]]) if patches else old_edges
+        for n, (i, edges) in enumerate(patches):
+            new_edges.extend(edges)
+            new_offsets.append(len(new_edges))
+            end = patches[n + 1][0] if n + 1 < len(patches) else len(self.ids)
+            shift = len(new_edges) - offsets[i + 1]
+            new_edges.extend(old_edges[offsets[i + 1]:offsets[end]])
+            new_offsets.extend(o + shift for o in offsets[i + 2:end + 1])
+        self.offsets, self.edges = new_offsets, new_edges
+
+        # New exits can join components
+        label = {}
+        def root(c):
+            while label.get(c, c) != c:
+                c = label[c]
+            return c
+        component = self.component
+        for i, edges in patches:
+            for j in edges:
+                a, b = root(component[i]), root(component[j])
+                if a != b:
+                    label[max(a, b)] = min(a, b)
+                    self.component_count -= 1
+        if label:
+            self.component = array("i", (root(c) for c in component))
+
+        if start_room is not None:
+            self.start = index.get(start_room)
+        self.searches.clear()
+
+    def search(self, source: int) -> PathSearch:
+        s = self.searches.get(source)
+        if s is None:
+            s = PathSearch(self, source)
+            self.searches[source] = s
+            while len(self.searches) > self.cache_size:
+                self.searches.popitem(last=False)
+        else:
+            self.searches.move_to_end(source)
+        return s
+
+    def find(self, query: str) -> List[int]:
+        # A room id, or every room with that name
+        if query in self.index:
+            return [self.index[query]]
+        return self.names.get(normalize(query), [])
+
+    def route(self, source_id: str, query: str) -> Tuple[Optional[str], Optional[List[str]]]:
+        """
+        Shortest way from source_id to the room `query` names (id or room name, the closest
+        one wins when several rooms share the name). Returns (room id, ids of the rooms
+        along the way ending with the room), (room id, None) when there is no way there
+        and (None, None) when no room matches.
+        """
+        source = self.index[source_id]
+        candidates = self.find(query)
+        if not candidates:
+            return None, None
+        if source in candidates:
+            return source_id, []
+        targets = {c for c in candidates if self.component[c] == self.component[source]}
+        if not targets:
+            return self.ids[candidates[0]], None
+        search = self.search(source)
+        found = search.reach(targets)
+        if found is None:
+            return self.ids[candidates[0]], None
+        return self.ids[found], [self.ids[i] for i in search.path(found)]
+
+    def reachable(self, source_id: Optional[str] = None) -> int:
+        # Rooms that can be walked to from source_id (default: the start room), itself included
+        source = self.index[source_id] if source_id is not None else self.start
+        if source is None:
+            return 0
+        search = self.search(source)
+        search.reach(set())
+        return len(self.ids) - search.parent.count(-1)
+
+    def summary(self) -> Dict:
+        sizes: Dict[int, int] = {}
+        for c in self.component:
+            sizes[c] = sizes.get(c, 0) + 1
+        return {
+            "rooms": len(self.ids),
+            "exits": len(self.edges) + len(self.dangling),
+            "dangling_exits": len(self.dangling),
+            "components": self.component_count,
+            "largest_component": max(sizes.values(), default=0),
+            "reachable_from_start": self.reachable(),
+        }
+
+def build_graph(rooms, start_room=None) -> RoomGraph:
+    # From any room store, every room gets read once
+    return RoomGraph(((room.id, room.name, room.exits) for room in rooms.values()), start_room)
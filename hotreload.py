@@ -0,0 +1,255 @@
+# Hot reload: patch a loaded world when its files change, without restarting or kicking anyone out
+# Usage: python3 main.py <example/world_file> --watch [--watch-interval SECONDS]   (also with --serve)
+#
+# A WorldWatcher polls the world's files (data.json, rooms/*.json, functions.py, functions/*.py
+# and dialogues/*.json) for a new modification time or size. When some changed it reads only
+# those files, compares each room in them with a digest of its last definition and parses just
+# the rooms that differ. The world is then patched in place:
+#   rooms        changed, added and removed rooms are swapped in world.rooms, the room graph
+#                is patched for rooms whose exits or name changed and only built again
+#                when rooms were removed
+#   functions    changed modules are compiled again, functions already bound to items and
+#                skills run the new code from their next call (see FunctionRegistry.update)
+#   dialogues    changed trees are dropped from the library and compiled again on next talk
+#   progression, start_room and the skills new players start with are replaced
+# Everything is parsed and compiled before anything is patched, so a file with a mistake in it
+# leaves the world as it was (the error is logged and the file is read again once it changes).
+#
+# Games keep their own state on top of the world: the player and the log of what they changed
+# per room. Every reload appends the ids of the rooms it replaced to world.reloads, a game picks
+# them up before its next command and rebuilds its copies of those rooms from the new definition
+# with its log applied again, items taken stay taken and dead enemies stay dead. A room with a
+# fight going on is left alone until the fight is over.
+#
+# Reload time follows the files that changed, not the size of the world: in a sharded world
+# only the edited shard is read. Watching starts with one pass over the room files to digest
+# every room. The snapshot isn't rewritten, the next start sees it's stale and parses again.
+import hashlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from dialogue import tree_sources
+from graph import build_graph
+from metrics import Metrics
+from progression import parse_progression
+from registry import FunctionRegistry, compile_module, module_paths
+from world import Rooms, World, bind_room, bind_skill, parse_player_skills, parse_room, shard_paths
+
+def digest(spec) -> bytes:
+    return hashlib.blake2b(json.dumps(spec, sort_keys=True, separators=(",", ":")).encode(), digest_size=16).digest()
+
+def dialogue_paths(worldfile) -> List[str]:
+    directory = os.path.join(worldfile, "dialogues")
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".json")]
+
+def read_json(path) -> Dict:
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+@dataclass
+class Reload:
+    rooms: List[str] = field(default_factory=list) # Changed or added
+    removed: List[str] = field(default_factory=list)
+    functions: List[str] = field(default_factory=list) # Names whose code changed, came or went
+    dialogues: List[str] = field(default_factory=list)
+    graph: int = 0 # Rooms patched in the room graph, -1 when it was built again
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        parts = [f"{len(self.rooms)} rooms", f"{len(self.removed)} removed", f"{len(self.functions)} functions", f"{len(self.dialogues)} dialogues"]
+        return f"Reloaded {', '.join(parts)} in {self.seconds * 1000:.2f}ms"
+
+class WorldWatcher:
+    def __init__(self, world: World, worldfile, interval=1.0, clock: Callable[[], float] = time.monotonic,
+                 metrics: Optional[Metrics] = None, log: Optional[Callable[[str], None]] = None):
+        if not isinstance(world.rooms, Rooms) or not isinstance(world.functions, FunctionRegistry):
+            raise ValueError("Hot reload needs a world loaded in memory from its files, not --lazy")
+        self.world = world
+        self.worldfile = worldfile
+        self.data_path = os.path.join(worldfile, "data.json")
+        self.shard_dir = os.path.join(worldfile, "rooms")
+        self.dialogue_dir = os.path.join(worldfile, "dialogues")
+        self.interval = interval
+        self.clock = clock
+        self.metrics = metrics
+        self.log = log if log is not None else (lambda text: print(text, file=sys.stderr))
+        self.next_check = clock() + interval
+        self.files = self.scan()
+        # What the world was loaded from
+        self.digests: Dict[str, Dict[str, bytes]] = {} # room file -> room id -> digest
+        self.owner: Dict[str, str] = {} # room id -> room file
+        self.progression = None
+        for path in (self.data_path, *shard_paths(worldfile)):
+            data = read_json(path)
+            self.digests[path] = {spec['id']: digest(spec) for spec in data.get('rooms', ())}
+            for room_id in self.digests[path]:
+                self.owner[room_id] = path
+            if path == self.data_path:
+                self.progression = digest(data.get('progression'))
+
+    def paths(self) -> List[str]:
+        return [self.data_path, *shard_paths(self.worldfile), *module_paths(self.worldfile), *dialogue_paths(self.worldfile)]
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        for path in self.paths():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue # Deleted since the listing, it's gone next scan
+            files[path] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def poll(self) -> Optional[Reload]:
+        """check() once interval has passed since the last one, cheap enough to call after every command."""
+        now = self.clock()
+        if now < self.next_check:
+            return None
+        self.next_check = now + self.interval
+        return self.check()
+
+    def check(self) -> Optional[Reload]:
+        """Patches the world if any of its files changed, returns what was reloaded."""
+        files = self.scan()
+        changed = {path for path in files.keys() | self.files.keys() if files.get(path) != self.files.get(path)}
+        self.files = files
+        if not changed:
+            return None
+        started = time.perf_counter()
+        try:
+            result = self.reload(changed)
+        except Exception as e:
+            # Anything can be in a half saved file, and this runs between commands where nothing
+            # else would catch it. The world isn't touched until everything parsed, so it's as it was.
+            self.log(f"Reload failed, the world is left as it was: {e!r}")
+            return None
+        result.seconds = time.perf_counter() - started
+        if self.metrics is not None:
+            self.metrics.observe("world_reload_seconds", result.seconds)
+        self.log(result.summary())
+        return result
+
+    def reload(self, changed: Set[str]) -> Reload:
+        world = self.world
+        result = Reload()
+
+        # Read, parse and compile everything first, the world is only touched once all of it went through
+        data = None
+        tables: Dict[str, Dict[str, bytes]] = {}
+        specs: Dict[str, Dict] = {}
+        for path in sorted(p for p in changed if p == self.data_path or os.path.dirname(p) == self.shard_dir):
+            content = read_json(path) if path == self.data_path or os.path.exists(path) else {}
+            if path == self.data_path:
+                data = content
+            old = self.digests.get(path, {})
+            table = tables[path] = {}
+            for spec in content.get('rooms', ()):
+                room_id = spec['id']
+                if room_id in table:
+                    raise ValueError(f"Room {room_id} is defined more than once")
+                table[room_id] = d = digest(spec)
+                if old.get(room_id) != d:
+                    specs[room_id] = spec
+        removed = {room_id for path, table in tables.items() for room_id in self.digests.get(path, ()) if room_id not in table}
+        seen: Set[str] = set()
+        for path, table in tables.items():
+            for room_id in table:
+                owner = self.owner.get(room_id, path)
+                if room_id in seen or (owner != path and owner not in tables):
+                    raise ValueError(f"Room {room_id} is defined more than once")
+                seen.add(room_id)
+        removed -= seen # Moved to another file
+
+        templates = {}
+        rooms = {room_id: parse_room(spec, templates) for room_id, spec in specs.items()}
+        progression = sources = None
+        if data is not None:
+            start_room = data['start_room']
+            sources = tree_sources(data)
+            player_skills = parse_player_skills(data)
+            if digest(data.get('progression')) != self.progression:
+                progression = parse_progression(data.get('progression'))
+
+        functions = world.functions
+        modules = None
+        if any(path.endswith(".py") for path in changed):
+            current = {m.path: m for m in functions.modules}
+            modules = []
+            for path in module_paths(self.worldfile):
+                module = current.get(path)
+                if module is None or path in changed:
+                    with open(path, "rb") as f:
+                        source = f.read()
+                    source_digest = hashlib.sha256(source).hexdigest()
+                    if module is None or module.digest != source_digest:
+                        module = compile_module(path, source, source_digest)
+                modules.append(module)
+
+        # Patch
+        if modules is not None:
+            old_modules = set(map(id, functions.modules))
+            old_names = set(functions.keys())
+            added = functions.update(modules)
+            result.functions = sorted({name for m in modules if id(m) not in old_modules for name in m.names} | (old_names - set(functions.keys())))
+            if added:
+                # Items and skills naming a function that didn't exist until now
+                for room in world.rooms.values():
+                    bind_room(room, functions)
+
+        for room_id in removed:
+            del world.rooms[room_id]
+            del self.owner[room_id]
+        linked: Dict[str, Optional[str]] = {} # Rooms the graph has to know about -> old name
+        for room_id, room in rooms.items():
+            bind_room(room, functions)
+            if world.entities is not None:
+                for ac in (*room.enemies, *room.npcs):
+                    ac.stats = world.entities.adopt(ac.stats)
+            old = world.rooms.get(room_id)
+            if old is None or old.exits != room.exits or old.name != room.name:
+                linked[room_id] = old.name if old is not None else None
+            world.rooms[room_id] = room
+        for path, table in tables.items():
+            self.digests[path] = table
+            for room_id in table:
+                self.owner[room_id] = path
+
+        if data is not None:
+            world.start_room = start_room
+            for sk in player_skills:
+                bind_skill(sk, functions)
+            world.player_skills = player_skills
+            if progression is not None:
+                world.progression = progression
+                self.progression = digest(data.get('progression'))
+            library = world.dialogues
+            for tree_id in library.sources.keys() | sources.keys():
+                if library.sources.get(tree_id) != sources.get(tree_id):
+                    result.dialogues.append(tree_id)
+            library.sources.update(sources)
+            for tree_id in set(result.dialogues) - sources.keys():
+                del library.sources[tree_id]
+        for path in changed:
+            if os.path.dirname(path) == self.dialogue_dir:
+                result.dialogues.append(os.path.basename(path)[:-len(".json")])
+        for tree_id in result.dialogues:
+            world.dialogues.forget(tree_id)
+
+        if removed or world.graph is None:
+            world.graph = build_graph(world.rooms, world.start_room)
+            result.graph = -1
+        elif linked or world.graph.start != world.graph.index.get(world.start_room):
+            world.graph.update(world.rooms, linked, world.start_room)
+            result.graph = len(linked)
+        if rooms or removed:
+            world.rooms.replaced(rooms.keys() | removed)
+            world.reloads.append(frozenset(rooms.keys() | removed))
+        result.rooms = sorted(rooms)
+        result.removed = sorted(removed)
+        return result
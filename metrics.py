@@ -0,0 +1,194 @@
+# Optional latency instrumentation
+# Usage: python3 main.py <example/world_file> --metrics <path> [--metrics-interval SECONDS]
+#
+# Commands (per handler), combat turns and whole fights and world loading are timed into
+# histograms, entity counts (rooms in memory, items per room, inventory sizes) are kept as
+# gauges. Every interval the lot is written to <path>.json and, in the Prometheus text
+# format, to <path>.prom e.g: for a node_exporter textfile collector.
+#
+# Nothing here runs unless a Metrics is handed to Game/Combat, call sites check for None
+# before reading the clock so a disabled run pays one comparison per command.
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+PREFIX = "textgame_"
+
+# Upper bounds in seconds, log spaced from 50us to 10s. Counts (items, turns) use their own.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+HISTOGRAMS = {
+    # name: (buckets, help)
+    "command_seconds": (LATENCY_BUCKETS, "Time to run a command, by handler, without time spent waiting for input"),
+    "combat_turn_seconds": (LATENCY_BUCKETS, "Time to play one combat round"),
+    "combat_seconds": (LATENCY_BUCKETS, "Time spent in a fight from start to finish, without time spent waiting for input"),
+    "combat_turns": (COUNT_BUCKETS, "Rounds per fight"),
+    "world_load_seconds": (LATENCY_BUCKETS, "Time to load a world, by room store"),
+    "world_reload_seconds": (LATENCY_BUCKETS, "Time to patch a world after its files changed"),
+    "room_items": (COUNT_BUCKETS, "Items in a room when the player walks in"),
+}
+
+GAUGES = {
+    "rooms_in_memory": "Rooms held in memory, for shared worlds the rooms sessions copied",
+    "world_rooms": "Rooms in the world",
+    "inventory_items": "Items in player inventories",
+    "sessions": "Games being played",
+    "world_queue_depth": "Events queued by world simulations",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q) -> float:
+        # Upper bound of the bucket the q-th observation fell in, capped at the largest value seen
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank and seen > 0:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+            "buckets": {str(bound): n for bound, n in zip((*self.buckets, "+Inf"), self.counts)},
+        }
+
+def label_text(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Metrics:
+    """
+    Histograms and gauges for one process. Games and fights call observe(), gauges are
+    filled in by the collectors right before each export so they cost nothing in between.
+    """
+    def __init__(self, path: Optional[str] = None, interval=10.0, clock: Callable[[], float] = time.monotonic):
+        self.path = path # Export to path.json and path.prom, None to only keep the numbers
+        self.interval = interval
+        self.clock = clock
+        self.started = clock()
+        self.next_export = self.started + interval
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.collectors: List[Callable[['Metrics'], None]] = []
+        self.exports = 0
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(labels.items()))
+        h = self.histograms.get(key)
+        if h is None:
+            h = self.histograms[key] = Histogram(HISTOGRAMS[name][0])
+        h.observe(value)
+
+    def add(self, name: str, value: float, **labels):
+        # Collectors add to a gauge so several games can report into the same one
+        key = (name, tuple(labels.items()))
+        self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def track(self, collector: Callable[['Metrics'], None]):
+        self.collectors.append(collector)
+
+    def untrack(self, collector: Callable[['Metrics'], None]):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def collect(self):
+        self.gauges = {}
+        for collector in self.collectors:
+            collector(self)
+
+    def maybe_export(self):
+        if self.clock() >= self.next_export:
+            self.export()
+
+    def export(self):
+        self.collect()
+        self.next_export = self.clock() + self.interval
+        self.exports += 1
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_atomic(self.path + ".json", json.dumps(self.to_dict(), indent=2))
+        write_atomic(self.path + ".prom", self.prometheus())
+
+    def to_dict(self) -> Dict:
+        histograms: Dict[str, List] = {}
+        for (name, labels), h in sorted(self.histograms.items()):
+            histograms.setdefault(name, []).append({"labels": dict(labels), **h.to_dict()})
+        gauges: Dict[str, List] = {}
+        for (name, labels), value in sorted(self.gauges.items()):
+            gauges.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        return {"time": time.time(), "uptime": self.clock() - self.started, "histograms": histograms, "gauges": gauges}
+
+    def prometheus(self) -> str:
+        lines = []
+        for name in HISTOGRAMS:
+            series = sorted((labels, h) for (n, labels), h in self.histograms.items() if n == name)
+            if not series:
+                continue
+            metric = PREFIX + name
+            lines.append(f"# HELP {metric} {HISTOGRAMS[name][1]}")
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, h in series:
+                total = 0
+                for bound, n in zip((*h.buckets, "+Inf"), h.counts):
+                    total += n
+                    le = f'le="{bound}"'
+                    lines.append(f"{metric}_bucket{label_text(labels, le)} {total}")
+                lines.append(f"{metric}_sum{label_text(labels)} {h.sum}")
+                lines.append(f"{metric}_count{label_text(labels)} {h.count}")
+        for name, description in GAUGES.items():
+            series = sorted((labels, value) for (n, labels), value in self.gauges.items() if n == name)
+            if not series:
+                continue
+            metric = PREFIX + name
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in series:
+                lines.append(f"{metric}{label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+def track_world(metrics: Metrics, world):
+    # A world shared by many games is counted once, the games report their own copies
+    def collect(m: Metrics):
+        m.add("world_rooms", len(world.rooms))
+        m.add("rooms_in_memory", world.rooms.in_memory())
+    metrics.track(collect)
+
+def write_atomic(path, text):
+    # Scrapers never see a half written file
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,165 @@
+from bisect import bisect_left, insort
+from operator import attrgetter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Match ranks, lower wins. Ties go to whatever was added first.
+EXACT = 0
+PREFIX = 1 # Name starts with the query
+WORD = 2 # A word in the name starts with the query
+SUBSTRING = 3
+
+END = chr(0x10FFFF)
+
+def normalize(name: str):
+    return " ".join(name.lower().split())
+
+class NameIndex:
+    """
+    Substring index over the names of a set of objects. Every suffix of every
+    normalized name is kept in one sorted list, so all names containing the query
+    sit in one bisectable range of it.
+    """
+    def __init__(self, key: Callable = attrgetter("name")):
+        self.key = key
+        self.next_seq = 0
+        self.entries: Dict[int, Tuple[object, str]] = {} # seq -> (object, normalized name)
+        self.seqs: Dict[int, List[int]] = {} # id(object) -> seqs
+        self.exact: Dict[str, List[int]] = {} # normalized name -> seqs
+        self.suffixes: List[Tuple[str, int, int]] = [] # (suffix, seq, rank)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, obj):
+        seq = self.next_seq
+        self.next_seq += 1
+        norm = normalize(self.key(obj))
+        self.entries[seq] = (obj, norm)
+        self.seqs.setdefault(id(obj), []).append(seq)
+        self.exact.setdefault(norm, []).append(seq)
+        for i in range(len(norm)):
+            if norm[i] == " ":
+                continue
+            rank = PREFIX if i == 0 else WORD if norm[i - 1] == " " else SUBSTRING
+            insort(self.suffixes, (norm[i:], seq, rank))
+
+    def discard(self, obj):
+        seqs = self.seqs.get(id(obj))
+        if not seqs:
+            return
+        seq = seqs.pop()
+        if not seqs:
+            del self.seqs[id(obj)]
+        _, norm = self.entries.pop(seq)
+        same = self.exact[norm]
+        same.remove(seq)
+        if not same:
+            del self.exact[norm]
+        for i in range(len(norm)):
+            if norm[i] == " ":
+                continue
+            j = bisect_left(self.suffixes, (norm[i:], seq))
+            del self.suffixes[j]
+
+    def matches(self, query: str) -> Iterator:
+        """Objects whose name contains query, best match first."""
+        q = normalize(query)
+        lo = bisect_left(self.suffixes, (q,))
+        hi = bisect_left(self.suffixes, (q + END,))
+        best: Dict[int, int] = {}
+        for _, seq, rank in self.suffixes[lo:hi]:
+            if rank < best.get(seq, SUBSTRING + 1):
+                best[seq] = rank
+        for seq in self.exact.get(q, ()):
+            best[seq] = EXACT
+        for seq in sorted(best, key=lambda s: (best[s], s)):
+            yield self.entries[seq][0]
+
+    def find(self, query: str, accept: Optional[Callable] = None):
+        for obj in self.matches(query):
+            if accept is None or accept(obj):
+                return obj
+        return None
+
+class IndexedList(list):
+    """
+    List of named things (items, enemies, objects) with a NameIndex that is built on
+    the first lookup and then kept up to date as things are added and removed.
+    """
+    __slots__ = ("name_index",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.name_index: Optional[NameIndex] = None
+
+    def __reduce_ex__(self, protocol):
+        # The index is rebuilt on demand, don't pickle or copy it
+        return (IndexedList, (list(self),))
+
+    def _index(self) -> NameIndex:
+        if self.name_index is None:
+            self.name_index = NameIndex()
+            for obj in self:
+                self.name_index.add(obj)
+        return self.name_index
+
+    def find(self, query: str, accept: Optional[Callable] = None):
+        return self._index().find(query, accept)
+
+    def matches(self, query: str):
+        return self._index().matches(query)
+
+    def discard(self, obj):
+        # Removes obj itself, not just something equal to it
+        for i, x in enumerate(self):
+            if x is obj:
+                self.pop(i)
+                return obj
+        return None
+
+    def append(self, obj):
+        super().append(obj)
+        if self.name_index is not None:
+            self.name_index.add(obj)
+
+    def extend(self, objs):
+        objs = list(objs)
+        super().extend(objs)
+        if self.name_index is not None:
+            for obj in objs:
+                self.name_index.add(obj)
+
+    def __iadd__(self, objs):
+        self.extend(objs)
+        return self
+
+    def insert(self, i, obj):
+        at_end = i >= len(self)
+        super().insert(i, obj)
+        if self.name_index is not None:
+            if at_end:
+                self.name_index.add(obj)
+            else:
+                # Equal matches go by list order, obj would sort after everything already indexed
+                self.name_index = None
+
+    def pop(self, i=-1):
+        obj = super().pop(i)
+        if self.name_index is not None:
+            self.name_index.discard(obj)
+        return obj
+
+    def remove(self, obj):
+        self.pop(self.index(obj))
+
+    def clear(self):
+        super().clear()
+        self.name_index = None
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self.name_index = None
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self.name_index = None
@@ -0,0 +1,78 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import json
+import sys
+
+# Game text goes through an Output instead of print(). Call sites hand over an event name,
+# a str.format template and the fields, formatting happens in the sink (or never).
+#   out.say("pickup", "{actor} picked up {item}.", actor=player.name, item=it.name)
+# Code that builds many lines should check out.enabled first.
+
+@dataclass
+class Message:
+    event: str
+    template: str
+    fields: Dict = field(default_factory=dict)
+
+    @property
+    def text(self):
+        return self.template.format(**self.fields) if self.fields else self.template
+
+    def to_dict(self):
+        return {"event": self.event, "text": self.text, **self.fields}
+
+class Output:
+    """Base sink, drops everything."""
+    enabled = False
+
+    def say(self, event: str, template: str, **fields):
+        pass
+
+    def flush(self):
+        pass
+
+class NullOutput(Output):
+    """For headless runs, nothing is ever formatted."""
+
+class BufferedOutput(Output):
+    """Collects lines and writes them to `stream` in one go on flush e.g: once per command."""
+    enabled = True
+
+    def __init__(self, stream=None, newline="\n"):
+        self.stream = stream if stream is not None else sys.stdout
+        self.newline = newline
+        self.lines: List[str] = []
+
+    def say(self, event: str, template: str, **fields):
+        self.lines.append(template.format(**fields) if fields else template)
+
+    def flush(self):
+        if self.lines:
+            self.lines.append("")
+            self.stream.write(self.newline.join(self.lines))
+            self.lines.clear()
+            self.stream.flush()
+
+class EventOutput(Output):
+    """Keeps Message objects instead of text, `on_flush` gets each batch."""
+    enabled = True
+
+    def __init__(self, on_flush: Optional[Callable[[List[Message]], None]] = None):
+        self.on_flush = on_flush
+        self.messages: List[Message] = []
+
+    def say(self, event: str, template: str, **fields):
+        self.messages.append(Message(event, template, fields))
+
+    def flush(self):
+        if self.on_flush and self.messages:
+            self.on_flush(self.messages)
+            self.messages = []
+
+def json_lines(stream=None):
+    # on_flush for EventOutput that writes one JSON object per message
+    stream = stream if stream is not None else sys.stdout
+    def write(messages):
+        stream.write("".join(json.dumps(m.to_dict()) + "\n" for m in messages))
+        stream.flush()
+    return write
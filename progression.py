@@ -0,0 +1,229 @@
+# Experience curves and per level stat gains, from the optional "progression" section of data.json
+#
+#   "progression": {
+#       "xp": {"base": 10, "per_level": 5, "exponent": 1},  experience from level L to L + 1: base + per_level * L ** exponent
+#       "xp": [15, 20, 30],                                   or a table from level 1 up, the last step repeats
+#       "gains": {"max_health": 5, "max_mana": 2, "strength": 1, "dexterity": 1, "intelligence": 1},
+#       "every": {"5": {"strength": 1}},                      extra gains on every 5th level
+#       "max_level": 100
+#   }
+#
+# Everything is optional, a world without the section plays by DEFAULT (the rules Stats always
+# had). Gains to max_mana only go to actors that have mana, health and mana refill on level up.
+#
+# The gains and the curve are resolved arithmetically, so a grant costs the same however many
+# levels it pays for. What a stat grows by from level 1 to L is gains * (L - 1) plus, for every
+# "every" entry n, extra times the multiples of n in 2..L. A formula curve in whole numbers (and
+# an exponent of 0 or more) sums in closed form: total_xp(L) is base * (L - 1) plus per_level
+# times the sum of the first L - 1 powers, a quadratic for exponent 1 that's inverted with isqrt
+# and binary searched for other exponents. An xp table is kept as cumulative totals for its own
+# levels, past those the last step repeats. Only curves that round (fractional numbers) are
+# summed step by step, into a table that grows as far as grants reach.
+from bisect import bisect_right
+from fractions import Fraction
+from math import comb, isqrt, lcm
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+GAIN_STATS = ("max_health", "max_mana", "strength", "dexterity", "intelligence")
+INITIAL_LEVELS = 64
+
+def power_sum(k: int) -> Tuple[List[int], int]:
+    """
+    sum(l ** k for l in 1..n) as a polynomial in n (Faulhaber): integer coefficients, lowest
+    power first, and the denominator they share.
+    """
+    bernoulli = [Fraction(1)]
+    for m in range(1, k + 1):
+        bernoulli.append(-sum(comb(m + 1, j) * bernoulli[j] for j in range(m)) / (m + 1))
+    if k >= 1:
+        bernoulli[1] = Fraction(1, 2)
+    coefficients = [Fraction(0)] * (k + 2)
+    for j in range(k + 1):
+        coefficients[k + 1 - j] = comb(k + 1, j) * bernoulli[j] / (k + 1)
+    denominator = lcm(*(c.denominator for c in coefficients))
+    return [int(c * denominator) for c in coefficients], denominator
+
+def whole(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) or isinstance(value, float) and value.is_integer()
+
+class Progression:
+    def __init__(self, xp: Union[Dict, Sequence[int], None] = None, gains: Optional[Dict[str, int]] = None,
+                 every: Optional[Dict[int, Dict[str, int]]] = None, max_level: Optional[int] = None):
+        xp = xp if xp is not None else {}
+        # Index 0 is unused so level L is at index L
+        self.total_xp: List[int] = [0, 0]
+        self.power: Optional[Tuple[List[int], int]] = None
+        if isinstance(xp, dict):
+            self.xp_table: List[int] = []
+            self.xp_base = xp.get("base", 10)
+            self.xp_per_level = xp.get("per_level", 5)
+            self.xp_exponent = xp.get("exponent", 1)
+            if (whole(self.xp_base) and whole(self.xp_per_level) and whole(self.xp_exponent) and self.xp_exponent >= 0
+                    and self.xp_per_level >= 0 and self.xp_base + self.xp_per_level >= 1):
+                # Every step is base + per_level * level ** exponent exactly, nothing rounds or clamps
+                self.xp_base, self.xp_per_level, self.xp_exponent = int(self.xp_base), int(self.xp_per_level), int(self.xp_exponent)
+                self.power = power_sum(self.xp_exponent)
+        else:
+            self.xp_table = [int(step) for step in xp]
+            if not self.xp_table:
+                raise ValueError("Progression xp table is empty")
+        self.gains = dict(gains) if gains is not None else {"max_health": 5, "max_mana": 2, "strength": 1, "dexterity": 1, "intelligence": 1}
+        self.every = {int(n): dict(extra) for n, extra in (every or {}).items()}
+        for table in (self.gains, *self.every.values()):
+            for stat in table:
+                if stat not in GAIN_STATS:
+                    raise ValueError(f"Progression can't grow stat: {stat}")
+        if any(n < 1 for n in self.every):
+            raise ValueError("Progression 'every' levels must be positive")
+        self.max_level = max_level
+        self.stats = tuple(stat for stat in GAIN_STATS if stat in self.gains or any(stat in extra for extra in self.every.values()))
+        # stat -> (gain per level, [(n, extra on every nth level)])
+        self.growth: Dict[str, Tuple[int, List[Tuple[int, int]]]] = {
+            stat: (self.gains.get(stat, 0), [(n, extra[stat]) for n, extra in self.every.items() if extra.get(stat)]) for stat in self.stats}
+        if self.xp_table:
+            for level in range(2, len(self.xp_table) + 2):
+                self.total_xp.append(self.total_xp[-1] + self.step(level - 1))
+        elif self.power is None:
+            self.extend(INITIAL_LEVELS)
+
+    def step(self, level: int) -> int:
+        # Experience from level to level + 1
+        if self.xp_table:
+            return max(1, self.xp_table[min(level, len(self.xp_table)) - 1])
+        if self.xp_exponent == 1:
+            value = self.xp_base + self.xp_per_level * level
+        else:
+            value = self.xp_base + self.xp_per_level * level ** self.xp_exponent
+        return max(1, int(round(value)))
+
+    def gain(self, stat: str, level: int) -> int:
+        # What stat grows by on reaching level
+        extra = sum(table.get(stat, 0) for n, table in self.every.items() if level % n == 0)
+        return self.gains.get(stat, 0) + extra
+
+    def gained(self, stat: str, level: int) -> int:
+        # What stat grows by from level 1 to level
+        gain, extras = self.growth[stat]
+        return gain * (level - 1) + sum(extra * (level // n - 1 // n) for n, extra in extras)
+
+    def extend(self, levels: int):
+        # Step by step totals for curves that round
+        if self.max_level is not None:
+            levels = min(levels, self.max_level)
+        total_xp = self.total_xp
+        for level in range(len(total_xp), levels + 1):
+            total_xp.append(total_xp[-1] + self.step(level - 1))
+
+    def total(self, level: int) -> int:
+        """Experience it takes to get from level 1 to level."""
+        n = level - 1
+        if self.power is not None:
+            coefficients, denominator = self.power
+            powers = 0
+            for c in reversed(coefficients):
+                powers = powers * n + c
+            return self.xp_base * n + self.xp_per_level * (powers // denominator)
+        total_xp = self.total_xp
+        if level < len(total_xp):
+            return total_xp[level]
+        if self.xp_table:
+            return total_xp[-1] + (level - len(total_xp) + 1) * self.step(len(self.xp_table))
+        self.extend(level)
+        return total_xp[level]
+
+    def level_for(self, total: int) -> int:
+        """Level reached with `total` experience earned since level 1."""
+        level = self.uncapped_level_for(total)
+        return min(level, self.max_level) if self.max_level is not None else level
+
+    def uncapped_level_for(self, total: int) -> int:
+        total_xp = self.total_xp
+        if self.xp_table:
+            if total < total_xp[-1]:
+                return bisect_right(total_xp, total, 1) - 1
+            return len(total_xp) - 1 + (total - total_xp[-1]) // self.step(len(self.xp_table))
+        if self.power is None:
+            while total_xp[-1] <= total and (self.max_level is None or len(total_xp) <= self.max_level):
+                self.extend((len(total_xp) - 1) * 2)
+            return bisect_right(total_xp, total, 1) - 1
+        base, per_level = self.xp_base, self.xp_per_level
+        if per_level == 0 or self.xp_exponent == 0:
+            return 1 + total // (base + per_level)
+        if self.xp_exponent == 1:
+            # base * n + per_level * n * (n + 1) / 2 <= total, solved for the number of steps n
+            b = 2 * base + per_level
+            n = (isqrt(b * b + 8 * per_level * total) - b) // (2 * per_level)
+            while self.total(n + 2) <= total:
+                n += 1
+            while n > 0 and self.total(n + 1) > total:
+                n -= 1
+            return n + 1
+        low, high = 1, 2
+        while self.total(high) <= total:
+            low, high = high, high * 2
+        while high - low > 1:
+            mid = (low + high) // 2
+            if self.total(mid) <= total:
+                low = mid
+            else:
+                high = mid
+        return low
+
+    def xp_to_next(self, level: int) -> int:
+        return self.step(level)
+
+    def raise_stats(self, stats, new_level: int):
+        # Applies the gains from stats.level up to new_level, same as that many level_up()s
+        old_level = stats.level
+        if self.max_level is not None:
+            new_level = min(new_level, self.max_level)
+        if new_level <= old_level:
+            return
+        gained = self.gained
+        for stat in self.stats:
+            if stat == "max_mana" and stats.max_mana == 0:
+                continue
+            setattr(stats, stat, getattr(stats, stat) + gained(stat, new_level) - gained(stat, old_level))
+        stats.level = new_level
+        stats.health = stats.max_health
+        if stats.max_mana != 0:
+            stats.mana = stats.max_mana
+
+    def apply(self, stats, amount: int):
+        """Stats.gain_experience: adds amount and takes every level it pays for in one go."""
+        if self.max_level is not None and stats.level >= self.max_level:
+            # Nothing left to gain
+            stats.experience += amount
+            return
+        total = self.total(stats.level) + stats.experience + amount
+        level = max(stats.level, self.level_for(total))
+        self.raise_stats(stats, level)
+        stats.experience = total - self.total(level)
+
+    def grant(self, actors: Iterable, amounts: Union[int, Iterable[int]]):
+        """Gives experience to many Stats (or actors with .stats) at once, one amount for all or one each."""
+        apply = self.apply
+        if isinstance(amounts, int):
+            for a in actors:
+                apply(getattr(a, "stats", a), amounts)
+            return
+        for a, amount in zip(actors, amounts):
+            apply(getattr(a, "stats", a), amount)
+
+    def scale(self, actors: Iterable, level: int):
+        """Brings many Stats (or actors) up to level e.g: to scale a region's NPCs, experience starts over."""
+        if self.max_level is not None:
+            level = min(level, self.max_level)
+        for a in actors:
+            stats = getattr(a, "stats", a)
+            if level > stats.level:
+                self.raise_stats(stats, level)
+                stats.experience = 0
+
+def parse_progression(data: Optional[Dict]) -> Progression:
+    if not data:
+        return DEFAULT
+    return Progression(xp=data.get("xp"), gains=data.get("gains"), every=data.get("every"), max_level=data.get("max_level"))
+
+# The rules Stats always had: 10 + 5 * level to the next level, +5 health, +2 mana and +1 to the rest per level
+DEFAULT = Progression()
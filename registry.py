@@ -0,0 +1,184 @@
+from typing import Callable, Dict, List, Optional, Set
+import ast
+import hashlib
+import importlib.util
+import marshal
+import os
+import pickle
+
+# World functions can live in functions.py and in any number of functions/*.py modules next
+# to it. Each module exports its callables through a top level `export` dict, later modules
+# win when two export the same name. Compiled code is cached in <world>.functions keyed by
+# the hash of each module's source, and a module only runs the first time one of its
+# functions is called.
+CACHE_VERSION = 1
+
+def cache_path(worldfile):
+    return os.path.normpath(worldfile) + ".functions"
+
+def module_paths(worldfile) -> List[str]:
+    paths = []
+    main = os.path.join(worldfile, "functions.py")
+    if os.path.exists(main):
+        paths.append(main)
+    directory = os.path.join(worldfile, "functions")
+    if os.path.isdir(directory):
+        paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".py"))
+    return paths
+
+def export_names(tree: ast.Module) -> Optional[List[str]]:
+    # Names in a literal `export = {"name": func, ...}`, None if export is built some other way
+    names = None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "export" for t in node.targets):
+            if not isinstance(node.value, ast.Dict):
+                return None
+            names = []
+            for key in node.value.keys:
+                if not (isinstance(key, ast.Constant) and isinstance(key.value, str)):
+                    return None
+                names.append(key.value)
+    return names
+
+class FunctionModule:
+    def __init__(self, path: str, digest: str, names: Optional[List[str]], code: bytes):
+        self.path = path
+        self.digest = digest # sha256 of the source
+        self.names = names # Exported names, None until the module has run if they can't be read statically
+        self.code = code # marshal'd code object
+        self.export: Optional[Dict[str, Callable]] = None
+
+    def load(self) -> Dict[str, Callable]:
+        if self.export is None:
+            namespace = {}
+            exec(marshal.loads(self.code), namespace)
+            self.export = dict(namespace.get("export", {}))
+            self.names = list(self.export)
+        return self.export
+
+def compile_module(path, source: bytes, digest: str) -> FunctionModule:
+    tree = ast.parse(source, path)
+    return FunctionModule(path, digest, export_names(tree), marshal.dumps(compile(tree, path, "exec")))
+
+class LazyFunction:
+    """Stands in for a world function, the module defining it runs on the first call."""
+    __slots__ = ("registry", "name", "target")
+
+    def __init__(self, registry: 'FunctionRegistry', name: str):
+        self.registry = registry
+        self.name = name
+        self.target: Optional[Callable] = None
+
+    def __call__(self, *args, **kwargs):
+        target = self.target
+        if target is None:
+            target = self.target = self.registry.resolve(self.name)
+        return target(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<world function {self.name}>"
+
+class FunctionRegistry:
+    """
+    The functions of a world by name. Works like the export dict it replaces: `name in registry`
+    and `registry[name]` only look at the name table, what `registry[name]` hands out is a
+    LazyFunction and nothing runs until it's called.
+    """
+    def __init__(self, modules: List[FunctionModule]):
+        self.modules = modules
+        self.owners = owners(modules)
+        self.refs: Dict[str, LazyFunction] = {}
+
+    def __contains__(self, name):
+        return name in self.owners
+
+    def __getitem__(self, name) -> LazyFunction:
+        if name not in self.owners:
+            raise KeyError(name)
+        ref = self.refs.get(name)
+        if ref is None:
+            ref = self.refs[name] = LazyFunction(self, name)
+        return ref
+
+    def get(self, name, default=None):
+        return self[name] if name in self.owners else default
+
+    def __iter__(self):
+        return iter(self.owners)
+
+    def __len__(self):
+        return len(self.owners)
+
+    def keys(self):
+        return self.owners.keys()
+
+    def resolve(self, name) -> Callable:
+        return self.owners[name].load()[name]
+
+    def loaded(self) -> int:
+        return sum(1 for m in self.modules if m.export is not None)
+
+    def update(self, modules: List[FunctionModule]) -> Set[str]:
+        """
+        Swaps in a new list of modules (see hotreload.py), unchanged ones should be passed as they
+        are. Functions handed out before follow their name to the new code on their next call.
+        Returns the names that weren't there before.
+        """
+        old = self.owners
+        self.modules = modules
+        self.owners = owners(modules)
+        for name, ref in self.refs.items():
+            if self.owners.get(name) is not old.get(name):
+                ref.target = None
+        return self.owners.keys() - old.keys()
+
+def owners(modules: List[FunctionModule]) -> Dict[str, FunctionModule]:
+    # Which module each name comes from, later modules win
+    table = {}
+    for module in modules:
+        if module.names is None:
+            module.load() # Exports we couldn't read from the source, run it to find out
+        for name in module.names:
+            table[name] = module
+    return table
+
+def read_cache(path) -> Dict[str, tuple]:
+    try:
+        with open(path, "rb") as f:
+            version, magic, entries = pickle.load(f)
+        # Code objects only load on the Python version that marshal'd them
+        return entries if version == CACHE_VERSION and magic == importlib.util.MAGIC_NUMBER else {}
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        return {}
+
+def write_cache(path, entries):
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump((CACHE_VERSION, importlib.util.MAGIC_NUMBER, entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def load_registry(worldfile, use_cache=True) -> FunctionRegistry:
+    """Compiles the world's function modules, or takes them from the cache when their source hasn't changed."""
+    path = cache_path(worldfile)
+    cached = read_cache(path) if use_cache else {}
+    entries = {}
+    modules = []
+    for module_path in module_paths(worldfile):
+        with open(module_path, "rb") as f:
+            source = f.read()
+        digest = hashlib.sha256(source).hexdigest()
+        rel = os.path.relpath(module_path, worldfile)
+        hit = cached.get(rel)
+        if hit is not None and hit[0] == digest:
+            module = FunctionModule(module_path, digest, hit[1], hit[2])
+        else:
+            module = compile_module(module_path, source, digest)
+        entries[rel] = (digest, module.names, module.code)
+        modules.append(module)
+    if use_cache and entries != cached:
+        write_cache(path, entries)
+    return FunctionRegistry(modules)
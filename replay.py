@@ -0,0 +1,130 @@
+# Session recording and headless replay
+# Usage: python3 main.py <example/world_file> --record session.jsonl          (play and record)
+#        python3 main.py <example/world_file> --serve <port> --record <dir>   (one recording per session)
+#        python3 main.py <example/world_file> --replay session.jsonl [...] [--quiet|--events] [--repeat N]
+#
+# A game's randomness all comes from streams seeded off the session seed (see Game.rng), so
+# the seed, the commands and, for simulated worlds, the clock readings are enough to play a
+# session again exactly. Recordings are JSON lines:
+#   {"version": 1, "seed": 123, "simulate": false, "world": "example/world_file", "started": 1700000000.0}
+#   {"t": 1.52, "line": "go north"}
+#   {"clock": 8123.4}
+# "t" is seconds since the session started, "clock" a reading the world scheduler took.
+import itertools
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from metrics import Metrics
+from output import Output, NullOutput
+from world import World
+
+RECORDING_VERSION = 1
+
+class Recorder:
+    """Writes a session as it's played, one line at a time so a crash loses nothing."""
+    def __init__(self, path, seed: int, simulate=False, world: Optional[str] = None):
+        self.file = open(path, "w")
+        self.started = time.monotonic()
+        self.write({"version": RECORDING_VERSION, "seed": seed, "simulate": simulate, "world": world, "started": time.time()})
+
+    def write(self, entry: Dict):
+        self.file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+    def command(self, line: str):
+        self.write({"t": round(time.monotonic() - self.started, 3), "line": line})
+
+    def clock(self, clock: Callable[[], float]) -> Callable[[], float]:
+        # Wraps the scheduler's clock so every reading goes into the recording
+        def read():
+            value = clock()
+            self.write({"clock": value})
+            return value
+        return read
+
+    def close(self):
+        self.file.close()
+
+_session_ids = itertools.count(1)
+
+def session_recorder(directory, seed: int, simulate=False, world: Optional[str] = None) -> Recorder:
+    # One file per server session e.g: recordings/session-20240101-120000-1.jsonl
+    os.makedirs(directory, exist_ok=True)
+    name = f"session-{time.strftime('%Y%m%d-%H%M%S')}-{next(_session_ids)}.jsonl"
+    return Recorder(os.path.join(directory, name), seed, simulate, world)
+
+@dataclass
+class Recording:
+    seed: int
+    simulate: bool
+    lines: List[str]
+    clock: List[float]
+    duration: float # Seconds the session took when it was played
+
+def read_recording(path) -> Recording:
+    with open(path, "r") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version: {header.get('version')}")
+        lines = []
+        clock = []
+        duration = 0.0
+        for raw in f:
+            if not raw.strip():
+                continue
+            entry = json.loads(raw)
+            if "line" in entry:
+                lines.append(entry["line"])
+                duration = entry.get("t", duration)
+            elif "clock" in entry:
+                clock.append(entry["clock"])
+    return Recording(header["seed"], header.get("simulate", False), lines, clock, duration)
+
+class ReplayClock:
+    """Hands back the recorded clock readings in order, the last one again if they run out."""
+    def __init__(self, readings: Iterable[float]):
+        self.readings = iter(readings)
+        self.last = 0.0
+
+    def __call__(self):
+        self.last = next(self.readings, self.last)
+        return self.last
+
+@dataclass
+class ReplayResult:
+    name: str
+    commands: int
+    seconds: float
+    recorded_seconds: float
+
+    @property
+    def speedup(self):
+        return self.recorded_seconds / self.seconds if self.seconds > 0 else float("inf")
+
+def replay(world: World, recording: Recording, name="-", out: Optional[Output] = None, metrics: Optional[Metrics] = None) -> ReplayResult:
+    from game import Game
+    out = out if out is not None else NullOutput()
+    start = time.perf_counter()
+    game = Game(world=world, interactive=False, out=out, save_path=None, seed=recording.seed,
+                simulate=recording.simulate, clock=ReplayClock(recording.clock), metrics=metrics)
+    commands = 0
+    for line in recording.lines:
+        if not game.running:
+            break
+        game.handle_line(line)
+        commands += 1
+    out.flush()
+    game.close()
+    return ReplayResult(name, commands, time.perf_counter() - start, recording.duration)
+
+def replay_files(world: World, paths: List[str], make_output: Callable[[], Output], repeat=1, metrics: Optional[Metrics] = None) -> List[ReplayResult]:
+    recordings = [(path, read_recording(path)) for path in paths]
+    return [replay(world, rec, path, make_output(), metrics) for _ in range(repeat) for path, rec in recordings]
+
+def report(results: List[ReplayResult], file=sys.stderr):
+    for r in results:
+        print(f"{r.name}: {r.commands} commands in {r.seconds * 1000:.2f}ms, played in {r.recorded_seconds:.1f}s ({r.speedup:,.0f}x real time)", file=file)
@@ -0,0 +1,308 @@
+from collections import OrderedDict
+from itertools import chain
+from typing import Dict, List, Optional
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+
+from entities import Room
+from graph import RoomGraph
+from dialogue import DialogueLibrary, tree_sources
+from progression import parse_progression
+from registry import load_registry
+from world import World, parse_player_skills, parse_room, bind_room, bind_skill, shard_paths, pool_map
+
+# Compiled room file layout:
+#   header | pickled rooms ... | pickled id list | pickled room graph | pickled world meta | index
+# World meta is what data.json has besides rooms: the progression, the dialogue sources and the player's skills,
+# plus the graph's dangling exits so the graph itself is only unpickled once something needs it (see LazyGraph).
+# The index is a sorted table of (id hash, offset, length) records so a room is found
+# with a binary search over the mmap instead of loading an index into memory.
+ROOMS_MAGIC = b"TGRM"
+ROOMS_VERSION = 11
+HEADER = struct.Struct("<4sI32sQQQQQQQQQ") # magic, version, fingerprint, count, ids offset, ids length, graph offset, graph length,
+                                          # meta offset, meta length, index offset, start room length
+RECORD = struct.Struct("<QQI") # id hash, offset, length
+
+def rooms_path(worldfile):
+    return os.path.normpath(worldfile) + ".rooms"
+
+def id_hash(room_id: str):
+    return int.from_bytes(hashlib.blake2b(room_id.encode(), digest_size=8).digest(), "little")
+
+def fingerprint(worldfile):
+    # Stat based so checking the compiled file doesn't mean reading the whole world
+    h = hashlib.sha256(ROOMS_VERSION.to_bytes(4, "little"))
+    for path in (os.path.join(worldfile, "data.json"), *shard_paths(worldfile)):
+        st = os.stat(path)
+        h.update(f"{os.path.relpath(path, worldfile)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.digest()
+
+def compile_chunk(rooms):
+    """
+    Pickles room definitions one by one into one buffer. Returns the buffer and an
+    (id, name, exits, offset, length) entry per room, offsets relative to the buffer.
+    """
+    buf = bytearray()
+    entries = []
+    for room in rooms:
+        blob = pickle.dumps(parse_room(room), protocol=pickle.HIGHEST_PROTOCOL)
+        entries.append((room['id'], room['name'], room['exits'], len(buf), len(blob)))
+        buf += blob
+    return bytes(buf), entries
+
+def compile_shard(path):
+    with open(path, "rb") as f:
+        return compile_chunk(json.loads(f.read())['rooms'])
+
+def compile_rooms(worldfile, path=None, workers: Optional[int] = None):
+    # One full parse of data.json and the shards, after that rooms are read one at a time.
+    # Shards are compiled in a process pool, only bytes and small entries come back from it.
+    path = path or rooms_path(worldfile)
+    with open(worldfile + "/data.json", "r") as f:
+        data = json.load(f)
+    start_room = data['start_room'].encode()
+    tmp = path + ".tmp"
+    records = []
+    ids = []
+    exits = []
+    chunks = chain([compile_chunk(data.get('rooms', ()))], pool_map(compile_shard, shard_paths(worldfile), workers))
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        f.write(start_room)
+        for blob, entries in chunks:
+            base = f.tell()
+            f.write(blob)
+            for room_id, name, room_exits, offset, length in entries:
+                records.append((id_hash(room_id), base + offset, length))
+                ids.append(room_id)
+                exits.append((room_id, name, room_exits))
+        ids_offset = f.tell()
+        ids_blob = pickle.dumps(ids, protocol=pickle.HIGHEST_PROTOCOL)
+        f.write(ids_blob)
+        graph_offset = f.tell()
+        graph = RoomGraph(exits, data['start_room'])
+        graph_blob = pickle.dumps(graph, protocol=pickle.HIGHEST_PROTOCOL)
+        f.write(graph_blob)
+        meta_offset = f.tell()
+        meta = {'progression': parse_progression(data.get('progression')), 'dialogues': tree_sources(data), 'player_skills': parse_player_skills(data),
+                'dangling': graph.dangling}
+        meta_blob = pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL)
+        f.write(meta_blob)
+        index_offset = f.tell()
+        records.sort()
+        for rec in records:
+            f.write(RECORD.pack(*rec))
+        f.seek(0)
+        f.write(HEADER.pack(ROOMS_MAGIC, ROOMS_VERSION, fingerprint(worldfile), len(records), ids_offset, len(ids_blob), graph_offset, len(graph_blob),
+                             meta_offset, len(meta_blob), index_offset, len(start_room)))
+    os.replace(tmp, path)
+
+class RoomFile:
+    """Read only view of a compiled room file."""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.fingerprint, self.count, self.ids_offset, self.ids_length,
+         self.graph_offset, self.graph_length, self.meta_offset, self.meta_length,
+         self.index_offset, start_len) = HEADER.unpack_from(self.map, 0)
+        if magic != ROOMS_MAGIC or version != ROOMS_VERSION:
+            self.close()
+            raise ValueError(f"Not a compiled room file: {path}")
+        self.start_room = self.map[HEADER.size:HEADER.size + start_len].decode()
+
+    def _record(self, i):
+        return RECORD.unpack_from(self.map, self.index_offset + i * RECORD.size)
+
+    def read(self, room_id) -> Optional[Room]:
+        h = id_hash(room_id)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        # Walk the run of equal hashes in case two ids collide
+        while lo < self.count:
+            rh, offset, length = self._record(lo)
+            if rh != h:
+                break
+            room = pickle.loads(self.map[offset:offset + length])
+            if room.id == room_id:
+                return room
+            lo += 1
+        return None
+
+    def ids(self):
+        return pickle.loads(self.map[self.ids_offset:self.ids_offset + self.ids_length])
+
+    def graph(self) -> RoomGraph:
+        return pickle.loads(self.map[self.graph_offset:self.graph_offset + self.graph_length])
+
+    def meta(self) -> dict:
+        return pickle.loads(self.map[self.meta_offset:self.meta_offset + self.meta_length])
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+def open_room_file(worldfile, workers: Optional[int] = None):
+    path = rooms_path(worldfile)
+    fp = fingerprint(worldfile)
+    try:
+        rf = RoomFile(path)
+        if rf.fingerprint == fp:
+            return rf
+        rf.close()
+    except (OSError, ValueError, struct.error):
+        pass
+    compile_rooms(worldfile, path, workers)
+    return RoomFile(path)
+
+class LazyGraph:
+    """
+    Stands in for the room graph of a room file. Unpickling the graph takes time in proportion
+    to the world, so it's done the first time the graph is used (travel, --check) instead of
+    at load. The dangling exits Game warns about on start come from the world meta.
+    """
+    def __init__(self, room_file: RoomFile, dangling):
+        self.room_file = room_file
+        self.dangling = dangling
+        self.graph: Optional[RoomGraph] = None
+
+    def load(self) -> RoomGraph:
+        if self.graph is None:
+            self.graph = self.room_file.graph()
+        return self.graph
+
+    def __getattr__(self, name):
+        # Anything but the above goes to the graph
+        return getattr(self.load(), name)
+
+    def __len__(self):
+        return len(self.load())
+
+class LazyRooms:
+    """
+    Room store that reads rooms from the compiled room file the first time they are
+    needed and keeps at most `capacity` of them alive. Rooms handed out with for_write
+    are dirty, when a dirty room is evicted it is written to the state file and read
+    back from there next time. The state file is an unnamed temporary file in
+    `state_dir` (next to the world), one per store so games on the same world never
+    share it, and it's gone once the store is closed.
+    """
+    def __init__(self, room_file: RoomFile, functions: Dict, state_dir=None, capacity=256):
+        self.room_file = room_file
+        self.functions = functions
+        self.capacity = max(1, capacity)
+        self.live: "OrderedDict[str, Room]" = OrderedDict()
+        self.dirty = set()
+        # Evicted dirty rooms: room id -> (offset, length) in the state file
+        self.saved: Dict[str, tuple] = {}
+        self.state = tempfile.TemporaryFile(dir=state_dir)
+        self.loads = 0
+        self.evictions = 0
+
+    def _load(self, room_id) -> Optional[Room]:
+        if room_id in self.saved:
+            offset, length = self.saved[room_id]
+            self.state.seek(offset)
+            room = pickle.loads(self.state.read(length))
+        else:
+            room = self.room_file.read(room_id)
+        if room is None:
+            return None
+        bind_room(room, self.functions)
+        self.loads += 1
+        return room
+
+    def _evict(self):
+        room_id, room = self.live.popitem(last=False)
+        self.evictions += 1
+        if room_id in self.dirty:
+            self.dirty.discard(room_id)
+            blob = pickle.dumps(room, protocol=pickle.HIGHEST_PROTOCOL)
+            self.state.seek(0, os.SEEK_END)
+            self.saved[room_id] = (self.state.tell(), len(blob))
+            self.state.write(blob)
+
+    def get(self, room_id, default=None):
+        room = self.live.get(room_id)
+        if room is not None:
+            self.live.move_to_end(room_id)
+            return room
+        room = self._load(room_id)
+        if room is None:
+            return default
+        self.live[room_id] = room
+        while len(self.live) > self.capacity:
+            self._evict()
+        return room
+
+    def __getitem__(self, room_id) -> Room:
+        room = self.get(room_id)
+        if room is None:
+            raise KeyError(room_id)
+        return room
+
+    def __contains__(self, room_id):
+        return room_id in self.live or room_id in self.saved or self.room_file.read(room_id) is not None
+
+    def __len__(self):
+        return self.room_file.count
+
+    def __iter__(self):
+        return iter(self.room_file.ids())
+
+    def keys(self):
+        return self.room_file.ids()
+
+    def values(self):
+        # Walks the whole world through the LRU, only for tools that really need every room
+        for room_id in self.room_file.ids():
+            yield self[room_id]
+
+    def in_memory(self) -> int:
+        return len(self.live)
+
+    def for_write(self, room_id) -> Room:
+        room = self[room_id]
+        self.dirty.add(room_id)
+        return room
+
+    def original(self, room_id, functions=None) -> Optional[Room]:
+        # A copy of the room as the room file has it
+        room = self.room_file.read(room_id)
+        if room is not None:
+            bind_room(room, self.functions)
+        return room
+
+    def restore(self, functions=None) -> List[Room]:
+        # Rooms that were written to are read from the room file again next time, same as Rooms.restore
+        for room_id in self.dirty | self.saved.keys():
+            self.live.pop(room_id, None)
+        self.dirty = set()
+        self.saved = {}
+        self.state.seek(0)
+        self.state.truncate()
+        return []
+
+    def close(self):
+        self.state.close()
+        self.room_file.close()
+
+def load_lazy_world(worldfile, capacity=256, workers: Optional[int] = None) -> World:
+    room_file = open_room_file(worldfile, workers)
+    functions = load_registry(worldfile)
+    rooms = LazyRooms(room_file, functions, os.path.dirname(os.path.abspath(worldfile)), capacity=capacity)
+    meta = room_file.meta()
+    for sk in meta['player_skills']:
+        bind_skill(sk, functions)
+    return World(rooms=rooms, start_room=room_file.start_room, functions=functions, graph=LazyGraph(room_file, meta['dangling']),
+                 progression=meta['progression'], dialogues=DialogueLibrary(worldfile, meta['dialogues'], functions),
+                 player_skills=meta['player_skills'])
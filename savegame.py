@@ -0,0 +1,174 @@
+# Save games as differences from the world's data.json
+#
+# Game keeps a per room log of what changed (see Game.room_changes) so saving never walks
+# the world. A save holds the player (stats, inventory, equipment, skills, room) and that log:
+#   {"version": 1, "room": "hall", "player": {...}, "rooms": {"hall": {"taken": ["potion"]},
+#    "armory": {"enemies": [["goblin", 3]]}}}
+# "taken" are ids of items removed from the room, "enemies" is the room's full enemy list as
+# [id, health] pairs after the last fight there, so dead enemies are the ones missing from it.
+# "npcs" is the room's NPC list as [id, home room, index] once NPCs wandered in or out, index is
+# the NPC's place among the ones its home room defines, since ids can repeat across rooms. An
+# NPC from another room is a copy of it as its home room defines it. NPCs a conversation changed
+# (dialogue hooks) have their stats, items, equipment and dialogue as a fourth element.
+from dataclasses import fields
+import json
+import os
+
+from typing import Callable, Optional
+
+from entities import Actor, Equipment, Stats, Item, Skill, SkillTable
+from names import IndexedList
+from world import bind_item, bind_skill, parse_skill
+
+SAVE_VERSION = 1
+STAT_NAMES = tuple(f.name for f in fields(Stats))
+
+def encode_item(it: Item):
+    data = {"id": it.id, "name": it.name, "description": it.description, "type": it.type}
+    for key in ("power", "equip_slot", "func_name"):
+        value = getattr(it, key)
+        if value is not None:
+            data[key] = value
+    return data
+
+def decode_item(data, functions):
+    it = Item(**data)
+    bind_item(it, functions)
+    return it
+
+def encode_skill(sk: Skill):
+    # In the shape data.json has them, so parse_skill reads them back
+    data = {"id": sk.id, "name": sk.name, "description": sk.description, "mana_cost": sk.mana_cost, "power": sk.power, "target": sk.target}
+    if sk.func_name is not None:
+        data["func"] = sk.func_name
+    if sk.effects:
+        data["effects"] = [{"id": ef.id, "name": ef.name, "turns": ef.turns, "every": ef.every, "damage": ef.damage, "stats": dict(ef.stats)} for ef in sk.effects]
+    return data
+
+def decode_skill(data, functions):
+    sk = parse_skill(data)
+    bind_skill(sk, functions)
+    return sk
+
+def encode_actor(ac: Actor):
+    # Stats, inventory and equipment, what a save keeps of the player and of NPCs dialogue changed
+    items = list(ac.items)
+    equip = {}
+    for slot, it in ac.equip.items():
+        if it is None:
+            continue
+        # Equipped items are usually still in the inventory, then only their index is stored
+        index = next((i for i, x in enumerate(items) if x is it), None)
+        equip[slot] = index if index is not None else encode_item(it)
+    return {
+        "stats": {name: getattr(ac.stats, name) for name in STAT_NAMES}, # Entity store stats aren't dataclasses
+        "items": [encode_item(it) for it in items],
+        "equip": equip,
+    }
+
+def apply_actor(ac: Actor, data, functions):
+    ac.items = IndexedList(decode_item(item, functions) for item in data["items"])
+    ac.equip = Equipment()
+    for slot, ref in data["equip"].items():
+        ac.equip[slot] = ac.items[ref] if isinstance(ref, int) else decode_item(ref, functions)
+
+def encode_npc(npc: Actor):
+    data = encode_actor(npc)
+    data["dialogue"] = npc.dialogue
+    return data
+
+def apply_npc(npc: Actor, data, functions):
+    # Stats are set in place, so an NPC in the entity store keeps its slot
+    for name, value in data["stats"].items():
+        if name in STAT_NAMES:
+            setattr(npc.stats, name, value)
+    apply_actor(npc, data, functions)
+    npc.dialogue = data["dialogue"]
+
+def encode_state(game):
+    player = encode_actor(game.player)
+    player["skills"] = [encode_skill(sk) for sk in game.player.skills]
+    return {
+        "version": SAVE_VERSION,
+        "room": game.current_room.id,
+        "player": player,
+        "rooms": game.changes,
+    }
+
+def apply_room_changes(room, changes, functions, visitor: Optional[Callable[[str, int, str], Optional[Actor]]] = None):
+    # visitor(home room id, index, npc id) gives a copy of an NPC that wandered in from elsewhere
+    for item_id in changes.get("taken", ()):
+        it = next((x for x in room.items if x.id == item_id), None)
+        if it is not None:
+            room.items.discard(it)
+    if "enemies" in changes:
+        pool = list(room.enemies)
+        enemies = IndexedList()
+        for enemy_id, health in changes["enemies"]:
+            en = next((x for x in pool if x.id == enemy_id), None)
+            if en is None:
+                continue
+            pool.remove(en)
+            en.stats.health = health
+            enemies.append(en)
+        room.enemies = enemies
+    if "npcs" in changes:
+        pool = list(room.npcs) # As the room defines them, home NPCs are found by their index in it
+        npcs = IndexedList()
+        kept = []
+        for entry in changes["npcs"]:
+            npc_id, home, index = entry[:3]
+            npc = None
+            if home == room.id:
+                i = find_npc(pool, index, npc_id)
+                if i is not None:
+                    npc, pool[i] = pool[i], None
+            elif visitor is not None:
+                npc = visitor(home, index, npc_id)
+            if npc is not None:
+                if len(entry) > 3:
+                    apply_npc(npc, entry[3], functions)
+                npcs.append(npc)
+                kept.append(entry)
+        room.npcs = npcs
+        # Whatever couldn't be found (the world changed) is dropped, the log stays in step with room.npcs
+        changes["npcs"] = kept
+
+def find_npc(npcs, index, npc_id) -> Optional[int]:
+    # Where the NPC is in a room's NPC list (None for taken slots), by its index there unless
+    # the room's definition changed since (hot reload), then by id
+    if index < len(npcs) and npcs[index] is not None and npcs[index].id == npc_id:
+        return index
+    return next((i for i, npc in enumerate(npcs) if npc is not None and npc.id == npc_id), None)
+
+def apply_state(game, state):
+    if state.get("version") != SAVE_VERSION:
+        raise ValueError(f"Unsupported save version: {state.get('version')}")
+    functions = game.world.functions
+    for room_id, changes in state["rooms"].items():
+        if room_id not in game.rooms:
+            continue
+        apply_room_changes(game.rooms.for_write(room_id), changes, functions, game.visitor)
+    game.changes = state["rooms"]
+
+    player = game.player
+    player.stats = Stats(**{k: v for k, v in state["player"]["stats"].items() if k in STAT_NAMES})
+    apply_actor(player, state["player"], functions)
+    if "skills" in state["player"]:
+        player.skills = SkillTable(decode_skill(data, functions) for data in state["player"]["skills"])
+    else:
+        player.skills = SkillTable(game.world.player_skills) # Saved before players had skills
+    game.set_current_room(state["room"])
+
+def save_game(game, path):
+    data = json.dumps(encode_state(game), separators=(",", ":"))
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def load_game(game, path):
+    with open(path, "r") as f:
+        state = json.load(f)
+    game.reset_rooms()
+    apply_state(game, state)
@@ -0,0 +1,192 @@
+# World simulation outside of combat: enemies regenerate and respawn, NPCs wander
+#
+# Everything that happens in the world is an event in one heap ordered by the tick it's due
+# on, so a tick only costs as much as the events due on it, never a walk over all rooms.
+# Rooms are awake while the player is in them and for AWAKE_TICKS after they leave. Wandering
+# only goes on in awake rooms, regen runs until the actor is healed and respawns fire once,
+# so the queue stays as deep as what the player has recently stirred up. Time stands still
+# during combat (Game calls resync when a fight ends).
+import heapq
+import random
+import time
+from copy import deepcopy
+from typing import Callable, Dict, List, Optional, Tuple
+
+from entities import Actor, Room
+from world import bind_actor
+
+TICK_SECONDS = 1.0
+AWAKE_TICKS = 60
+REGEN_TICKS = 5 # Between regen steps
+REGEN_PERCENT = 10 # Of max health per step, at least 1
+RESPAWN_TICKS = 120
+WANDER_TICKS = (20, 60) # Between an NPC's moves
+
+# Event kinds
+REGEN = "regen"
+RESPAWN = "respawn"
+WANDER = "wander"
+
+def needs_regen(ac: Actor):
+    return ac.is_alive() and ac.stats.health < ac.stats.max_health
+
+class StepClock:
+    """Clock for scripted runs, every call moves time on by `step` seconds so one command is one tick."""
+    def __init__(self, step=TICK_SECONDS):
+        self.step = step
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+class Scheduler:
+    def __init__(self, game, clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None):
+        self.game = game
+        self.clock = clock
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))
+        self.start = clock()
+        self.tick = 0
+        # (due tick, seq, kind, room id, payload), the payload of a wander is the NPC's origin (see
+        # Game.npc_origins) and of a respawn the enemy to bring back, regen heals a whole room
+        self.queue: List[Tuple[int, int, str, str, object]] = []
+        self.seq = 0
+        self.awake: Dict[str, int] = {} # room id -> last tick the player was there
+        self.pruned = 0
+        self.pending: Dict[Tuple[str, str, object], int] = {} # (kind, room id, origin or None) -> events queued, to avoid doubles
+        # Metrics
+        self.events_run: Dict[str, int] = {REGEN: 0, RESPAWN: 0, WANDER: 0}
+        self.ticks_run = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self.handlers = {REGEN: self.regen, RESPAWN: self.respawn, WANDER: self.wander}
+
+    def key(self, kind, room_id, payload):
+        return (kind, room_id, payload if kind == WANDER else None)
+
+    def schedule(self, delay: int, kind: str, room_id: str, payload=None):
+        key = self.key(kind, room_id, payload)
+        self.pending[key] = self.pending.get(key, 0) + 1
+        heapq.heappush(self.queue, (self.tick + max(1, delay), self.seq, kind, room_id, payload))
+        self.seq += 1
+        self.max_depth = max(self.max_depth, len(self.queue))
+
+    def scheduled(self, kind, room_id, origin=None):
+        return self.pending.get((kind, room_id, origin), 0) > 0
+
+    def advance(self):
+        """Runs every event due up to the clock's current tick."""
+        target = int((self.clock() - self.start) / TICK_SECONDS)
+        if target <= self.tick:
+            return
+        started = time.perf_counter()
+        queue = self.queue
+        self.ticks_run += target - self.tick
+        self.awake[self.game.current_room.id] = target
+        while queue and queue[0][0] <= target:
+            due, _, kind, room_id, payload = heapq.heappop(queue)
+            self.tick = due
+            key = self.key(kind, room_id, payload)
+            self.pending[key] -= 1
+            if not self.pending[key]:
+                del self.pending[key]
+            self.events_run[kind] += 1
+            self.handlers[kind](room_id, payload)
+        self.tick = target
+        if target - self.pruned >= AWAKE_TICKS:
+            self.awake = {room_id: last for room_id, last in self.awake.items() if target - last <= AWAKE_TICKS}
+            self.pruned = target
+        # Events go through for_write, which may have handed out a new copy of the player's room
+        self.game.current_room = self.game.rooms.get(self.game.current_room.id)
+        self.busy_seconds += time.perf_counter() - started
+
+    def resync(self):
+        # Drops the time since the last advance e.g: a fight, so it never gets simulated
+        self.start = self.clock() - self.tick * TICK_SECONDS
+
+    def is_awake(self, room_id):
+        last = self.awake.get(room_id)
+        return last is not None and (room_id == self.game.current_room.id or self.tick - last <= AWAKE_TICKS)
+
+    # Hooks called by Game
+
+    def entered(self, room: Room):
+        # The player walked in, wake the room up
+        self.awake[room.id] = self.tick
+        for origin in self.game.npc_origins(room):
+            if not self.scheduled(WANDER, room.id, origin):
+                self.schedule(self.rng.randint(*WANDER_TICKS), WANDER, room.id, origin)
+        self.wounded(room)
+
+    def wounded(self, room: Room):
+        # Anyone in the room below full health starts regenerating, one event heals the whole room
+        if not self.scheduled(REGEN, room.id) and any(needs_regen(ac) for ac in (*room.enemies, *room.npcs)):
+            self.schedule(REGEN_TICKS, REGEN, room.id)
+
+    def died(self, room_id: str, enemy: Actor):
+        # The enemy comes back later at full health, as a fresh copy in its room
+        body = deepcopy(enemy)
+        bind_actor(body, self.game.world.functions)
+        self.schedule(RESPAWN_TICKS, RESPAWN, room_id, body)
+
+    def forget(self, room_ids):
+        # The rooms are gone from the world (hot reload), drop what was queued for them
+        self.queue = [event for event in self.queue if event[3] not in room_ids]
+        heapq.heapify(self.queue)
+        self.pending = {key: n for key, n in self.pending.items() if key[1] not in room_ids}
+        for room_id in room_ids:
+            self.awake.pop(room_id, None)
+
+    # Event handlers
+
+    def regen(self, room_id, _):
+        room = self.game.rooms.get(room_id)
+        if room is None or not any(needs_regen(ac) for ac in (*room.enemies, *room.npcs)):
+            return
+        room = self.game.rooms.for_write(room_id)
+        enemies = [en for en in room.enemies if needs_regen(en)]
+        for ac in (*enemies, *(npc for npc in room.npcs if needs_regen(npc))):
+            ac.heal(max(1, ac.stats.max_health * REGEN_PERCENT // 100))
+        if enemies:
+            self.game.log_enemies(room)
+        self.wounded(room)
+
+    def respawn(self, room_id, enemy: Actor):
+        room = self.game.rooms.for_write(room_id)
+        enemy.stats.health = enemy.stats.max_health
+        room.enemies.append(enemy)
+        self.game.log_enemies(room)
+        if room_id == self.game.current_room.id:
+            self.game.out.say("world.respawn", "{name} appears.", name=enemy.name)
+
+    def wander(self, room_id, origin):
+        if not self.is_awake(room_id):
+            return # Goes back to sleep with the room, wakes up when the player comes back
+        room = self.game.rooms.get(room_id)
+        origins = self.game.npc_origins(room) if room is not None else ()
+        if origin not in origins:
+            return
+        exits = [target for target in room.exits.values() if target != room_id and target in self.game.rooms]
+        if not exits:
+            return
+        target_id = self.rng.choice(exits)
+        here = self.game.current_room.id
+        # Both rooms go into the change log so saves and hot reloads keep the NPC where it went
+        npc = self.game.move_npc(room_id, origins.index(origin), target_id)
+        if room_id == here:
+            self.game.out.say("world.npc_leaves", "{name} leaves.", name=npc.name)
+        elif target_id == here:
+            self.game.out.say("world.npc_arrives", "{name} arrives.", name=npc.name)
+        if self.is_awake(target_id) and not self.scheduled(WANDER, target_id, origin):
+            self.schedule(self.rng.randint(*WANDER_TICKS), WANDER, target_id, origin)
+
+    def metrics(self) -> Dict:
+        return {
+            "tick": self.tick,
+            "ticks_run": self.ticks_run,
+            "tick_rate": self.ticks_run / self.busy_seconds if self.busy_seconds > 0 else None, # Simulated ticks per second of work
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_depth,
+            "awake_rooms": sum(1 for room_id in self.awake if self.is_awake(room_id)),
+            "events_run": dict(self.events_run),
+        }
@@ -0,0 +1,117 @@
+# Multi session game server, a plain line based (telnet style) TCP protocol
+# Usage: python3 main.py <example/world_file> --serve <port> [--record <dir>]
+#
+# The world is loaded once and shared by every session as a read only template. Each
+# session has its own Game on top of it, rooms are copied the first time a session changes
+# them (see world.RoomOverlay). Every line a session sends is handled synchronously with the
+# game's output buffered and written to that session's socket, so no session ever waits on
+# another one's input. With a record directory every session is written to its own
+# recording, see replay.py. With a watcher the world's files are checked between lines and
+# changes are patched into the running world, sessions carry on with it, see hotreload.py.
+import asyncio
+import contextlib
+import random
+from typing import Optional
+
+from game import Game
+from hotreload import WorldWatcher
+from metrics import Metrics, track_world
+from output import BufferedOutput
+from replay import session_recorder
+from world import World
+
+class SocketStream:
+    """File-like adapter so a BufferedOutput can write straight to a session's socket."""
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    def write(self, text):
+        self.writer.write(text.replace("\n", "\r\n").encode())
+
+    def flush(self):
+        pass
+
+class Session:
+    def __init__(self, world: World, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, simulate=False, record: Optional[str] = None,
+                 metrics: Optional[Metrics] = None):
+        self.reader = reader
+        self.writer = writer
+        self.out = BufferedOutput(SocketStream(writer))
+        seed = random.getrandbits(64)
+        self.recorder = session_recorder(record, seed, simulate) if record else None
+        # Sessions can't write files on the server
+        self.game = Game(world=world, interactive=False, out=self.out, save_path=None, simulate=simulate, seed=seed, recorder=self.recorder, metrics=metrics)
+        self.out.flush()
+
+    def close(self):
+        self.game.close()
+        if self.recorder:
+            self.recorder.close()
+
+    async def run(self):
+        while self.game.running:
+            self.writer.write(self.game.prompt().encode())
+            await self.writer.drain()
+            data = await self.reader.readline()
+            if not data:
+                break
+            self.game.handle_line(data.decode(errors="replace").rstrip("\r\n"))
+        await self.writer.drain()
+
+class Server:
+    def __init__(self, world: World, simulate=False, record: Optional[str] = None, metrics: Optional[Metrics] = None,
+                 watcher: Optional[WorldWatcher] = None):
+        self.world = world
+        self.simulate = simulate # Each session simulates its own copy of the world on wall clock time
+        self.record = record # Directory for session recordings
+        self.metrics = metrics
+        self.watcher = watcher
+        self.sessions = 0
+        if metrics is not None:
+            track_world(metrics, world)
+
+    async def handle(self, reader, writer):
+        self.sessions += 1
+        session = None
+        try:
+            session = Session(self.world, reader, writer, self.simulate, self.record, self.metrics)
+            await session.run()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if session:
+                session.close()
+            self.sessions -= 1
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, limit=1 << 16)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving on {addresses}")
+        async with server:
+            if self.metrics is not None:
+                self.exporter = asyncio.create_task(self.export_metrics())
+            if self.watcher is not None:
+                self.reloader = asyncio.create_task(self.watch_world())
+            await server.serve_forever()
+
+    async def export_metrics(self):
+        # Idle servers export too, not only when a session sends a line
+        while True:
+            await asyncio.sleep(self.metrics.interval)
+            self.metrics.export()
+
+    async def watch_world(self):
+        # Runs between lines like everything else, a session never sees a half patched world
+        while True:
+            await asyncio.sleep(self.watcher.interval)
+            self.watcher.check()
+
+def serve(world: World, host="127.0.0.1", port=4000, simulate=False, record: Optional[str] = None, metrics: Optional[Metrics] = None,
+          watcher: Optional[WorldWatcher] = None):
+    try:
+        asyncio.run(Server(world, simulate, record, metrics, watcher).serve(host, port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
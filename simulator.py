@@ -0,0 +1,199 @@
+# Headless combat simulator for tuning enemy stats
+# Usage: python3 simulator.py <example/world_file> [--fights N] [--policy attack|flee:<hp fraction>] [--seed S] [--json]
+#
+# Runs many one on one fights per enemy definition at once, each fight is one slot in a set of
+# NumPy arrays. The rules are the ones from combat.Combat, see the constants in combat.py, except
+# for skills: enemies never cast theirs here (in combat.Combat they may, ENEMY_SKILL_CHANCE of
+# their turns) and status effects don't exist. Enemies with skills are flagged in the report,
+# "unmodelled_skills", since their figures only cover plain attacks.
+import argparse
+import json
+import sys
+from typing import Callable, Dict, List
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("simulator.py needs numpy: pip install numpy")
+
+from combat import DAMAGE_SPREAD, CRIT_MULTIPLIER, PLAYER_CRIT_CHANCE, ENEMY_CRIT_CHANCE, HESITATE_CHANCE, FLEE_CHANCE, FLEE_DEX_BONUS
+from entities import Actor
+from game import create_player
+from world import load_world
+
+# Player actions
+ATTACK = 0
+FLEE = 1
+
+# Fight outcomes
+ONGOING = 0
+WON = 1
+LOST = 2
+FLED = 3
+STALEMATE = 4 # Hit the turn limit
+
+# A policy gets the turn number and the hp arrays of the still running fights and
+# returns an action per fight e.g: np.full(len(player_hp), ATTACK)
+Policy = Callable[[int, "np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"], "np.ndarray"]
+
+def always_attack(turn, player_hp, player_max_hp, enemy_hp, enemy_max_hp):
+    return np.full(len(player_hp), ATTACK, dtype=np.int8)
+
+def flee_below(fraction: float) -> Policy:
+    def policy(turn, player_hp, player_max_hp, enemy_hp, enemy_max_hp):
+        return np.where(player_hp < player_max_hp * fraction, FLEE, ATTACK).astype(np.int8)
+    return policy
+
+def roll_damage(rng, attack, defense, dexterity, crit_chance):
+    # Vectorized combat.roll_damage
+    damage = np.maximum(0, attack - defense + rng.integers(-DAMAGE_SPREAD, DAMAGE_SPREAD + 1, size=len(attack)))
+    crit = rng.random(len(attack)) < (crit_chance + dexterity) / 100.0
+    return np.where(crit, (damage * CRIT_MULTIPLIER).astype(np.int64) + 1, damage)
+
+def run_batch(player_hp, player_attack, player_defense, player_dex,
+              enemy_hp, enemy_attack, enemy_defense, enemy_dex,
+              policy: Policy = always_attack, rng=None, max_turns=1000):
+    """
+    Runs one fight per array slot until every fight is over.
+    Returns (outcome, turns, damage_dealt, damage_taken) arrays.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    n = len(player_hp)
+    p_hp = np.array(player_hp, dtype=np.int64)
+    e_hp = np.array(enemy_hp, dtype=np.int64)
+    p_max = p_hp.copy()
+    e_max = e_hp.copy()
+    p_atk = np.broadcast_to(player_attack, n).astype(np.int64)
+    p_def = np.broadcast_to(player_defense, n).astype(np.int64)
+    p_dex = np.broadcast_to(player_dex, n).astype(np.int64)
+    e_atk = np.broadcast_to(enemy_attack, n).astype(np.int64)
+    e_def = np.broadcast_to(enemy_defense, n).astype(np.int64)
+    e_dex = np.broadcast_to(enemy_dex, n).astype(np.int64)
+
+    outcome = np.zeros(n, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int32)
+    dealt = np.zeros(n, dtype=np.int64)
+    taken = np.zeros(n, dtype=np.int64)
+
+    # Indices of the fights still running, shrinks every turn so finished fights cost nothing
+    active = np.arange(n)
+    for turn in range(1, max_turns + 1):
+        if len(active) == 0:
+            break
+        turns[active] = turn
+        action = policy(turn, p_hp[active], p_max[active], e_hp[active], e_max[active])
+
+        # Player turn: flee or attack
+        fleeing = action == FLEE
+        if fleeing.any():
+            idx = active[fleeing]
+            fled = rng.random(len(idx)) < (FLEE_CHANCE + p_dex[idx] * FLEE_DEX_BONUS) / 100.0
+            outcome[idx[fled]] = FLED
+        idx = active[~fleeing]
+        damage = roll_damage(rng, p_atk[idx], e_def[idx], p_dex[idx], PLAYER_CRIT_CHANCE)
+        damage = np.minimum(damage, e_hp[idx])
+        e_hp[idx] -= damage
+        dealt[idx] += damage
+        outcome[idx[e_hp[idx] <= 0]] = WON
+
+        # Enemy turn, only for fights still going
+        idx = active[outcome[active] == ONGOING]
+        attacks = idx[rng.random(len(idx)) >= HESITATE_CHANCE / 100.0]
+        damage = roll_damage(rng, e_atk[attacks], p_def[attacks], e_dex[attacks], ENEMY_CRIT_CHANCE)
+        damage = np.minimum(damage, p_hp[attacks])
+        p_hp[attacks] -= damage
+        taken[attacks] += damage
+        outcome[attacks[p_hp[attacks] <= 0]] = LOST
+
+        active = active[outcome[active] == ONGOING]
+    outcome[active] = STALEMATE
+    return outcome, turns, dealt, taken
+
+def percentiles(values):
+    if len(values) == 0:
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"mean": float(values.mean()), "p50": float(p50), "p90": float(p90), "p99": float(p99), "max": int(values.max())}
+
+def summarize(outcome, turns, dealt, taken) -> Dict:
+    n = len(outcome)
+    won = outcome == WON
+    return {
+        "fights": n,
+        "win_rate": float(won.mean()) if n else 0.0,
+        "loss_rate": float((outcome == LOST).mean()) if n else 0.0,
+        "flee_rate": float((outcome == FLED).mean()) if n else 0.0,
+        "stalemate_rate": float((outcome == STALEMATE).mean()) if n else 0.0,
+        "turns_to_kill": percentiles(turns[won]),
+        "damage_dealt": percentiles(dealt),
+        "damage_taken": percentiles(taken),
+    }
+
+def simulate(player: Actor, enemy: Actor, fights: int, policy: Policy = always_attack, rng=None, batch_size=1_000_000, max_turns=1000) -> Dict:
+    """Simulates `fights` fights of player against enemy, in batches to keep memory bounded."""
+    rng = rng if rng is not None else np.random.default_rng()
+    results = []
+    remaining = fights
+    while remaining > 0:
+        n = min(batch_size, remaining)
+        remaining -= n
+        results.append(run_batch(
+            np.full(n, player.stats.health), player.attack_power(), player.defense(), player.stats.dexterity,
+            np.full(n, enemy.stats.health), enemy.attack_power(), enemy.defense(), enemy.stats.dexterity,
+            policy=policy, rng=rng, max_turns=max_turns,
+        ))
+    report = summarize(*(np.concatenate(parts) for parts in zip(*results)))
+    if enemy.skills:
+        report["unmodelled_skills"] = [sk.id for sk in enemy.skills]
+    return report
+
+def enemy_definitions(rooms) -> List[Actor]:
+    # One entry per enemy id, the first definition wins
+    seen = {}
+    for room in rooms.values():
+        for en in room.enemies:
+            seen.setdefault(en.id, en)
+    return list(seen.values())
+
+def parse_policy(text) -> Policy:
+    if text == "attack":
+        return always_attack
+    if text.startswith("flee:"):
+        return flee_below(float(text.split(":", 1)[1]))
+    raise ValueError(f"Unknown policy: {text}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless combat simulator")
+    parser.add_argument("world", help="World directory e.g: example/world_file")
+    parser.add_argument("--fights", type=int, default=100_000, help="Fights per enemy")
+    parser.add_argument("--policy", default="attack", help="attack or flee:<hp fraction> e.g: flee:0.3")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    world = load_world(args.world)
+    rng = np.random.default_rng(args.seed)
+    policy = parse_policy(args.policy)
+    player = create_player()
+
+    report = {}
+    for enemy in enemy_definitions(world.rooms):
+        report[enemy.id] = simulate(player, enemy, args.fights, policy=policy, rng=rng, max_turns=args.max_turns)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    for enemy_id, r in report.items():
+        ttk = r["turns_to_kill"]
+        print(f"{enemy_id}: win {r['win_rate']:.1%}  loss {r['loss_rate']:.1%}  fled {r['flee_rate']:.1%}  stalemate {r['stalemate_rate']:.1%}")
+        if "unmodelled_skills" in r:
+            print(f"    not modelled:  skills {', '.join(r['unmodelled_skills'])}, the figures only cover plain attacks")
+        if ttk:
+            print(f"    turns to kill: mean {ttk['mean']:.2f}  p50 {ttk['p50']:.0f}  p90 {ttk['p90']:.0f}  p99 {ttk['p99']:.0f}")
+        dt = r["damage_taken"]
+        print(f"    damage taken:  mean {dt['mean']:.2f}  p50 {dt['p50']:.0f}  p90 {dt['p90']:.0f}  max {dt['max']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# The game's modules live at the top of the repo, not in a package
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STATS = {"health": 10, "max_health": 10, "mana": 0, "max_mana": 0, "strength": 2, "dexterity": 1, "intelligence": 1, "level": 1}
+
+FUNCTIONS_PY = """def heal_small(actor):
+    actor.heal(5)
+
+export = {"heal_small": heal_small}
+"""
+
+def actor(actor_id, name, **extra):
+    return {"id": actor_id, "name": name, "description": f"A {name.lower()}.", "stats": dict(STATS), "items": [], **extra}
+
+def room(room_id, exits=None, items=(), enemies=(), npcs=()):
+    return {"id": room_id, "name": room_id.title(), "description": f"Room {room_id}.", "exits": exits or {}, "items": list(items),
+            "enemies": list(enemies), "npcs": list(npcs), "objects": []}
+
+GEM = {"id": "gem", "name": "Red Gem", "description": "Shiny.", "type": "misc"}
+
+def write_shard(worldfile, rooms, name="shard_0"):
+    os.makedirs(os.path.join(worldfile, "rooms"), exist_ok=True)
+    with open(os.path.join(worldfile, "rooms", name + ".json"), "w") as f:
+        json.dump({"rooms": rooms}, f)
+
+def sharded_world(make_world):
+    # a in data.json, b and c in a shard, a gem in each
+    worldfile = make_world([room("a", {"east": "b"}, items=[GEM])])
+    write_shard(worldfile, [room("b", {"west": "a", "east": "c"}, items=[GEM]), room("c", {"west": "b"}, items=[GEM])])
+    return worldfile
+
+@pytest.fixture
+def make_world(tmp_path):
+    """Writes a world directory from room dicts (see room() and actor()), returns its path."""
+    def make(rooms, start=None, name="world", functions=FUNCTIONS_PY, **data):
+        path = tmp_path / name
+        path.mkdir()
+        (path / "data.json").write_text(json.dumps({"start_room": start or rooms[0]["id"], "rooms": rooms, **data}))
+        (path / "functions.py").write_text(functions)
+        return str(path)
+    return make
@@ -0,0 +1,48 @@
+from conftest import GEM, actor, room
+from game import Game
+from output import NullOutput
+from world import load_world
+
+FUNCTIONS_PY = """def give_gem(player, npc):
+    player.add_item(npc.items.pop(0))
+    npc.stats.health -= 3
+    npc.dialogue = "done"
+
+export = {"give_gem": give_gem}
+"""
+
+DIALOGUES = [
+    {"id": "elder", "start": "greet", "nodes": [
+        {"id": "greet", "text": "Welcome.", "options": [{"text": "Anything for me?", "next": "gift"}, {"text": "Goodbye."}]},
+        {"id": "gift", "text": "Take this.", "func": "give_gem"}]},
+    {"id": "done", "start": "greet", "nodes": [{"id": "greet", "text": "That was all."}]},
+]
+
+def elder_world(make_world):
+    return make_world([room("a", npcs=[actor("elder_0", "Elder", items=[GEM], dialogue="elder")])], functions=FUNCTIONS_PY, dialogues=DIALOGUES)
+
+def test_dialogue_hooks_change_only_this_sessions_npc(make_world):
+    world = load_world(elder_world(make_world), use_cache=False)
+    first = Game(world=world, interactive=False, out=NullOutput(), save_path=None)
+    second = Game(world=world, interactive=False, out=NullOutput(), save_path=None)
+    first.handle_line("talk elder")
+    first.handle_line("1")
+    assert [it.id for it in first.player.items] == ["gem"]
+    assert first.rooms["a"].npcs[0].stats.health == 7
+    for npc in (world.rooms["a"].npcs[0], second.rooms["a"].npcs[0]):
+        assert (npc.stats.health, [it.id for it in npc.items], npc.dialogue) == (10, ["gem"], "elder")
+
+def test_npcs_changed_by_dialogue_are_saved(make_world, tmp_path):
+    worldfile = elder_world(make_world)
+    save_path = str(tmp_path / "save.json")
+    game = Game(worldfile, use_cache=False, interactive=False, out=NullOutput(), save_path=save_path)
+    game.handle_line("talk elder")
+    assert "a" not in game.changes # Nothing changed yet
+    game.handle_line("1")
+    game.handle_line("save")
+
+    loaded = Game(worldfile, use_cache=False, interactive=False, out=NullOutput(), save_path=save_path)
+    loaded.handle_line("load")
+    npc = loaded.rooms["a"].npcs[0]
+    assert (npc.stats.health, list(npc.items), npc.dialogue) == (7, [], "done")
+    assert [it.id for it in loaded.player.items] == ["gem"]
@@ -0,0 +1,44 @@
+import json
+import os
+
+import pytest
+
+from conftest import actor, room
+from game import Game
+from output import NullOutput
+
+def watched_game(make_world):
+    worldfile = make_world([room("a", {"east": "b"}), room("b", {"west": "a"}, enemies=[actor("rat", "Rat")])])
+    game = Game(worldfile, use_cache=False, interactive=False, out=NullOutput(), save_path=None, watch=0.0)
+    game.watcher.log = lambda text: None
+    return worldfile, game
+
+def rewrite(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def test_reload_patches_rooms_into_the_game(make_world):
+    worldfile, game = watched_game(make_world)
+    data_path = os.path.join(worldfile, "data.json")
+    data = json.load(open(data_path))
+    data["rooms"][1]["description"] = "Room b, rebuilt."
+    rewrite(data_path, json.dumps(data))
+    assert game.watcher.check().rooms == ["b"]
+    game.handle_line("go east")
+    assert game.current_room.description == "Room b, rebuilt."
+
+@pytest.mark.parametrize("path, text", [
+    ("data.json", "[]"), # Parses, but isn't a world
+    ("data.json", '{"start_room": "a", "rooms": [{"id": "a"'), # Half saved
+    ("functions.py", "def broken(:\n"),
+])
+def test_bad_files_leave_the_world_as_it_was(make_world, path, text):
+    worldfile, game = watched_game(make_world)
+    world = game.world
+    rooms = dict(world.rooms)
+    rewrite(os.path.join(worldfile, path), text)
+    game.handle_line("look")
+    assert game.watcher.check() is None
+    assert game.world is world and dict(world.rooms) == rooms
+    game.handle_line("go east")
+    assert game.current_room.id == "b"
@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+
+from names import IndexedList
+
+@dataclass(eq=False)
+class Thing:
+    name: str
+
+def test_find_ranks_exact_prefix_word_then_substring():
+    things = IndexedList([Thing("Potion Belt"), Thing("Old Potion"), Thing("Potions"), Thing("Potion")])
+    assert [t.name for t in things.matches("potion")] == ["Potion", "Potion Belt", "Potions", "Old Potion"]
+    assert things.find("tion").name == "Potion Belt"
+    assert things.find("gem") is None
+
+def test_equal_matches_follow_list_order():
+    first, second, front, middle = Thing("Potion"), Thing("Potion"), Thing("Potion"), Thing("Potion")
+    things = IndexedList([first, second])
+    assert things.find("potion") is first # Builds the index
+    things.insert(0, front)
+    assert things.find("potion") is front
+    things.insert(1, middle)
+    assert list(things.matches("potion")) == [front, middle, first, second]
+    things.insert(10, Thing("Potion")) # Past the end is an append
+    things.pop(0)
+    assert list(things.matches("potion"))[:3] == [middle, first, second]
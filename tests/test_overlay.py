@@ -0,0 +1,27 @@
+from conftest import GEM, actor, room
+from game import Game
+from output import NullOutput
+from world import load_world
+
+def session(world):
+    return Game(world=world, interactive=False, out=NullOutput(), save_path=None)
+
+def test_sessions_on_a_shared_world_copy_rooms_on_write(make_world):
+    world = load_world(make_world([
+        room("a", {"east": "b"}, items=[GEM]),
+        room("b", {"west": "a"}, enemies=[actor("rat", "Rat")]),
+    ]), use_cache=False)
+    first, second = session(world), session(world)
+    first.handle_line("pickup red gem")
+    first.handle_line("go east")
+    while first.combat:
+        first.handle_line("1")
+
+    assert sorted(first.rooms.own) == ["a", "b"]
+    assert first.rooms["a"].items == [] and first.rooms["a"] is not world.rooms["a"]
+    assert first.rooms["b"] is not world.rooms["b"] and "b" in first.changes
+    # Neither the template nor the other session saw any of it
+    for rooms in (world.rooms, second.rooms):
+        assert [it.id for it in rooms["a"].items] == ["gem"]
+        assert [(en.id, en.stats.health) for en in rooms["b"].enemies] == [("rat", 10)]
+    assert second.rooms.own == {}
@@ -0,0 +1,32 @@
+import io
+
+from conftest import actor, room
+from game import Game
+from output import BufferedOutput
+from replay import Recorder, read_recording, replay
+from scheduler import StepClock
+from world import load_world
+
+LINES = ["look", "go east", "1", "1", "1", "1", "go west", "look", "go east", "1", "1", "status"]
+
+def test_replay_plays_a_recorded_session_again(make_world, tmp_path):
+    world = load_world(make_world([
+        room("a", {"east": "b"}, npcs=[actor("hermit_0", "Hermit")]),
+        room("b", {"west": "a"}, enemies=[actor(f"goblin_{i}", "Goblin") for i in range(3)]),
+    ]), use_cache=False)
+    path = str(tmp_path / "session.jsonl")
+    played = io.StringIO()
+    recorder = Recorder(path, 7, simulate=True)
+    game = Game(world=world, interactive=False, out=BufferedOutput(played), save_path=None, seed=7, simulate=True, clock=StepClock(5.0), recorder=recorder)
+    for line in LINES:
+        game.handle_line(line)
+    game.close()
+    recorder.close()
+
+    recording = read_recording(path)
+    assert (recording.seed, recording.simulate, recording.lines) == (7, True, LINES)
+    replayed = io.StringIO()
+    result = replay(world, recording, out=BufferedOutput(replayed))
+    assert result.commands == len(LINES)
+    assert "Goblin" in played.getvalue()
+    assert replayed.getvalue() == played.getvalue()
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from conftest import room, sharded_world, write_shard
+from game import Game
+from output import NullOutput
+from roomstore import load_lazy_world, rooms_path
+
+def test_room_file_is_compiled_again_when_the_world_changes(make_world):
+    worldfile = sharded_world(make_world)
+    world = load_lazy_world(worldfile)
+    assert world.rooms["c"].name == "C"
+    world.rooms.close()
+    compiled = os.stat(rooms_path(worldfile)).st_mtime_ns
+
+    world = load_lazy_world(worldfile)
+    assert os.stat(rooms_path(worldfile)).st_mtime_ns == compiled
+    world.rooms.close()
+
+    write_shard(worldfile, [room("b", {"west": "a"}), dict(room("c", {}), name="Cellar")])
+    world = load_lazy_world(worldfile)
+    assert world.rooms["c"].name == "Cellar"
+    assert world.graph.route("a", "Cellar") == ("c", None) # Graph from the new room file
+    world.rooms.close()
+
+def test_lazy_graph_loads_on_first_use(make_world):
+    world = load_lazy_world(sharded_world(make_world))
+    assert world.graph.graph is None and world.graph.dangling == []
+    assert world.graph.route("a", "c") == ("c", ["b", "c"])
+    assert world.graph.graph is not None
+    world.rooms.close()
+
+@pytest.mark.parametrize("capacity", [1, 256])
+def test_lazy_rooms_evicted_with_changes_save_and_load(make_world, tmp_path, capacity):
+    worldfile = sharded_world(make_world)
+    save_path = str(tmp_path / "save.json")
+    game = Game(worldfile, lazy=True, room_cache_size=capacity, interactive=False, out=NullOutput(), save_path=save_path)
+    for line in ("pickup red gem", "go east", "pickup red gem", "go east"):
+        game.handle_line(line)
+    # With one room in memory the first two rooms were evicted dirty and read back from the state file
+    assert [len(game.rooms[room_id].items) for room_id in "abc"] == [0, 0, 1]
+    game.handle_line("save")
+    game.handle_line("pickup red gem")
+    game.handle_line("load")
+    assert [len(game.rooms[room_id].items) for room_id in "abc"] == [0, 0, 1]
+    assert len(game.player.items) == 2
+    game.close()
+    assert not any(name.endswith((".state", ".tmp")) for name in os.listdir(tmp_path))
+
+    loaded = Game(worldfile, lazy=True, room_cache_size=capacity, interactive=False, out=NullOutput(), save_path=save_path)
+    loaded.handle_line("load")
+    assert loaded.current_room.id == "c"
+    assert [len(loaded.rooms[room_id].items) for room_id in "abc"] == [0, 0, 1]
+    loaded.close()
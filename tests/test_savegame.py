@@ -0,0 +1,86 @@
+import pytest
+
+from conftest import actor, room
+from game import Game
+from output import NullOutput
+from world import load_world
+
+def npc_names(game, room_id):
+    return [npc.name for npc in game.rooms[room_id].npcs]
+
+def duplicate_npcs():
+    # Generated worlds reuse per room ids, merchant_0 is a Merchant in a and a Guard in b
+    return [
+        room("a", {"east": "b"}, npcs=[actor("merchant_0", "Merchant")]),
+        room("b", {"west": "a"}, npcs=[actor("merchant_0", "Guard")]),
+    ]
+
+def new_game(worldfile, how, tmp_path, **kwargs):
+    if how == "shared":
+        return Game(world=load_world(worldfile, use_cache=False), interactive=False, out=NullOutput(), save_path=str(tmp_path / "save.json"), **kwargs)
+    return Game(worldfile, use_cache=False, lazy=how == "lazy", interactive=False, out=NullOutput(), save_path=str(tmp_path / "save.json"), **kwargs)
+
+@pytest.mark.parametrize("how", ["own", "shared", "lazy"])
+def test_npcs_with_duplicate_ids_survive_save_and_load(make_world, tmp_path, how):
+    worldfile = make_world(duplicate_npcs())
+    game = new_game(worldfile, how, tmp_path)
+    game.move_npc("a", 0, "b")
+    assert npc_names(game, "b") == ["Guard", "Merchant"]
+    game.handle_line("save")
+    game.close()
+
+    loaded = new_game(worldfile, how, tmp_path)
+    loaded.handle_line("load")
+    assert npc_names(loaded, "a") == []
+    assert npc_names(loaded, "b") == ["Guard", "Merchant"]
+
+    # Loading over a game that moved the NPCs elsewhere puts them back where the save has them
+    loaded.move_npc("b", 0, "a")
+    loaded.handle_line("load")
+    assert npc_names(loaded, "a") == []
+    assert npc_names(loaded, "b") == ["Guard", "Merchant"]
+    loaded.close()
+
+def test_wandering_moves_the_npc_it_was_scheduled_for(make_world, tmp_path):
+    game = new_game(make_world(duplicate_npcs()), "own", tmp_path, simulate=True)
+    game.sim.awake["b"] = game.sim.tick
+    game.sim.wander("a", ("a", 0))
+    assert npc_names(game, "b") == ["Guard", "Merchant"]
+    # Same id as the Guard, but it's the Merchant that goes back
+    game.sim.wander("b", ("a", 0))
+    assert npc_names(game, "a") == ["Merchant"]
+    assert npc_names(game, "b") == ["Guard"]
+    assert game.changes["b"]["npcs"] == [["merchant_0", "b", 0]]
+
+def test_regen_heals_every_wounded_actor_with_the_same_id(make_world, tmp_path):
+    worldfile = make_world([room("a", enemies=[actor("goblin", "Goblin"), actor("goblin", "Goblin")])])
+    game = new_game(worldfile, "own", tmp_path, simulate=True)
+    enemies = game.rooms.for_write("a").enemies
+    enemies[0].stats.health = 9
+    enemies[1].stats.health = 1
+    game.sim.wounded(game.rooms["a"])
+    for _ in range(20):
+        game.sim.regen("a", None)
+    assert [en.stats.health for en in game.rooms["a"].enemies] == [10, 10]
+    assert game.changes["a"]["enemies"] == [["goblin", 10], ["goblin", 10]]
+
+def test_delta_save_round_trip(make_world, tmp_path):
+    worldfile = make_world([
+        room("a", {"east": "b"}, items=[{"id": "gem", "name": "Red Gem", "description": "Shiny.", "type": "misc"},
+                                        {"id": "coin", "name": "Old Coin", "description": "Worn smooth.", "type": "misc"}]),
+        room("b", {"west": "a"}, enemies=[actor("rat", "Rat")]),
+    ])
+    game = new_game(worldfile, "own", tmp_path)
+    game.handle_line("pickup red gem")
+    enemy = game.rooms.for_write("b").enemies[0]
+    enemy.stats.health = 4
+    game.log_enemies(game.rooms["b"])
+    game.handle_line("save")
+    assert game.changes == {"a": {"taken": ["gem"]}, "b": {"enemies": [["rat", 4]]}}
+
+    loaded = new_game(worldfile, "own", tmp_path)
+    loaded.handle_line("pickup old coin")
+    loaded.handle_line("load")
+    assert [it.id for it in loaded.player.items] == ["gem"]
+    assert [it.id for it in loaded.rooms["a"].items] == ["coin"]
+    assert [en.stats.health for en in loaded.rooms["b"].enemies] == [4]
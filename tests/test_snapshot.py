@@ -0,0 +1,21 @@
+import os
+
+import world as world_module
+from conftest import GEM, room, sharded_world, write_shard
+from world import load_world, snapshot_path
+
+def test_snapshot_is_used_until_the_world_changes(make_world, monkeypatch):
+    worldfile = sharded_world(make_world)
+    assert sorted(load_world(worldfile).rooms) == ["a", "b", "c"]
+    assert os.path.exists(snapshot_path(worldfile))
+
+    def no_parsing(data):
+        raise AssertionError("parsed a world the snapshot has")
+    monkeypatch.setattr(world_module, "parse_world", no_parsing)
+    assert sorted(load_world(worldfile).rooms) == ["a", "b", "c"]
+
+    monkeypatch.undo()
+    write_shard(worldfile, [room("b", {"west": "a"}, items=[GEM]), room("d", {})])
+    rooms = load_world(worldfile).rooms
+    assert sorted(rooms) == ["a", "b", "d"]
+    assert rooms["b"].exits == {"west": "a"}
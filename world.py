@@ -0,0 +1,349 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Callable, FrozenSet, Iterable, List, Optional
+import copy
+import hashlib
+import os
+import pickle
+import json
+import sys
+
+from entities import NO_SKILLS, Stats, Item, ItemTemplate, Object, Actor, Skill, SkillTable, Room
+from graph import RoomGraph, build_graph
+from registry import load_registry
+from names import IndexedList
+from dialogue import DialogueLibrary, tree_sources
+from effects import TARGETS, parse_effect
+from progression import DEFAULT as DEFAULT_PROGRESSION, Progression, parse_progression
+
+if TYPE_CHECKING:
+    from entitystore import EntityStore # Needs numpy, it's only imported when the store is turned on
+
+SNAPSHOT_VERSION = 13
+
+class Rooms(dict):
+    """
+    All rooms of a world kept in memory. The first for_write of a room keeps a pickle of it as
+    it was, so restore() can put back just the rooms a game changed instead of loading the world.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pristine: Dict[str, bytes] = {}
+
+    def for_write(self, room_id) -> Room:
+        room = self[room_id]
+        if room_id not in self.pristine:
+            self.pristine[room_id] = pickle.dumps(room, protocol=pickle.HIGHEST_PROTOCOL)
+        return room
+
+    def restore(self, functions) -> List[Room]:
+        """Every room handed out by for_write goes back to how it was before, returns those rooms."""
+        restored = []
+        for room_id, blob in self.pristine.items():
+            if room_id in self:
+                room = self[room_id] = pickle.loads(blob)
+                bind_room(room, functions)
+                restored.append(room)
+        self.pristine = {}
+        return restored
+
+    def original(self, room_id, functions) -> Optional[Room]:
+        # A copy of the room as it was before its first for_write
+        blob = self.pristine.get(room_id)
+        if blob is not None:
+            room = pickle.loads(blob)
+        else:
+            room = self.get(room_id)
+            if room is None:
+                return None
+            room = copy.deepcopy(room)
+        bind_room(room, functions)
+        return room
+
+    def replaced(self, room_ids: Iterable[str]):
+        # The rooms have a new definition (hot reload), that's what they go back to now
+        for room_id in room_ids:
+            self.pristine.pop(room_id, None)
+
+    def in_memory(self) -> int:
+        return len(self)
+
+class RoomOverlay:
+    """
+    Copy on write view over a shared room store. Reads go to the shared rooms until
+    a room is changed, from then on this view has its own copy of it.
+    """
+    def __init__(self, base, functions):
+        self.base = base
+        self.functions = functions
+        self.own: Dict[str, Room] = {}
+
+    def get(self, room_id, default=None):
+        room = self.own.get(room_id)
+        if room is not None:
+            return room
+        return self.base.get(room_id, default)
+
+    def __getitem__(self, room_id) -> Room:
+        room = self.get(room_id)
+        if room is None:
+            raise KeyError(room_id)
+        return room
+
+    def __contains__(self, room_id):
+        return room_id in self.own or room_id in self.base
+
+    def __len__(self):
+        return len(self.base)
+
+    def __iter__(self):
+        return iter(self.base)
+
+    def keys(self):
+        return self.base.keys()
+
+    def values(self):
+        for room_id in self.base:
+            yield self[room_id]
+
+    def in_memory(self) -> int:
+        # Only the copies, the shared rooms belong to the world
+        return len(self.own)
+
+    def original(self, room_id, functions=None) -> Optional[Room]:
+        # A copy of the shared room
+        room = self.base.get(room_id)
+        if room is None:
+            return None
+        room = copy.deepcopy(room)
+        bind_room(room, self.functions)
+        return room
+
+    def for_write(self, room_id) -> Room:
+        room = self.own.get(room_id)
+        if room is None:
+            room = copy.deepcopy(self.base[room_id])
+            bind_room(room, self.functions) # Copies drop funcs like pickles do
+            self.own[room_id] = room
+        return room
+
+@dataclass
+class World:
+    rooms: Dict[str, Room] # Rooms or any store with the same interface e.g: roomstore.LazyRooms
+    start_room: str
+    functions: Dict[str, Callable] = field(default_factory=dict) # A registry.FunctionRegistry for loaded worlds
+    graph: Optional[RoomGraph] = None # Exits as an adjacency index, see graph.py
+    progression: Progression = DEFAULT_PROGRESSION # Level tables, see progression.py
+    dialogues: DialogueLibrary = field(default_factory=DialogueLibrary) # NPC conversations, see dialogue.py
+    entities: Optional['EntityStore'] = None # Actor stats as NumPy arrays when enabled, see entitystore.py
+    reloads: List[FrozenSet[str]] = field(default_factory=list) # Rooms replaced by each hot reload, see hotreload.py
+    player_skills: List[Skill] = field(default_factory=list) # What a new player knows, see parse_player_skills
+
+def snapshot_path(worldfile):
+    # The snapshot sits next to the world directory e.g: example/world1 -> example/world1.snapshot
+    return os.path.normpath(worldfile) + ".snapshot"
+
+def shard_paths(worldfile) -> List[str]:
+    # Worlds can split their rooms over rooms/*.json next to data.json e.g: one file per region.
+    # Each shard is {"rooms": [...]}, data.json keeps start_room (and may still have rooms of its own).
+    directory = os.path.join(worldfile, "rooms")
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".json")]
+
+def source_key(*data: bytes):
+    h = hashlib.sha256()
+    h.update(SNAPSHOT_VERSION.to_bytes(4, "little"))
+    for blob in data:
+        h.update(len(blob).to_bytes(8, "little"))
+        h.update(blob)
+    return h.hexdigest()
+
+def parse_stats(stats_data):
+    return Stats(
+        health=stats_data['health'],
+        max_health=stats_data['max_health'],
+        mana=stats_data['mana'],
+        max_mana=stats_data['max_mana'],
+        strength=stats_data["strength"],
+        dexterity=stats_data["dexterity"],
+        intelligence=stats_data["intelligence"],
+        level=stats_data["level"],
+    )
+
+def parse_item(it, templates: Optional[dict] = None):
+    # Equal definitions share one ItemTemplate, `templates` is the interning table
+    func_name = it.get('func') if it['type'] == "consumable" else None
+    key = (it['id'], it['name'], it['description'], it['type'], it.get('power'), it.get('equip_slot'), func_name)
+    template = templates.get(key) if templates is not None else None
+    if template is None:
+        template = ItemTemplate(id=key[0], name=key[1], description=key[2], type=key[3], power=key[4], equip_slot=key[5], func_name=func_name)
+        if templates is not None:
+            templates[key] = template
+    return Item.of(template)
+
+def parse_skill(sk):
+    target = sk.get('target', "enemy")
+    if target not in TARGETS:
+        raise ValueError(f"Skill {sk['id']} has an unknown target: {target}")
+    return Skill(id=sk['id'], name=sk['name'], description=sk['description'], mana_cost=sk['mana_cost'], power=sk['power'], func_name=sk.get('func'),
+                 target=target, effects=tuple(parse_effect(ef) for ef in sk.get('effects', ())))
+
+def parse_player_skills(data) -> List[Skill]:
+    # The optional "player" section of data.json: {"player": {"skills": [...]}}, skills as actors have them
+    return [parse_skill(sk) for sk in data.get('player', {}).get('skills', ())]
+
+def shared(text):
+    # Ids, names and descriptions repeat across a world (every goblin is "Goblin"), one copy of each
+    return sys.intern(text) if isinstance(text, str) else text
+
+def parse_actor(ac, ai, templates: Optional[dict] = None):
+    # Lists are built from lists so they're allocated at their size, a generator over allocates
+    items = IndexedList([parse_item(it, templates) for it in ac['items']])
+    skills = SkillTable([parse_skill(sk) for sk in ac['skills']]) if ac.get('skills') else NO_SKILLS
+    new_ac = Actor(id=shared(ac['id']), name=shared(ac['name']), description=shared(ac['description']), stats=parse_stats(ac['stats']), ai=ai,
+                   items=items, skills=skills, dialogue=shared(ac.get('dialogue')))
+    if 'equip' in ac:
+        for key in ac['equip']:
+            new_ac.equip_item(ac['equip'][key])
+    return new_ac
+
+def parse_room(room, templates: Optional[dict] = None):
+    items = IndexedList([parse_item(it, templates) for it in room['items']])
+    enemies = IndexedList([parse_actor(en, "aggressive", templates) for en in room['enemies']])
+    objects = IndexedList([Object(id=shared(ob['id']), name=shared(ob['name']), description=shared(ob['description'])) for ob in room['objects']])
+    npcs = IndexedList([parse_actor(npc, "passive", templates) for npc in room['npcs']])
+    # Exits name rooms by id, shared with the rooms' own ids
+    exits = {name: shared(target) for name, target in room['exits'].items()}
+    return Room(id=shared(room['id']), name=room['name'], description=shared(room['description']), exits=exits, items=items, enemies=enemies,
+                objects=objects, npcs=npcs)
+
+def bind_item(item: Item, functions):
+    template = item.template
+    if template.func_name and template.func is None and template.func_name in functions:
+        template.bind(functions[template.func_name])
+
+def bind_skill(skill: Skill, functions):
+    if skill.func_name and skill.source_func is None and skill.func_name in functions:
+        skill.source_func = functions[skill.func_name]
+
+def bind_actor(ac: Actor, functions):
+    for it in ac.items:
+        bind_item(it, functions)
+    for sk in ac.skills:
+        bind_skill(sk, functions)
+
+def bind_room(room: Room, functions):
+    # Resolve func names to the world's functions, with a registry nothing runs until it's called
+    for it in room.items:
+        bind_item(it, functions)
+    for ac in (*room.enemies, *room.npcs):
+        bind_actor(ac, functions)
+
+def parse_world(data) -> Rooms:
+    rooms = Rooms()
+    templates = {}
+    for room in data.get('rooms', ()):
+        rooms[room['id']] = parse_room(room, templates)
+    return rooms
+
+def parse_shard(path) -> Rooms:
+    with open(path, "rb") as f:
+        return parse_world(json.loads(f.read()))
+
+def pool_map(func, items: List, workers: Optional[int] = None):
+    # func over items across a process pool, in order. In process when one worker would do.
+    workers = min(len(items), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        yield from map(func, items)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(func, items)
+
+def share_templates(rooms):
+    # Shards intern their item templates apart, fold equal ones from different shards together
+    templates = {}
+    for room in rooms.values():
+        for it in room.items:
+            it.template = templates.setdefault(it.template, it.template)
+        for ac in (*room.enemies, *room.npcs):
+            for it in ac.items:
+                it.template = templates.setdefault(it.template, it.template)
+
+def merge_rooms(rooms: Rooms, parts: Iterable[Rooms]):
+    for part in parts:
+        duplicate = next(iter(part.keys() & rooms.keys()), None)
+        if duplicate is not None:
+            raise ValueError(f"Room {duplicate} is defined more than once")
+        rooms.update(part)
+
+def read_snapshot(path, key):
+    # Header and payload are pickled separately so a stale snapshot is rejected without unpickling the rooms
+    try:
+        with open(path, "rb") as f:
+            header = pickle.load(f)
+            if header != (SNAPSHOT_VERSION, key):
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+
+def write_snapshot(path, key, payload):
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump((SNAPSHOT_VERSION, key), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        # A read-only world is fine, we just don't get a warm start next time
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def load_world(worldfile, use_cache=True, workers: Optional[int] = None) -> World:
+    """
+    Loads a world, from its snapshot when data.json and the shards haven't changed.
+    `workers` caps the processes used to parse shards, 1 parses them in process.
+    """
+    with open(worldfile + "/data.json", "rb") as f:
+        raw = f.read()
+    shards = shard_paths(worldfile)
+    shard_raw = []
+    for shard in shards:
+        with open(shard, "rb") as f:
+            shard_raw.append(f.read())
+    key = source_key(raw, *shard_raw)
+    del shard_raw
+    path = snapshot_path(worldfile)
+
+    payload = read_snapshot(path, key) if use_cache else None
+    if payload is not None:
+        rooms = payload['rooms']
+        start_room = payload['start_room']
+        graph = payload['graph']
+        progression = payload['progression']
+        dialogues = payload['dialogues']
+        player_skills = payload['player_skills']
+    else:
+        data = json.loads(raw)
+        rooms = parse_world(data)
+        if shards:
+            # Parsed rooms come back pickled, so the parent still pays for rebuilding them
+            merge_rooms(rooms, pool_map(parse_shard, shards, workers))
+            share_templates(rooms)
+        start_room = data['start_room']
+        graph = build_graph(rooms, start_room)
+        progression = parse_progression(data.get('progression'))
+        dialogues = tree_sources(data)
+        player_skills = parse_player_skills(data)
+        if use_cache:
+            write_snapshot(path, key, {'start_room': start_room, 'rooms': rooms, 'graph': graph, 'progression': progression, 'dialogues': dialogues,
+                                       'player_skills': player_skills})
+
+    functions = load_registry(worldfile, use_cache=use_cache)
+    for room in rooms.values():
+        bind_room(room, functions)
+    for sk in player_skills:
+        bind_skill(sk, functions)
+    return World(rooms=rooms, start_room=start_room, functions=functions, graph=graph, progression=progression,
+                 dialogues=DialogueLibrary(worldfile, dialogues, functions), player_skills=player_skills)
@@ -0,0 +1,274 @@
+# Procedural world generator for scale testing
+# Usage: python3 worldgen.py <out/world_dir> [--rooms N] [--fanout F] [--items A:B] [--enemies A:B] [--npcs A:B]
+#                            [--level A:B] [--stat-spread S] [--seed S] [--shards N] [--dialogue-nodes N]
+#
+# Writes data.json and functions.py in the schema world.load_world reads. Rooms sit on a square
+# grid and link to their north/east/south/west neighbours. Every room is reachable, and edges
+# beyond that are kept with the probability needed to average --fanout exits per room. Each room
+# is built from its own seeded RNG and written as soon as it's built, so memory use stays flat
+# however big the world is, and the same seed always gives the same world.
+import argparse
+import json
+import math
+import os
+import random
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple
+
+# Written as the world's functions.py, the func names below must exist in its export
+FUNCTIONS_PY = """def heal_small(actor):
+    actor.heal(5)
+
+def heal_large(actor):
+    actor.heal(20)
+
+def restore_mana(actor):
+    actor.stats.mana = min(actor.stats.max_mana, actor.stats.mana + 5)
+
+def rest(player, npc):
+    player.heal(player.stats.max_health)
+
+export = {
+    "heal_small": heal_small,
+    "heal_large": heal_large,
+    "restore_mana": restore_mana,
+    "rest": rest,
+}
+"""
+
+ITEM_KINDS = [
+    {"id": "potion_small", "name": "Small Potion", "description": "Heals a bit.", "type": "consumable", "func": "heal_small"},
+    {"id": "potion_large", "name": "Large Potion", "description": "Heals a lot.", "type": "consumable", "func": "heal_large"},
+    {"id": "ether", "name": "Ether", "description": "Restores some mana.", "type": "consumable", "func": "restore_mana"},
+    {"id": "dagger", "name": "Dagger", "description": "Short and sharp.", "type": "equipable", "equip_slot": "weapon", "power": 1},
+    {"id": "sword", "name": "Short Sword", "description": "A soldier's blade.", "type": "equipable", "equip_slot": "weapon", "power": 2},
+    {"id": "axe", "name": "Battle Axe", "description": "Heavy and cruel.", "type": "equipable", "equip_slot": "weapon", "power": 4},
+    {"id": "leather", "name": "Leather Armor", "description": "Stiff leather.", "type": "equipable", "equip_slot": "armor", "power": 1},
+    {"id": "mail", "name": "Chain Mail", "description": "Rings of iron.", "type": "equipable", "equip_slot": "armor", "power": 2},
+    {"id": "gem", "name": "Red Gem", "description": "Shiny.", "type": "misc"},
+    {"id": "coin", "name": "Old Coin", "description": "Worn smooth.", "type": "misc"},
+]
+WEAPONS = [it for it in ITEM_KINDS if it.get("equip_slot") == "weapon"]
+ENEMY_KINDS = ["Goblin", "Rat", "Skeleton", "Bandit", "Wolf", "Slime", "Orc", "Bat"]
+NPC_KINDS = ["Merchant", "Hermit", "Guard", "Farmer", "Scholar"]
+OBJECT_KINDS = ["Table", "Barrel", "Statue", "Fountain", "Bookshelf", "Crate"]
+ADJECTIVES = ["Dusty", "Damp", "Quiet", "Narrow", "Vast", "Cold", "Bright", "Ruined"]
+PLACES = ["Hall", "Cellar", "Corridor", "Chamber", "Cave", "Courtyard", "Vault", "Gallery"]
+
+# Grid directions: name, dx, dy, opposite
+DIRECTIONS = [("north", 0, -1, "south"), ("east", 1, 0, "west"), ("south", 0, 1, "north"), ("west", -1, 0, "east")]
+
+@dataclass
+class WorldSpec:
+    rooms: int = 1000
+    fanout: float = 2.5 # Average exits per room, 2 to 4 on the grid
+    items: Tuple[int, int] = (0, 3) # Per room, inclusive
+    enemies: Tuple[int, int] = (0, 2)
+    npcs: Tuple[int, int] = (0, 1)
+    objects: Tuple[int, int] = (0, 2)
+    level: Tuple[int, int] = (1, 5) # Enemy levels, rising from the start room outwards
+    stat_spread: float = 0.2 # Stats are scaled by a normal factor around 1 with this deviation
+    seed: int = 1
+    dialogue_nodes: int = 0 # Nodes in the dialogue tree of each NPC kind, 0 for NPCs with nothing to say
+
+    @property
+    def width(self):
+        return max(1, math.isqrt(self.rooms - 1) + 1) if self.rooms > 1 else 1
+
+    def room_id(self, i):
+        return f"room_{i}"
+
+def edge_roll(seed, a, b):
+    # Same value from both ends of an edge, without keeping any state between rooms
+    a, b = min(a, b), max(a, b)
+    h = (a * 0x9E3779B1 + b * 0x85EBCA77 + seed * 0xC2B2AE3D) & 0xFFFFFFFFFFFFFFFF
+    h ^= h >> 33
+    h = (h * 0xFF51AFD7ED558CCD) & 0xFFFFFFFFFFFFFFFF
+    h ^= h >> 33
+    return h / 2**64
+
+def exits(spec: WorldSpec, i) -> Dict[str, str]:
+    width = spec.width
+    x, y = i % width, i // width
+    # Rows are always linked east-west and column 0 north-south, so the world is one component.
+    # The other north-south edges are kept with probability p, which tops the average up to fanout.
+    rows = -(-spec.rooms // width)
+    spanning = 2 * (spec.rooms - 1) / spec.rooms
+    optional = 2 * max(0, spec.rooms - width - (rows - 1)) / spec.rooms
+    p = min(1.0, max(0.0, (spec.fanout - spanning) / optional)) if optional else 0.0
+    out = {}
+    for name, dx, dy, _ in DIRECTIONS:
+        nx, ny = x + dx, y + dy
+        if nx < 0 or nx >= width or ny < 0:
+            continue
+        j = ny * width + nx
+        if j >= spec.rooms:
+            continue
+        if dy == 0 or x == 0 or edge_roll(spec.seed, i, j) < p:
+            out[name] = spec.room_id(j)
+    return out
+
+def pick(rng, bounds):
+    return rng.randint(bounds[0], bounds[1])
+
+def scaled(rng, value, spread):
+    return max(1, round(value * rng.gauss(1.0, spread))) if spread > 0 else value
+
+def make_actor(rng, spec, kind, n, level, hostile):
+    health = scaled(rng, 6 + 4 * level, spec.stat_spread)
+    mana = scaled(rng, 2 * level, spec.stat_spread) if rng.random() < 0.3 else 0
+    ac = {
+        "id": f"{kind.lower()}_{n}",
+        "name": kind,
+        "description": f"A level {level} {kind.lower()}." if hostile else f"A {kind.lower()} going about their day.",
+        "stats": {
+            "health": health, "max_health": health, "mana": mana, "max_mana": mana,
+            "strength": scaled(rng, 1 + level, spec.stat_spread),
+            "dexterity": scaled(rng, 1 + level // 2, spec.stat_spread),
+            "intelligence": scaled(rng, 1 + level // 2, spec.stat_spread),
+            "level": level,
+        },
+        "items": [],
+    }
+    if not hostile and spec.dialogue_nodes > 0:
+        ac["dialogue"] = kind.lower()
+    if hostile and rng.random() < 0.5:
+        weapon = rng.choice(WEAPONS)
+        ac["items"].append(dict(weapon))
+        ac["equip"] = {"weapon": weapon["id"]}
+    return ac
+
+def make_room(spec: WorldSpec, i) -> Dict:
+    rng = random.Random(spec.seed * 1_000_003 + i)
+    width = spec.width
+    # Enemy levels grow with the distance from the start room
+    far = max(1, 2 * (width - 1))
+    depth = (i % width + i // width) / far
+    lo, hi = spec.level
+    room = {
+        "id": spec.room_id(i),
+        "name": f"{rng.choice(ADJECTIVES)} {rng.choice(PLACES)}",
+        "description": f"Room {i} of a generated world.",
+        "exits": exits(spec, i),
+        "items": [dict(rng.choice(ITEM_KINDS)) for _ in range(pick(rng, spec.items))],
+        "enemies": [],
+        "npcs": [make_actor(rng, spec, rng.choice(NPC_KINDS), n, lo, False) for n in range(pick(rng, spec.npcs))],
+        "objects": [],
+    }
+    if i != 0: # Nothing attacks the player on arrival
+        for n in range(pick(rng, spec.enemies)):
+            level = min(hi, max(lo, round(lo + (hi - lo) * depth + rng.uniform(-1, 1))))
+            room["enemies"].append(make_actor(rng, spec, rng.choice(ENEMY_KINDS), n, level, True))
+    for n in range(pick(rng, spec.objects)):
+        kind = rng.choice(OBJECT_KINDS)
+        room["objects"].append({"id": f"{kind.lower()}_{n}", "name": kind, "description": f"A {kind.lower()}."})
+    return room
+
+def make_dialogue(spec: WorldSpec, kind) -> Dict:
+    # A binary tree of questions, every node can also end the talk and every leaf rests the player
+    n = spec.dialogue_nodes
+    nodes = []
+    for k in range(n):
+        children = [c for c in (2 * k + 1, 2 * k + 2) if c < n]
+        node = {"id": f"n{k}", "text": f"{kind} line {k}."}
+        if children:
+            node["options"] = [{"text": f"Ask about topic {c}.", "next": f"n{c}"} for c in children] + [{"text": "Goodbye."}]
+        else:
+            node["func"] = "rest"
+            node["next"] = "n0"
+        nodes.append(node)
+    return {"id": kind.lower(), "start": "n0", "nodes": nodes}
+
+def write_dialogues(path, spec: WorldSpec):
+    directory = os.path.join(path, "dialogues")
+    os.makedirs(directory, exist_ok=True)
+    for kind in NPC_KINDS:
+        tree = make_dialogue(spec, kind)
+        with open(os.path.join(directory, tree["id"] + ".json"), "w") as f:
+            json.dump(tree, f, separators=(",", ":"))
+
+def generate_rooms(spec: WorldSpec, start=0, stop=None) -> Iterator[Dict]:
+    for i in range(start, spec.rooms if stop is None else stop):
+        yield make_room(spec, i)
+
+def write_rooms(f, rooms: Iterator[Dict]):
+    # One room per line inside the rooms array, nothing is held beyond the room being written
+    first = True
+    for room in rooms:
+        f.write("\n" if first else ",\n")
+        f.write(json.dumps(room, separators=(",", ":")))
+        first = False
+    f.write("\n")
+
+def write_json_rooms(path, head, rooms: Iterator[Dict]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", buffering=1 << 20) as f:
+        f.write("{" + head + '"rooms":[')
+        write_rooms(f, rooms)
+        f.write("]}\n")
+    os.replace(tmp, path)
+
+def write_world(path, spec: WorldSpec, shards=0):
+    """
+    Writes the world to directory `path`. With shards > 0 the rooms go to that many
+    rooms/shard_<n>.json files in id order and data.json only has the start room.
+    """
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "functions.py"), "w") as f:
+        f.write(FUNCTIONS_PY)
+    if spec.dialogue_nodes > 0:
+        write_dialogues(path, spec)
+    head = '"start_room":%s,' % json.dumps(spec.room_id(0))
+    if shards <= 0:
+        write_json_rooms(os.path.join(path, "data.json"), head, generate_rooms(spec))
+        return
+    directory = os.path.join(path, "rooms")
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.startswith("shard_") and name.endswith(".json"):
+            os.remove(os.path.join(directory, name)) # Left over from an earlier run with more shards
+    per_shard = -(-spec.rooms // shards)
+    digits = len(str(shards - 1))
+    for n in range(shards):
+        start = n * per_shard
+        stop = min(spec.rooms, start + per_shard)
+        write_json_rooms(os.path.join(directory, f"shard_{n:0{digits}}.json"), "", generate_rooms(spec, start, stop))
+    write_json_rooms(os.path.join(path, "data.json"), head, iter(()))
+
+def bounds(text) -> Tuple[int, int]:
+    # "3" or "1:5"
+    lo, _, hi = text.partition(":")
+    lo = int(lo)
+    hi = int(hi) if hi else lo
+    if hi < lo:
+        raise argparse.ArgumentTypeError(f"Bad range: {text}")
+    return lo, hi
+
+def main():
+    parser = argparse.ArgumentParser(description="Procedural world generator")
+    parser.add_argument("out", help="World directory to write e.g: example/big_world")
+    parser.add_argument("--rooms", type=int, default=WorldSpec.rooms)
+    parser.add_argument("--fanout", type=float, default=WorldSpec.fanout, help="Average exits per room (2-4)")
+    parser.add_argument("--items", type=bounds, default=WorldSpec.items, help="Items per room e.g: 0:3")
+    parser.add_argument("--enemies", type=bounds, default=WorldSpec.enemies, help="Enemies per room e.g: 0:2")
+    parser.add_argument("--npcs", type=bounds, default=WorldSpec.npcs, help="NPCs per room e.g: 0:1")
+    parser.add_argument("--objects", type=bounds, default=WorldSpec.objects, help="Objects per room e.g: 0:2")
+    parser.add_argument("--level", type=bounds, default=WorldSpec.level, help="Enemy level range e.g: 1:10")
+    parser.add_argument("--stat-spread", type=float, default=WorldSpec.stat_spread, help="Deviation of the stat scale factor")
+    parser.add_argument("--seed", type=int, default=WorldSpec.seed)
+    parser.add_argument("--shards", type=int, default=0, help="Split the rooms over this many rooms/*.json files")
+    parser.add_argument("--dialogue-nodes", type=int, default=WorldSpec.dialogue_nodes, help="Nodes per NPC dialogue tree, written to dialogues/*.json")
+    args = parser.parse_args()
+    if args.rooms < 1:
+        raise SystemExit("--rooms must be at least 1")
+
+    spec = WorldSpec(rooms=args.rooms, fanout=args.fanout, items=args.items, enemies=args.enemies, npcs=args.npcs,
+                     objects=args.objects, level=args.level, stat_spread=args.stat_spread, seed=args.seed,
+                     dialogue_nodes=args.dialogue_nodes)
+    write_world(args.out, spec, shards=args.shards)
+    size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(args.out) for name in names)
+    print(f"Wrote {spec.rooms} rooms to {args.out} ({size / 1024 / 1024:.1f} MiB)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()